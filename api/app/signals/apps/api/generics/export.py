@@ -0,0 +1,81 @@
+# SPDX-License-Identifier: MPL-2.0
+# Copyright (C) 2021 Gemeente Amsterdam
+import io
+
+from django.db import connection
+
+CSV = 'csv'
+NDJSON = 'ndjson'
+
+CONTENT_TYPES = {
+    CSV: 'text/csv',
+    NDJSON: 'application/x-ndjson',
+}
+
+
+def _get_copy_sql(queryset, export_format, header):
+    """
+    Returns the COPY statement that writes the rows of the (values) queryset in the given format to STDOUT.
+
+    Annotations prefixed with an underscore (used to prevent clashes with the fields of the model) are written without
+    the underscore, same as queryset_to_csv_file in signals.apps.reporting.csv.utils.
+    """
+    sql, params = queryset.query.sql_with_params()
+    sql = sql.replace('AS "_', 'AS "')
+
+    if export_format == NDJSON:
+        # Every row as one JSON object per line, the quote and delimiter characters are chosen so that the JSON is
+        # written as-is (the text format would escape the backslashes in the JSON)
+        sql = f"select row_to_json(export) from ({sql}) export"
+        options = "FORMAT CSV, QUOTE E'\\x01', DELIMITER E'\\x02'"
+    else:
+        options = f"FORMAT CSV, {'HEADER, ' if header else ''}DELIMITER E','"
+
+    return f'COPY ({sql}) TO STDOUT WITH ({options})', params
+
+
+def stream_queryset(queryset, export_format, chunk_size):
+    """
+    Generator that yields the rows of the (values) queryset as CSV or NDJSON (bytes).
+
+    The rows are copied by Postgres (COPY ... TO STDOUT) in chunks of chunk_size rows ordered by the primary key, a
+    chunk only selects the rows after the last primary key of the previous chunk (keyset pagination). So only one
+    chunk is kept in memory, independent of the number of rows that are exported.
+
+    Note: every chunk is a separate statement, rows that are changed during the export can reflect the changes in the
+    chunks that are copied after the change.
+    """
+    queryset = queryset.order_by('pk')
+    pk_queryset = queryset.values_list('pk', flat=True)
+
+    last_pk = None
+    header = True
+    while True:
+        chunk_pk_queryset = pk_queryset if last_pk is None else pk_queryset.filter(pk__gt=last_pk)
+        chunk_pks = list(chunk_pk_queryset[:chunk_size])
+        if not chunk_pks:
+            if header and export_format == CSV:
+                # Nothing to export, only the header is written (an empty queryset can not be translated to SQL)
+                yield from _copy(queryset.filter(pk__isnull=True), export_format, header)
+            return
+
+        chunk_queryset = queryset.filter(pk__lte=chunk_pks[-1])
+        if last_pk is not None:
+            chunk_queryset = chunk_queryset.filter(pk__gt=last_pk)
+
+        yield from _copy(chunk_queryset, export_format, header)
+
+        last_pk = chunk_pks[-1]
+        header = False
+
+
+def _copy(queryset, export_format, header):
+    sql, params = _get_copy_sql(queryset, export_format, header)
+
+    buffer = io.BytesIO()
+    with connection.cursor() as cursor:
+        cursor.copy_expert(cursor.mogrify(sql, params), buffer)
+
+    data = buffer.getvalue()
+    if data:
+        yield data
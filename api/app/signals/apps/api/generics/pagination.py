@@ -1,7 +1,17 @@
 # SPDX-License-Identifier: MPL-2.0
 # Copyright (C) 2020 - 2021 Gemeente Amsterdam
-from rest_framework.pagination import PageNumberPagination
+import base64
+import json
+from collections import OrderedDict
+
+from django.db import connection
+from django.db.models import F, Q
+from rest_framework.exceptions import NotFound
+from rest_framework.filters import OrderingFilter
+from rest_framework.pagination import BasePagination, PageNumberPagination
 from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
 
 
 class LinkHeaderPagination(PageNumberPagination):
@@ -34,3 +44,145 @@ class LinkHeaderPagination(PageNumberPagination):
 
     def get_paginated_response(self, data):
         return Response(data, headers=self.get_pagination_headers())
+
+
+class HALKeysetPagination(BasePagination):
+    """
+    Keyset (cursor) pagination with the same HAL response as the HALPagination.
+
+    Instead of an offset the next page is selected with a WHERE clause on the values of the ordering fields of the last
+    result, so every page costs about the same no matter how deep the client pages. The ordering is taken from the
+    ordering filter of the view, the primary key is added as tie-breaker to make it unique. NULL values are sorted last.
+
+    Only forward paging is supported. Counting all results defeats the purpose of this pagination, the count is only
+    returned when requested using "?count=exact" or "?count=approximate" (an estimate of the query planner).
+    """
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    count_query_param = 'count'
+    page_size = api_settings.PAGE_SIZE
+    invalid_cursor_message = 'Invalid cursor'
+
+    def get_ordering(self, request, queryset, view):
+        ordering = None
+        for filter_cls in getattr(view, 'filter_backends', []):
+            if issubclass(filter_cls, OrderingFilter):
+                ordering = filter_cls().get_ordering(request, queryset, view)
+                break
+
+        ordering = [field for field in (ordering or getattr(view, 'ordering', None) or []) if isinstance(field, str)]
+        if not any(field.lstrip('-') in ('id', 'pk') for field in ordering):
+            ordering.append('-id' if ordering and ordering[0].startswith('-') else 'id')
+        return ordering
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except (TypeError, ValueError):
+            return self.page_size
+        return page_size if page_size > 0 else self.page_size
+
+    def encode_cursor(self, values):
+        # Note: not using the DjangoJSONEncoder, it truncates the microseconds of datetime values
+        data = json.dumps({'ordering': self.ordering, 'values': values}, default=str)
+        return base64.urlsafe_b64encode(data.encode()).decode()
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+
+        try:
+            data = json.loads(base64.urlsafe_b64decode(encoded.encode()).decode())
+            values = data['values']
+        except (TypeError, ValueError, KeyError):
+            raise NotFound(self.invalid_cursor_message)
+
+        if data.get('ordering') != self.ordering or len(values) != len(self.ordering):
+            # The cursor was created for another ordering
+            raise NotFound(self.invalid_cursor_message)
+        return values
+
+    def _keyset_q(self, values):
+        """
+        Q object selecting the rows after the given values of the ordering fields (NULL values sorted last)
+        """
+        q_total = Q(pk__in=[])
+        q_equal = Q()
+        for field, value in zip(self.ordering, values):
+            descending = field.startswith('-')
+            field = field.lstrip('-')
+
+            if value is None:
+                # Only other NULL values follow a NULL value
+                q_equal &= Q(**{f'{field}__isnull': True})
+                continue
+
+            q_after = Q(**{f'{field}__lt' if descending else f'{field}__gt': value}) | Q(**{f'{field}__isnull': True})
+            q_total |= q_equal & q_after
+            q_equal &= Q(**{field: value})
+        return q_total
+
+    def get_count(self, queryset):
+        count = self.request.query_params.get(self.count_query_param)
+        if count == 'exact':
+            return queryset.count()
+        elif count == 'approximate':
+            return estimate_count(queryset)
+        return None
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.count = self.get_count(queryset)
+
+        order_by = [F(field.lstrip('-')).desc(nulls_last=True) if field.startswith('-')
+                    else F(field).asc(nulls_last=True) for field in self.ordering]
+        queryset = queryset.annotate(**{
+            f'keyset_{i}': F(field.lstrip('-')) for i, field in enumerate(self.ordering)
+        }).order_by(*order_by)
+
+        values = self.decode_cursor(request)
+        if values is not None:
+            queryset = queryset.filter(self._keyset_q(values))
+
+        page_size = self.get_page_size(request)
+        results = list(queryset[:page_size + 1])
+
+        self.next_values = None
+        if len(results) > page_size:
+            results = results[:page_size]
+            last = results[-1]
+            self.next_values = [getattr(last, f'keyset_{i}') for i in range(len(self.ordering))]
+        return results
+
+    def get_next_link(self):
+        if self.next_values is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.next_values))
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('_links', OrderedDict([
+                ('self', {'href': self.request.build_absolute_uri()}),
+                ('next', {'href': self.get_next_link()}),
+                ('previous', {'href': None}),
+            ])),
+            ('count', self.count),
+            ('results', data),
+        ]))
+
+
+def estimate_count(queryset):
+    """
+    The number of rows the query planner expects the queryset to return, much cheaper than a COUNT(*) on large tables
+    """
+    sql, params = queryset.order_by().query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        plan = cursor.fetchone()[0]
+
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
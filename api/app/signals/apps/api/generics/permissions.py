@@ -149,3 +149,11 @@ class SIAUserPermissions(SIABasePermission):
         'PATCH': ['signals.sia_write', 'auth.change_user'],
         'DELETE': ['signals.sia_write', 'auth.delete_user'],
     }
+
+
+class SIAExportPermissions(SIABasePermission):
+    perms_map = {
+        'GET': ['signals.sia_read', 'signals.sia_signal_export'],
+        'OPTIONS': [],
+        'HEAD': []
+    }
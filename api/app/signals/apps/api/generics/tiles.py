@@ -0,0 +1,117 @@
+# SPDX-License-Identifier: MPL-2.0
+# Copyright (C) 2021 Gemeente Amsterdam
+import json
+
+from django.contrib.gis.db.models import Collect
+from django.contrib.gis.db.models.functions import Centroid, SnapToGrid, Transform
+from django.contrib.gis.geos import Polygon
+from django.db import connection
+from django.db.models import Count
+from rest_framework.exceptions import NotFound
+
+# Half the circumference of the earth in EPSG:3857 (Web Mercator), the tile grid covers -extent..extent
+WEB_MERCATOR_EXTENT = 20037508.342789244
+WEB_MERCATOR_SRID = 3857
+
+MVT_EXTENT = 4096
+MVT_BUFFER = 64
+MAX_ZOOM = 22
+
+# A tile is 256 pixels wide, points are clustered in cells of 64 by 64 pixels
+CLUSTER_CELLS_PER_TILE = 4
+
+
+def tile_envelope(z, x, y):
+    """
+    Returns the bounds (xmin, ymin, xmax, ymax) in EPSG:3857 of tile z/x/y.
+
+    Note: PostGIS 3 provides ST_TileEnvelope, we calculate it ourselves so that PostGIS 2.4+ can be used.
+    """
+    z, x, y = int(z), int(x), int(y)
+    if z > MAX_ZOOM or x >= 2 ** z or y >= 2 ** z:
+        raise NotFound(f'Tile {z}/{x}/{y} does not exist.')
+
+    tile_size = 2 * WEB_MERCATOR_EXTENT / 2 ** z
+    xmin = -WEB_MERCATOR_EXTENT + x * tile_size
+    ymax = WEB_MERCATOR_EXTENT - y * tile_size
+    return xmin, ymax - tile_size, xmin + tile_size, ymax
+
+
+def get_vector_tile(queryset, geometry_field, layer_name, z, x, y, fields=()):
+    """
+    Returns the Mapbox Vector Tile z/x/y (bytes) containing the objects of the queryset.
+
+    The queryset is filtered on the bounding box of the tile and used as a subquery, so any filtering that is done on
+    the queryset (permissions, filter sets) also applies to the tile.
+
+    :param queryset: the (filtered) queryset
+    :param geometry_field: name of (or lookup to) the geometry field
+    :param layer_name: name of the layer in the vector tile
+    :param z: zoom level
+    :param x: tile column
+    :param y: tile row
+    :param fields: fields of the model (no lookups spanning relations) and annotations of the queryset that are added
+                   as feature attributes
+    :returns: bytes
+    """
+    bounds = tile_envelope(z, x, y)
+    envelope = Polygon.from_bbox(bounds)
+    envelope.srid = WEB_MERCATOR_SRID
+
+    queryset = queryset.filter(
+        **{f'{geometry_field}__bboverlaps': envelope}
+    ).annotate(
+        mvt_geometry=Transform(geometry_field, WEB_MERCATOR_SRID)
+    ).order_by().values(*fields, 'mvt_geometry')
+    sql, params = queryset.query.sql_with_params()
+
+    attributes = ''.join(f'q.{connection.ops.quote_name(field)}, ' for field in fields)
+    tile_query = f"""
+    select st_asmvt(tile, %s, {MVT_EXTENT}, 'geom') from (
+        select {attributes}st_asmvtgeom(
+            q.mvt_geometry, st_makeenvelope(%s, %s, %s, %s, {WEB_MERCATOR_SRID}), {MVT_EXTENT}, {MVT_BUFFER}, true
+        ) as geom
+        from ({sql}) as q
+    ) as tile
+    where tile.geom is not null
+    """
+
+    with connection.cursor() as cursor:
+        cursor.execute(tile_query, [layer_name, *bounds, *params])
+        row = cursor.fetchone()
+    return bytes(row[0]) if row and row[0] else b''
+
+
+def get_clusters(queryset, geometry_field, zoom):
+    """
+    Returns a GeoJSON FeatureCollection (dict) with the objects of the queryset clustered on a grid.
+
+    The grid cell size depends on the zoom level. Every Feature is a cluster, the geometry is the centroid of the
+    clustered objects and the number of clustered objects is provided as the "count" property.
+
+    :param queryset: the (filtered) queryset
+    :param geometry_field: name of (or lookup to) the geometry field
+    :param zoom: zoom level (0 - MAX_ZOOM)
+    :returns: dict
+    """
+    cell_size = 2 * WEB_MERCATOR_EXTENT / 2 ** int(zoom) / CLUSTER_CELLS_PER_TILE
+
+    # Filtering (for example on permissions) can result in duplicate rows, these should not be counted twice
+    base_queryset = queryset.model.objects.filter(pk__in=queryset.order_by().values('pk'))
+    clusters = base_queryset.annotate(
+        cell=SnapToGrid(Transform(geometry_field, WEB_MERCATOR_SRID), cell_size)
+    ).order_by().values(
+        'cell'
+    ).annotate(
+        count=Count('pk'),
+        centroid=Centroid(Collect(geometry_field)),
+    ).values_list('count', 'centroid')
+
+    return {
+        'type': 'FeatureCollection',
+        'features': [{
+            'type': 'Feature',
+            'geometry': json.loads(centroid.geojson),
+            'properties': {'count': count},
+        } for count, centroid in clusters]
+    }
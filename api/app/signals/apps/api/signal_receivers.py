@@ -0,0 +1,47 @@
+# SPDX-License-Identifier: MPL-2.0
+# Copyright (C) 2021 Gemeente Amsterdam
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from signals.apps.api.v1.views.area import PublicAreasViewSet
+from signals.apps.api.v1.views.signal import PrivateSignalViewSet, PublicSignalMapViewSet
+from signals.apps.signals.managers import (
+    create_initial,
+    update_category_assignment,
+    update_location,
+    update_priority,
+    update_status,
+    update_type
+)
+from signals.apps.signals.models import Area, AreaType
+
+
+@receiver([create_initial, update_status, update_location], dispatch_uid='api_invalidate_public_map_cache')
+def invalidate_public_map_cache_handler(sender, signal_obj, **kwargs):
+    PublicSignalMapViewSet.map_cache.invalidate()
+
+
+@receiver([create_initial,
+           update_location,
+           update_status,
+           update_category_assignment,
+           update_priority,
+           update_type], dispatch_uid='api_invalidate_signal_tile_cache')
+def invalidate_signal_tile_cache_handler(sender, signal_obj, **kwargs):
+    PrivateSignalViewSet.tile_cache.invalidate()
+
+
+@receiver([create_initial,
+           update_location,
+           update_status,
+           update_category_assignment,
+           update_priority,
+           update_type], dispatch_uid='api_invalidate_signal_facets_cache')
+def invalidate_signal_facets_cache_handler(sender, signal_obj, **kwargs):
+    PrivateSignalViewSet.facets_cache.invalidate()
+
+
+@receiver([post_save, post_delete], sender=Area, dispatch_uid='api_invalidate_area_tile_cache')
+@receiver([post_save, post_delete], sender=AreaType, dispatch_uid='api_invalidate_area_type_tile_cache')
+def invalidate_area_tile_cache_handler(sender, **kwargs):
+    PublicAreasViewSet.tile_cache.invalidate()
@@ -5,6 +5,7 @@ from signals.apps.api.v1.filters.department import DepartmentFilterSet
 from signals.apps.api.v1.filters.question import QuestionFilterSet
 from signals.apps.api.v1.filters.signal import (
     SignalCategoryRemovedAfterFilterSet,
+    SignalCurrentStateFilterSet,
     SignalFilterSet,
     SignalPromotedToParentFilter
 )
@@ -32,6 +33,7 @@ __all__ = [
     'DepartmentFilterSet',
     'QuestionFilterSet',
     'SignalCategoryRemovedAfterFilterSet',
+    'SignalCurrentStateFilterSet',
     'SignalFilterSet',
     'SignalPromotedToParentFilter',
 
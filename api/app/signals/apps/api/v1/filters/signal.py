@@ -72,6 +72,10 @@ class SignalFilterSet(FilterSet):
     )
     punctuality = filters.ChoiceFilter(method='punctuality_filter', choices=punctuality_choices)
 
+    # Used to filter on the main and sub categories (see filter_queryset)
+    category_lookup = 'category_assignment__category_id'
+    parent_category_lookup = 'category_assignment__category__parent_id'
+
     def _cleanup_form_data(self):
         """
         Cleanup the form data
@@ -93,8 +97,8 @@ class SignalFilterSet(FilterSet):
 
             if main_categories or sub_categories:
                 queryset = queryset.filter(
-                    Q(category_assignment__category__parent_id__in=[c.pk for c in main_categories]) |
-                    Q(category_assignment__category_id__in=[c.pk for c in sub_categories])
+                    Q(**{f'{self.parent_category_lookup}__in': [c.pk for c in main_categories]}) |
+                    Q(**{f'{self.category_lookup}__in': [c.pk for c in sub_categories]})
                 )
 
         self._cleanup_form_data()
@@ -281,6 +285,70 @@ class SignalFilterSet(FilterSet):
             return queryset.filter(category_assignment__deadline_factor_3__lt=local_now)
 
 
+class SignalCurrentStateFilterSet(SignalFilterSet):
+    """
+    Same filters as the SignalFilterSet, the simple filters use the denormalized SignalCurrentState of a Signal instead
+    of joining all related tables.
+    """
+    address_text = filters.CharFilter(field_name='current_state__address_text', lookup_expr='icontains')
+    area_code = filters.MultipleChoiceFilter(field_name='current_state__area_code', choices=area_choices)
+    area_type_code = filters.ChoiceFilter(field_name='current_state__area_type_code', choices=area_type_choices)
+    buurt_code = filters.MultipleChoiceFilter(field_name='current_state__buurt_code', choices=buurt_choices)
+    category_id = filters.MultipleChoiceFilter(field_name='current_state__category_id', choices=category_choices)
+    created_before = filters.IsoDateTimeFilter(field_name='current_state__created_at', lookup_expr='lte')
+    created_after = filters.IsoDateTimeFilter(field_name='current_state__created_at', lookup_expr='gte')
+    priority = filters.MultipleChoiceFilter(field_name='current_state__priority', choices=Priority.PRIORITY_CHOICES)
+    stadsdeel = filters.MultipleChoiceFilter(field_name='current_state__stadsdeel', choices=stadsdelen_choices)
+    status = filters.MultipleChoiceFilter(field_name='current_state__state', choices=status_choices)
+    type = filters.MultipleChoiceFilter(field_name='current_state__type', choices=Type.CHOICES)
+    updated_before = filters.IsoDateTimeFilter(field_name='current_state__updated_at', lookup_expr='lte')
+    updated_after = filters.IsoDateTimeFilter(field_name='current_state__updated_at', lookup_expr='gte')
+
+    category_lookup = 'current_state__category_id'
+    parent_category_lookup = 'current_state__parent_category_id'
+
+    def contact_details_filter(self, queryset, name, value):
+        choices = value  # we have a MultipleChoiceFilter ...
+        if len(choices) == len(contact_details_choices()):
+            return queryset
+
+        q_objects = {
+            'email': Q(current_state__has_email=True),
+            'phone': Q(current_state__has_phone=True),
+            'none': Q(current_state__has_email=False, current_state__has_phone=False),
+        }
+
+        q_total = q_objects[choices.pop()]
+        while choices:
+            q_total |= q_objects[choices.pop()]
+
+        return queryset.filter(q_total)
+
+    def assigned_user_email_filter(self, queryset, name, value):
+        if value == 'null':
+            return queryset.filter(current_state__assigned_user_email__isnull=True)
+        else:
+            return queryset.filter(current_state__assigned_user_email__iexact=value)
+
+    def punctuality_filter(self, queryset, name, value):
+        queryset = queryset.exclude(
+            current_state__state__in=[workflow.AFGEHANDELD, workflow.GEANNULEERD, workflow.GESPLITST]
+        )
+
+        if value == 'null':
+            return queryset.filter(current_state__deadline__isnull=True)
+
+        queryset = queryset.exclude(current_state__deadline__isnull=True)
+
+        local_now = now()
+        if value == 'on_time':
+            return queryset.filter(current_state__deadline__gt=local_now)
+        elif value == 'late':
+            return queryset.filter(current_state__deadline__lt=local_now)
+        elif value == 'late_factor_3':
+            return queryset.filter(current_state__deadline_factor_3__lt=local_now)
+
+
 class SignalCategoryRemovedAfterFilterSet(FilterSet):
     after = filters.IsoDateTimeFilter(field_name='category_assignment__created_at', lookup_expr='gte')
     before = filters.IsoDateTimeFilter(field_name='category_assignment__created_at', lookup_expr='lte')
@@ -20,3 +20,19 @@ class SerializedJsonRenderer(BaseRenderer):
             # This code path indents the JSON string for use in browsable API.
             return json.dumps(json.loads(data), indent=renderer_context['indent'])
         return data
+
+
+class MVTRenderer(BaseRenderer):
+    """
+    This renderer is used for Mapbox Vector Tiles that are generated by Postgres (using ST_AsMVT).
+    """
+    format = 'pbf'
+    media_type = 'application/vnd.mapbox-vector-tile'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, media_type=None, renderer_context=None):
+        if isinstance(data, (bytes, bytearray, memoryview)):
+            return bytes(data)
+        # Error responses (for example a failed authentication) are not vector tiles, render them as JSON
+        return json.dumps(data).encode()
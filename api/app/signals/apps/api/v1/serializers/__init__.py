@@ -18,6 +18,7 @@ from signals.apps.api.v1.serializers.departments import (
     PrivateDepartmentSerializerList
 )
 from signals.apps.api.v1.serializers.expression import ExpressionContextSerializer
+from signals.apps.api.v1.serializers.map import PublicSignalMapQuerySerializer
 from signals.apps.api.v1.serializers.question import PublicQuestionSerializerDetail
 from signals.apps.api.v1.serializers.signal import (
     AbridgedChildSignalSerializer,
@@ -50,6 +51,7 @@ __all__ = [
     'PrivateSignalSerializerList',
     'PublicSignalSerializerDetail',
     'PublicSignalCreateSerializer',
+    'PublicSignalMapQuerySerializer',
     'SignalGeoSerializer',
     'SignalIdListSerializer',
     'StoredSignalFilterSerializer',
@@ -0,0 +1,34 @@
+# SPDX-License-Identifier: MPL-2.0
+# Copyright (C) 2021 Gemeente Amsterdam
+from rest_framework import serializers
+
+
+class BboxField(serializers.CharField):
+    """
+    Bounding box in the format: <lon_min>,<lat_min>,<lon_max>,<lat_max> (WGS84)
+    """
+    default_error_messages = {
+        'invalid': 'Bounding box should be formatted as: <lon_min>,<lat_min>,<lon_max>,<lat_max>',
+    }
+
+    def to_internal_value(self, data):
+        data = super().to_internal_value(data)
+        try:
+            bbox = [float(value) for value in data.split(',')]
+        except ValueError:
+            self.fail('invalid')
+
+        if len(bbox) != 4 or bbox[0] >= bbox[2] or bbox[1] >= bbox[3]:
+            self.fail('invalid')
+        return bbox
+
+
+class PublicSignalMapQuerySerializer(serializers.Serializer):
+    """
+    Validates the (optional) query parameters of the public map endpoint, use with `data=request.query_params`
+    """
+    bbox = BboxField(required=False)
+    maincategory_slug = serializers.ListField(child=serializers.SlugField(), required=False)
+    category_slug = serializers.ListField(child=serializers.SlugField(), required=False)
+    created_after = serializers.DateTimeField(required=False)
+    created_before = serializers.DateTimeField(required=False)
@@ -103,6 +103,27 @@ class _SignalListSerializer(serializers.ListSerializer):
 
         return attrs
 
+    def create(self, validated_data):
+        """
+        Create all Signals in bulk (see SignalManager.create_initial_bulk)
+        """
+        signals_data, signals_attachments = [], []
+        for attrs in validated_data:
+            create_initial_data, attachments = self.child.get_create_initial_data(attrs)
+            signals_data.append(create_initial_data)
+            signals_attachments.append(attachments)
+
+        signals = Signal.actions.create_initial_bulk(signals_data)
+
+        for signal, attachments in zip(signals, signals_attachments):
+            if attachments:
+                Signal.actions.copy_attachments(data=attachments, signal=signal)
+
+        signals_by_pk = Signal.objects.select_related(
+            'location', 'status', 'category_assignment', 'reporter', 'priority', 'type_assignment', 'parent'
+        ).in_bulk([signal.pk for signal in signals])
+        return [signals_by_pk[signal.pk] for signal in signals]
+
 
 class PrivateSignalSerializerDetail(HALSerializer, AddressValidationMixin):
     """
@@ -428,7 +449,11 @@ class PrivateSignalSerializerList(SignalValidationMixin, HALSerializer):
 
         return super().validate(attrs=attrs)
 
-    def create(self, validated_data):
+    def get_create_initial_data(self, validated_data):
+        """
+        Translates the validated data to the keyword arguments of SignalManager.create_initial, the attachments to copy
+        to the new Signal are returned separately
+        """
         # Set default status
         logged_in_user = self.context['request'].user
         INITIAL_STATUS = {
@@ -456,15 +481,21 @@ class PrivateSignalSerializerList(SignalValidationMixin, HALSerializer):
 
         attachments = validated_data.pop('attachments') if 'attachments' in validated_data else None
 
-        signal = Signal.actions.create_initial(
-            validated_data,
-            location_data,
-            INITIAL_STATUS,
-            category_assignment_data,
-            reporter_data,
-            priority_data,
-            type_data
-        )
+        create_initial_data = {
+            'signal_data': validated_data,
+            'location_data': location_data,
+            'status_data': INITIAL_STATUS,
+            'category_assignment_data': category_assignment_data,
+            'reporter_data': reporter_data,
+            'priority_data': priority_data,
+            'type_data': type_data,
+        }
+        return create_initial_data, attachments
+
+    def create(self, validated_data):
+        create_initial_data, attachments = self.get_create_initial_data(validated_data)
+
+        signal = Signal.actions.create_initial(**create_initial_data)
 
         if attachments:
             Signal.actions.copy_attachments(data=attachments, signal=signal)
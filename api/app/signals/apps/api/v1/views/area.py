@@ -2,16 +2,21 @@
 # Copyright (C) 2020 - 2021 Gemeente Amsterdam
 from datapunt_api.pagination import HALPagination
 from datapunt_api.rest import DatapuntViewSet
+from django.conf import settings
+from django.db.models import F
 from django.http import Http404
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.decorators import action
 from rest_framework.response import Response
 
 from signals.apps.api.generics.pagination import LinkHeaderPagination
+from signals.apps.api.generics.tiles import get_vector_tile
 from signals.apps.api.v1.filters import AreaFilterSet
+from signals.apps.api.v1.renderers import MVTRenderer
 from signals.apps.api.v1.serializers.area import AreaGeoSerializer, AreaSerializer
 from signals.apps.signals.models import Area
 from signals.auth.backend import JWTAuthBackend
+from signals.utils.cache import VersionedCache
 
 
 class PublicAreasViewSet(DatapuntViewSet):
@@ -31,6 +36,9 @@ class PublicAreasViewSet(DatapuntViewSet):
     filter_backends = (DjangoFilterBackend, )
     filterset_class = AreaFilterSet
 
+    # Invalidated when areas change (see signals.apps.api.signal_receivers) and by the "load_areas" management command
+    tile_cache = VersionedCache(namespace='area-tiles', timeout=settings.AREA_TILES_CACHE_TIMEOUT)
+
     def retrieve(self, request, *args, **kwargs):
         raise Http404
 
@@ -47,6 +55,20 @@ class PublicAreasViewSet(DatapuntViewSet):
         serializer = AreaGeoSerializer(filtered_qs, many=True)
         return Response(serializer.data)
 
+    @action(detail=False, url_path=r'geography/(?P<z>\d+)/(?P<x>\d+)/(?P<y>\d+)\.pbf',
+            renderer_classes=(MVTRenderer, ))
+    def geography_tile(self, request, z, x, y):
+        """
+        Mapbox Vector Tile of the areas, the same filters as the geography endpoint can be used.
+        """
+        params = {'query': dict(request.query_params.lists()), 'tile': (z, x, y)}
+
+        def _get_tile():
+            filtered_qs = self.filter_queryset(self.get_queryset()).annotate(type=F('_type__code'))
+            return get_vector_tile(filtered_qs, 'geometry', 'areas', z, x, y, fields=('code', 'name', 'type'))
+
+        return Response(self.tile_cache.get_or_set(_get_tile, params=params))
+
 
 class PrivateAreasViewSet(PublicAreasViewSet):
     """
@@ -3,32 +3,43 @@
 import logging
 
 from datapunt_api.rest import DatapuntViewSet, HALPagination
+from django.conf import settings
 from django.db import connection
-from django.http import Http404
+from django.db.models import F, FloatField, Func
+from django.http import Http404, StreamingHttpResponse
+from django.utils import timezone
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import status
 from rest_framework.decorators import action
-from rest_framework.exceptions import NotFound, PermissionDenied
+from rest_framework.exceptions import NotFound, PermissionDenied, ValidationError
 from rest_framework.renderers import BrowsableAPIRenderer
 from rest_framework.response import Response
 from rest_framework.viewsets import GenericViewSet, ViewSet
 
 from signals.apps.api.generics import mixins
+from signals.apps.api.generics.export import CONTENT_TYPES, stream_queryset
 from signals.apps.api.generics.filters import FieldMappingOrderingFilter
-from signals.apps.api.generics.pagination import LinkHeaderPagination
+from signals.apps.api.generics.pagination import HALKeysetPagination, LinkHeaderPagination
 from signals.apps.api.generics.permissions import (
+    SIAExportPermissions,
     SIAPermissions,
     SignalCreateInitialPermission,
     SignalViewObjectPermission
 )
-from signals.apps.api.v1.filters import SignalFilterSet, SignalPromotedToParentFilter
-from signals.apps.api.v1.renderers import SerializedJsonRenderer
+from signals.apps.api.generics.tiles import MAX_ZOOM, get_clusters, get_vector_tile
+from signals.apps.api.v1.filters import (
+    SignalCurrentStateFilterSet,
+    SignalFilterSet,
+    SignalPromotedToParentFilter
+)
+from signals.apps.api.v1.renderers import MVTRenderer, SerializedJsonRenderer
 from signals.apps.api.v1.serializers import (
     AbridgedChildSignalSerializer,
     HistoryHalSerializer,
     PrivateSignalSerializerDetail,
     PrivateSignalSerializerList,
     PublicSignalCreateSerializer,
+    PublicSignalMapQuerySerializer,
     PublicSignalSerializerDetail,
     SignalGeoSerializer,
     SignalIdListSerializer
@@ -37,6 +48,7 @@ from signals.apps.api.v1.views._base import PublicSignalGenericViewSet
 from signals.apps.signals import workflow
 from signals.apps.signals.models import Signal
 from signals.auth.backend import JWTAuthBackend
+from signals.utils.cache import VersionedCache
 
 logger = logging.getLogger(__name__)
 
@@ -69,12 +81,65 @@ class PublicSignalMapViewSet(ViewSet):
     # Using pgsql ability to generate geojson, the request time reduces to 30ms (> 130x speedup!)
     # The downside is that this query has to be (potentially) maintained when changing one of the
     # following models: signal, categoryassignment, category, location, status
+    #
+    # The optional query parameters bbox, maincategory_slug, category_slug, created_after and created_before
+    # are pushed down into the query.
+
+    closed_states = (
+        workflow.AFGEHANDELD,
+        workflow.AFGEHANDELD_EXTERN,
+        workflow.GEANNULEERD,
+        workflow.VERZOEK_TOT_HEROPENEN,
+    )
+
+    # The result is shared between all citizens requesting the same part of the map, the cache is invalidated
+    # whenever a Signal is created or its status or location changes (see signals.apps.api.signal_receivers)
+    map_cache = VersionedCache(
+        namespace='public-map-signals',
+        timeout=settings.PUBLIC_GEO_SIGNAL_ENDPOINT_CACHE_TIMEOUT
+    )
+
+    def _get_where_clause(self, params):
+        """
+        Translate the validated query parameters to SQL conditions and their parameters
+        """
+        conditions = [
+            's.location_id = l.id',
+            's.status_id = status.id',
+            'status.state <> all(%(closed_states)s)',
+        ]
+        sql_params = {'closed_states': list(self.closed_states)}
+
+        if 'bbox' in params:
+            conditions.append(
+                'l.geometrie && st_makeenvelope(%(lon_min)s, %(lat_min)s, %(lon_max)s, %(lat_max)s, 4326)'
+            )
+            sql_params.update(zip(('lon_min', 'lat_min', 'lon_max', 'lat_max'), params['bbox']))
+
+        if params.get('maincategory_slug') or params.get('category_slug'):
+            # Same behavior as the SignalFilterSet, main and sub categories are combined using a logical OR
+            conditions.append('(maincat.slug = any(%(maincategory_slug)s) or cat.slug = any(%(category_slug)s))')
+            sql_params['maincategory_slug'] = params.get('maincategory_slug', [])
+            sql_params['category_slug'] = params.get('category_slug', [])
+
+        if 'created_after' in params:
+            conditions.append('s.created_at >= %(created_after)s')
+            sql_params['created_after'] = params['created_after']
+
+        if 'created_before' in params:
+            conditions.append('s.created_at <= %(created_before)s')
+            sql_params['created_before'] = params['created_before']
+
+        return ' and '.join(conditions), sql_params
+
+    def _get_feature_collection(self, params):
+        where_clause, sql_params = self._get_where_clause(params)
+        sql_params['limit'] = settings.PUBLIC_GEO_SIGNAL_ENDPOINT_MAX_FEATURES
 
-    def list(self, *args, **kwargs):
         fast_query = f"""
         select jsonb_build_object(
             'type', 'FeatureCollection',
-            'features', json_agg(features.feature)
+            'features', coalesce(json_agg(features.feature), '[]'::json)
         ) as result from (
             select json_build_object(
                 'type', 'Feature',
@@ -97,22 +162,28 @@ class PublicSignalMapViewSet(ViewSet):
                 signals_location l,
                 signals_status status
             where
-                s.location_id = l.id
-                and s.status_id = status.id
-                and status.state not in ('{workflow.AFGEHANDELD}', '{workflow.AFGEHANDELD_EXTERN}', '{workflow.GEANNULEERD}', '{workflow.VERZOEK_TOT_HEROPENEN}')
+                {where_clause}
             order by s.id desc
-            limit 4000 offset 0
+            limit %(limit)s offset 0
         ) as features
-        """ # noqa
+        """
+
+        with connection.cursor() as cursor:
+            try:
+                cursor.execute(fast_query, sql_params)
+                row = cursor.fetchone()
+            except Exception as e:
+                logger.error('failed to retrieve signals json from db', exc_info=e)
+                raise
+        return row[0]
+
+    def list(self, request, *args, **kwargs):
+        serializer = PublicSignalMapQuerySerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        params = serializer.validated_data
 
-        cursor = connection.cursor()
-        try:
-            cursor.execute(fast_query)
-            row = cursor.fetchone()
-            return Response(row[0])
-        except Exception as e:
-            cursor.close
-            logger.error('failed to retrieve signals json from db', exc_info=e)
+        feature_collection = self.map_cache.get_or_set(lambda: self._get_feature_collection(params), params=params)
+        return Response(feature_collection)
 
     def get_view_name(self):
         # Overridden to avoid: "Public Signal Map List" that is the default behavior here.
@@ -150,6 +221,68 @@ class PrivateSignalViewSet(mixins.CreateModelMixin, mixins.UpdateModelMixin, Dat
         'location'
     ).all()
 
+    # Vector tiles are cached per user and filter, the cache is invalidated when Signals are created or changed (see
+    # signals.apps.api.signal_receivers)
+    tile_cache = VersionedCache(namespace='private-signal-tiles', timeout=settings.SIGNAL_TILES_CACHE_TIMEOUT)
+
+    # Same for the facets
+    facets_cache = VersionedCache(namespace='private-signal-facets', timeout=settings.SIGNAL_FACETS_CACHE_TIMEOUT)
+
+    # Facet name (the name of the filter) -> column, counted in one query using grouping sets (see facets)
+    signal_facet_columns = {
+        'status': 'status.state',
+        'maincategory_slug': 'maincat.slug',
+        'category_slug': 'cat.slug',
+        'stadsdeel': 'l.stadsdeel',
+        'priority': 'p.priority',
+        'type': 't.name',
+    }
+    signal_facets_from = """
+        signals_signal s
+        left join signals_status status on s.status_id = status.id
+        left join signals_categoryassignment ca on s.category_assignment_id = ca.id
+        left join signals_category cat on ca.category_id = cat.id
+        left join signals_category maincat on cat.parent_id = maincat.id
+        left join signals_location l on s.location_id = l.id
+        left join signals_priority p on s.priority_id = p.id
+        left join signals_type t on s.type_assignment_id = t.id
+    """
+    current_state_facet_columns = {
+        'status': 'cs.state',
+        'maincategory_slug': 'cs.parent_category_slug',
+        'category_slug': 'cs.category_slug',
+        'stadsdeel': 'cs.stadsdeel',
+        'priority': 'cs.priority',
+        'type': 'cs.type',
+    }
+    current_state_facets_from = """
+        signals_signal s join signals_signalcurrentstate cs on cs._signal_id = s.id
+    """
+
+    # Columns of the export (next to the id), annotations that would clash with a field of the Signal are prefixed
+    # with an underscore (the underscore is removed in the export)
+    export_columns = {
+        'signal_uuid': F('uuid'),
+        '_source': F('source'),
+        '_text': F('text'),
+        '_text_extra': F('text_extra'),
+        '_incident_date_start': F('incident_date_start'),
+        '_incident_date_end': F('incident_date_end'),
+        '_created_at': F('created_at'),
+        '_updated_at': F('updated_at'),
+        '_status': F('status__state'),
+        'main_category': F('category_assignment__category__parent__slug'),
+        'sub_category': F('category_assignment__category__slug'),
+        '_priority': F('priority__priority'),
+        '_type': F('type_assignment__name'),
+        'stadsdeel': F('location__stadsdeel'),
+        'address': F('location__address_text'),
+        'lon': Func('location__geometrie', function='ST_X', output_field=FloatField()),
+        'lat': Func('location__geometrie', function='ST_Y', output_field=FloatField()),
+        'assigned_user_email': F('user_assignment__user__email'),
+        '_parent': F('parent_id'),
+    }
+
     serializer_class = PrivateSignalSerializerList
     serializer_detail_class = PrivateSignalSerializerDetail
 
@@ -160,7 +293,6 @@ class PrivateSignalViewSet(mixins.CreateModelMixin, mixins.UpdateModelMixin, Dat
     object_permission_classes = (SignalViewObjectPermission, )
 
     filter_backends = (DjangoFilterBackend, FieldMappingOrderingFilter, )
-    filterset_class = SignalFilterSet
 
     ordering = ('-created_at', )
     ordering_fields = (
@@ -175,7 +307,7 @@ class PrivateSignalViewSet(mixins.CreateModelMixin, mixins.UpdateModelMixin, Dat
         'address',
         'assigned_user_email',
     )
-    ordering_field_mappings = {
+    signal_ordering_field_mappings = {
         'id': 'id',
         'created_at': 'created_at',
         'updated_at': 'updated_at',
@@ -187,9 +319,45 @@ class PrivateSignalViewSet(mixins.CreateModelMixin, mixins.UpdateModelMixin, Dat
         'address': 'location__address_text',
         'assigned_user_email': 'user_assignment__user__email',
     }
+    current_state_ordering_field_mappings = {
+        'id': 'id',
+        'created_at': 'current_state__created_at',
+        'updated_at': 'current_state__updated_at',
+        'stadsdeel': 'current_state__stadsdeel',
+        'sub_category': 'current_state__category_slug',
+        'main_category': 'current_state__parent_category_slug',
+        'status': 'current_state__state',
+        'priority': 'current_state__priority',
+        'address': 'current_state__address_text',
+        'assigned_user_email': 'current_state__assigned_user_email',
+    }
 
     http_method_names = ['get', 'post', 'patch', 'head', 'options', 'trace']
 
+    @staticmethod
+    def _use_current_state():
+        # Filter and order on the denormalized SignalCurrentState instead of joining all related tables
+        return settings.FEATURE_FLAGS.get('API_USE_SIGNAL_CURRENT_STATE', False)
+
+    @property
+    def filterset_class(self):
+        return SignalCurrentStateFilterSet if self._use_current_state() else SignalFilterSet
+
+    @property
+    def ordering_field_mappings(self):
+        if self._use_current_state():
+            return self.current_state_ordering_field_mappings
+        return self.signal_ordering_field_mappings
+
+    @property
+    def paginator(self):
+        # Opt-in keyset pagination of the list, used when the "cursor" query parameter is present (empty for the
+        # first page)
+        if (not hasattr(self, '_paginator') and self.action == 'list' and
+                HALKeysetPagination.cursor_query_param in self.request.query_params):
+            self._paginator = HALKeysetPagination()
+        return super().paginator
+
     def get_queryset(self, *args, **kwargs):
         if self._is_request_to_detail_endpoint():
             return super().get_queryset(*args, **kwargs)
@@ -228,6 +396,13 @@ class PrivateSignalViewSet(mixins.CreateModelMixin, mixins.UpdateModelMixin, Dat
             'id'  # Oldest Signals first
         )
 
+        if request.query_params.get('cluster', False) in settings.TRUE_VALUES:
+            # Server side clustering, returns the number of Signals per cluster in one (unpaginated) response
+            zoom = request.query_params.get('zoom', '')
+            if not zoom.isdigit() or int(zoom) > MAX_ZOOM:
+                raise ValidationError({'zoom': [f'A valid zoom level (0 - {MAX_ZOOM}) is required when clustering.']})
+            return Response(get_clusters(filtered_qs, 'location__geometrie', zoom))
+
         paginator = LinkHeaderPagination(page_query_param='geopage', page_size=4000)  # noqa page_size = 2.5 times the average signals made in a day, at this moment the highest average is 1600
         page = paginator.paginate_queryset(filtered_qs, self.request, view=self)
         if page is not None:
@@ -237,6 +412,91 @@ class PrivateSignalViewSet(mixins.CreateModelMixin, mixins.UpdateModelMixin, Dat
         serializer = SignalGeoSerializer(filtered_qs, many=True)
         return Response(serializer.data)
 
+    @action(detail=False, url_path=r'geography/(?P<z>\d+)/(?P<x>\d+)/(?P<y>\d+)\.pbf',
+            renderer_classes=(MVTRenderer, ))
+    def geography_tile(self, request, z, x, y):
+        """
+        Mapbox Vector Tile of the Signals, the same filters as the geography endpoint can be used.
+        """
+        params = {'user': request.user.pk, 'query': dict(request.query_params.lists()), 'tile': (z, x, y)}
+
+        def _get_tile():
+            filtered_qs = self.filter_queryset(self.geography_queryset.filter_for_user(user=request.user))
+            return get_vector_tile(filtered_qs, 'location__geometrie', 'signals', z, x, y, fields=('id', 'created_at'))
+
+        return Response(self.tile_cache.get_or_set(_get_tile, params=params))
+
+    def _get_facets(self, queryset):
+        if self._use_current_state():
+            columns, from_clause = self.current_state_facet_columns, self.current_state_facets_from
+        else:
+            columns, from_clause = self.signal_facet_columns, self.signal_facets_from
+
+        # The filtered and permission restricted Signals are counted once per facet value, and once in total
+        signal_ids_sql, sql_params = queryset.order_by().values('pk').query.sql_with_params()
+        facets_query = f"""
+        select
+            {', '.join(columns.values())},
+            {', '.join(f'grouping({column})' for column in columns.values())},
+            count(*)
+        from {from_clause}
+        where s.id in ({signal_ids_sql})
+        group by grouping sets ({', '.join(f'({column})' for column in columns.values())}, ())
+        """
+
+        with connection.cursor() as cursor:
+            cursor.execute(facets_query, sql_params)
+            rows = cursor.fetchall()
+
+        n_columns = len(columns)
+        facets = {name: [] for name in columns.keys()}
+        total = 0
+        for row in rows:
+            values, groupings, count = row[:n_columns], row[n_columns:-1], row[-1]
+            if all(groupings):
+                total = count
+                continue
+
+            idx = groupings.index(0)
+            facets[list(columns.keys())[idx]].append({'value': values[idx], 'count': count})
+
+        for values in facets.values():
+            values.sort(key=lambda value: (-value['count'], value['value'] or ''))
+        return {'count': total, 'facets': facets}
+
+    @action(detail=False, url_path=r'facets/?$')
+    def facets(self, request):
+        """
+        The number of Signals per status, category, stadsdeel, priority and type. The same filters as the list endpoint
+        can be used, only the Signals the user has access to are counted.
+        """
+        params = {'user': request.user.pk, 'query': dict(request.query_params.lists())}
+
+        def _get_facets():
+            return self._get_facets(self.filter_queryset(self.get_queryset()))
+
+        return Response(self.facets_cache.get_or_set(_get_facets, params=params))
+
+    @action(detail=False, url_path=r'export/(?P<export_format>csv|ndjson)/?$',
+            permission_classes=(SIAExportPermissions, ))
+    def export(self, request, export_format):
+        """
+        Streams all Signals as CSV or NDJSON. The same filters as the list endpoint can be used, only the Signals the
+        user has access to are exported.
+        """
+        # The filters are validated before the response is started. The permission filter joins the departments of the
+        # routing, the filtered Signals are selected by primary key so that every Signal is exported once
+        filtered_queryset = self.filter_queryset(self.get_queryset())
+        queryset = Signal.objects.filter(pk__in=filtered_queryset.values('pk')).values('id', **self.export_columns)
+
+        response = StreamingHttpResponse(
+            stream_queryset(queryset, export_format, settings.SIGNAL_EXPORT_CHUNK_SIZE),
+            content_type=CONTENT_TYPES[export_format],
+        )
+        filename = f'signals-{timezone.now():%Y%m%d_%H%M%S}.{export_format}'
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+
     @action(detail=True, url_path=r'children/?$')
     def children(self, request, pk=None):
         """Show abbriged version of child signals for a given parent signal."""
@@ -6,8 +6,11 @@ from tempfile import TemporaryDirectory
 
 from django.core.management import BaseCommand
 
+from signals.apps.api.v1.views import PublicAreasViewSet
 from signals.apps.dataset import sources
 from signals.apps.dataset.base import AreaLoader
+from signals.apps.services.domain.dsl import SignalDslService
+from signals.apps.signals.utils.area_index import AreaIndex
 
 
 class Command(BaseCommand):
@@ -53,4 +56,9 @@ class Command(BaseCommand):
             loader = data_loaders[type_string](**options)
             loader.load()
 
+        # Cached vector tiles, the in memory index of the areas and the compiled routing rules are no longer valid
+        PublicAreasViewSet.tile_cache.invalidate()
+        AreaIndex.invalidate()
+        SignalDslService().invalidate()
+
         self.stdout.write('...done.')
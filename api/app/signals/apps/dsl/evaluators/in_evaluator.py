@@ -1,6 +1,7 @@
 # SPDX-License-Identifier: MPL-2.0
 # Copyright (C) 2020 - 2021 Vereniging van Nederlandse Gemeenten, Gemeente Amsterdam
 from django.contrib.gis import geos
+from django.contrib.gis.geos.prepared import PreparedGeometry
 
 from signals.apps.dsl.evaluators.evaluator import Evaluator
 
@@ -50,6 +51,9 @@ class InEvaluator(Evaluator):
                     rhs_val = rhs_val[prop.evaluate(ctx)]
             except KeyError:
                 raise Exception("Could not resolve {prop}".format(prop=".".join(self.rhs_prop)))
+        if isinstance(rhs_val, PreparedGeometry):
+            # Prepared geometries are provided by the compiled routing rules (see SignalDslService)
+            return rhs_val.contains(lhs_val)
         if type(rhs_val) is not geos.MultiPolygon:
             self._raise_type_error(exp=type(geos.MultiPolygon), act=type(rhs_val))
         return rhs_val.contains(lhs_val)
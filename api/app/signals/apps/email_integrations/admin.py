@@ -4,7 +4,7 @@ from django import forms
 from django.contrib import admin, messages
 from django.core.exceptions import ValidationError
 
-from signals.apps.email_integrations.models import EmailTemplate
+from signals.apps.email_integrations.models import EmailTemplate, OutgoingEmail
 from signals.apps.email_integrations.utils import validate_email_template, validate_template
 
 
@@ -47,3 +47,13 @@ class EmailTemplate(admin.ModelAdmin):
     def save_model(self, request, obj, form, change):
         obj.created_by = request.user.email
         super().save_model(request, obj, form, change)
+
+
+@admin.register(OutgoingEmail)
+class OutgoingEmailAdmin(admin.ModelAdmin):
+    list_display = ('id', '__str__', 'status', 'attempts', 'created_at', 'sent_at', )
+    list_filter = ('status', )
+    readonly_fields = ('message', 'status', 'attempts', 'next_attempt_at', 'sent_at', 'error', )
+
+    def has_add_permission(self, request):
+        return False
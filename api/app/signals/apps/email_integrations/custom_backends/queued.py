@@ -0,0 +1,21 @@
+# SPDX-License-Identifier: MPL-2.0
+# Copyright (C) 2021 Gemeente Amsterdam
+from django.core.mail.backends.base import BaseEmailBackend
+from django.db import transaction
+
+from signals.apps.email_integrations.models import OutgoingEmail
+from signals.apps.email_integrations.tasks import schedule_deliver_emails
+
+
+class QueuedEmailBackend(BaseEmailBackend):
+    """
+    Queues the e-mail messages in the OutgoingEmail table, they are delivered in batches over a single connection
+    using the EMAIL_DELIVERY_BACKEND (see signals.apps.email_integrations.tasks.deliver_emails)
+    """
+    def send_messages(self, email_messages):
+        if not email_messages:
+            return 0
+
+        OutgoingEmail.objects.add(email_messages)
+        transaction.on_commit(schedule_deliver_emails)
+        return len(email_messages)
@@ -2,14 +2,16 @@
 # Copyright (C) 2021 Gemeente Amsterdam
 import copy
 import logging
-from typing import Any
+from typing import Any, Union
 
 from django.conf import settings
 from django.core.mail import send_mail as django_send_mail
-from django.template import Context, Template, loader
+from django.db.models import BooleanField, Case, Q, Value, When
+from django.template import Context
 from django.utils.text import slugify
 
 from signals.apps.email_integrations.models import EmailTemplate
+from signals.apps.email_integrations.template_cache import EmailTemplateCache
 from signals.apps.email_integrations.utils import make_email_context
 from signals.apps.signals.models import Signal
 
@@ -17,27 +19,58 @@ logger = logging.getLogger(__name__)
 
 
 class MailActions:
+    """
+    Applies the mail rules to a Signal.
+
+    The rules are compiled once (MailActions is instantiated once per worker, see tasks.py). The filters of all rules
+    are folded into a single query that loads the Signal together with everything the functions of the rules need,
+    the functions are evaluated in memory against this snapshot of the Signal.
+    """
     _from_email = settings.DEFAULT_FROM_EMAIL
+    _template_cache = EmailTemplateCache()
 
     def __init__(self, mail_rules: list = []) -> None:
         self._conditions = {}
         self._kwargs = {}
         self._additional_info = {}
+        self._filter_annotations = {}
 
-        for config in mail_rules:
+        for index, config in enumerate(mail_rules):
             key = slugify(config['name'])
 
             self._conditions[key] = config['conditions'] if 'conditions' in config else {}
             self._kwargs[key] = config['kwargs'] if 'kwargs' in config else {}
             self._additional_info[key] = config['additional_info'] if 'additional_info' in config else {}
 
-    def _apply_filters(self, filters: dict, signal: Signal) -> bool:
-        try:
-            Signal.objects.filter(**filters).get(pk=signal.pk)
-            return True
-        except Signal.DoesNotExist:
-            pass
-        return False
+            filters = self._conditions[key]['filters'] if 'filters' in self._conditions[key] else {}
+            self._filter_annotations[key] = (f'_mail_rule_{index}', self._compile_filters(filters=filters))
+
+    def _compile_filters(self, filters: dict) -> Union[Case, Value]:
+        # The filters of a rule as a boolean annotation, True if the Signal matches all filters
+        if not filters:
+            return Value(True, output_field=BooleanField())
+        return Case(When(Q(**filters), then=Value(True)), default=Value(False), output_field=BooleanField())
+
+    def _get_signal(self, signal_id: int) -> Signal:
+        """
+        Loads the Signal with the result of the filters of all rules annotated, and the related objects used by the
+        functions of the rules and the mail context (one query, and one query for the statuses)
+        """
+        return Signal.objects.select_related(
+            'status',
+            'reporter',
+            'location',
+            'parent__status',
+            'category_assignment__category',
+        ).prefetch_related(
+            'statuses',
+        ).annotate(
+            **dict(self._filter_annotations.values())
+        ).get(pk=signal_id)
+
+    def _apply_filters(self, key: str, signal: Signal) -> bool:
+        annotation_name, _ = self._filter_annotations[key]
+        return getattr(signal, annotation_name)
 
     def _apply_functions(self, functions: dict, signal: Signal) -> bool:
         return all([
@@ -45,17 +78,20 @@ class MailActions:
             for _, function in functions.items()
         ])
 
-    def _apply_conditions(self, conditions: dict, signal: Signal) -> Any:
-        filters = conditions['filters'] if 'filters' in conditions else {}
+    def _apply_conditions(self, key: str, conditions: dict, signal: Signal) -> Any:
         functions = conditions['functions'] if 'functions' in conditions else {}
 
-        return (self._apply_filters(filters=filters, signal=signal) and
+        return (self._apply_filters(key=key, signal=signal) and
                 self._apply_functions(functions=functions, signal=signal))
 
     def _get_actions(self, signal: Signal) -> list:
+        if not all(hasattr(signal, annotation_name) for annotation_name, _ in self._filter_annotations.values()):
+            # Not a Signal loaded by _get_signal
+            signal = self._get_signal(signal_id=signal.pk)
+
         found_actions_to_apply = []
         for key, conditions in self._conditions.items():
-            if self._apply_conditions(conditions=conditions, signal=signal):
+            if self._apply_conditions(key=key, conditions=conditions, signal=signal):
                 found_actions_to_apply.append(key)
         return found_actions_to_apply
 
@@ -70,27 +106,27 @@ class MailActions:
         context = self._get_mail_context(signal=signal, mail_kwargs=mail_kwargs)
 
         try:
-            email_template = EmailTemplate.objects.get(key=mail_kwargs['key'])
+            email_template = self._template_cache.get(key=mail_kwargs['key'])
 
             # do not escape as subject is not rendered as HTML
-            subject = Template(email_template.title).render(Context(context, autoescape=False))
+            subject = email_template.title.render(Context(context, autoescape=False))
 
             rendered_context = {
-                'subject': Template(email_template.title).render(Context(context)),
+                'subject': email_template.title.render(Context(context)),
 
                 # do not escape HTML as this is handled by Markdown filter
-                'body': Template(email_template.body).render(Context(context, autoescape=False))
+                'body': email_template.body.render(Context(context, autoescape=False))
             }
 
-            html_message = loader.get_template('email/_base.html').render(rendered_context)
-            message = loader.get_template('email/_base.txt').render(rendered_context)
+            html_message = self._template_cache.get_base_template('email/_base.html').render(rendered_context)
+            message = self._template_cache.get_base_template('email/_base.txt').render(rendered_context)
         except EmailTemplate.DoesNotExist:
             logger.warning(f'EmailTemplate {mail_kwargs["key"]} does not exists')
 
             # A mail needs to be sent, so if there is no template in the DB we sent a default simple e-mail message
             subject = mail_kwargs['subject'].format(signal_id=signal.id)
-            message = loader.get_template('email/signal_default.txt').render(context)
-            html_message = loader.get_template('email/signal_default.html').render(context)
+            message = self._template_cache.get_base_template('email/signal_default.txt').render(context)
+            html_message = self._template_cache.get_base_template('email/signal_default.html').render(context)
 
         return django_send_mail(subject=subject, message=message, from_email=self._from_email,
                                 recipient_list=[signal.reporter.email, ], html_message=html_message)
@@ -101,7 +137,7 @@ class MailActions:
         Signal.actions.create_note(data=data, signal=signal)
 
     def apply(self, signal_id: int, send_mail: bool = True) -> None:
-        signal = Signal.objects.get(pk=signal_id)
+        signal = self._get_signal(signal_id=signal_id)
 
         actions = self._get_actions(signal=signal)
         for action in actions:
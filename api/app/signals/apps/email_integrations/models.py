@@ -1,8 +1,14 @@
 # SPDX-License-Identifier: MPL-2.0
 # Copyright (C) 2020 - 2021 Vereniging van Nederlandse Gemeenten, Gemeente Amsterdam
+from datetime import timedelta
+
+from django.conf import settings
 from django.contrib.gis.db import models
+from django.utils import timezone
+from djcelery_email.utils import email_to_dict
 
 from signals.apps.signals.models.mixins import CreatedUpdatedModel
+from signals.utils.claim import claim, renew_claim
 
 
 class EmailTemplate(CreatedUpdatedModel):
@@ -31,3 +37,89 @@ class EmailTemplate(CreatedUpdatedModel):
 
     def __str__(self):
         return self.title
+
+
+class OutgoingEmailManager(models.Manager):
+    def add(self, email_messages):
+        """
+        Queue the e-mail messages for delivery
+        """
+        return self.bulk_create([self.model(message=email_to_dict(email_message)) for email_message in email_messages])
+
+    def take(self, limit, lock_timeout):
+        """
+        Claim at most limit pending e-mails that are due for lock_timeout seconds and return them.
+
+        The e-mails are delivered after the claim is committed. An e-mail whose result is not recorded within
+        lock_timeout seconds (the delivery was interrupted) is taken again by a next delivery.
+        """
+        # The claim moves the next attempt to the end of the lock timeout
+        outgoing_email_ids, _ = claim(self.model, where='status = %(status)s and next_attempt_at <= %(now)s',
+                                      order_by='next_attempt_at, id', limit=limit, lock_timeout=lock_timeout,
+                                      claim_field='next_attempt_at', attempts_field='attempts',
+                                      params={'status': self.model.PENDING})
+        return list(self.filter(id__in=outgoing_email_ids).order_by('pk'))
+
+
+class OutgoingEmail(CreatedUpdatedModel):
+    """
+    An e-mail message queued by the QueuedEmailBackend.
+
+    The queued messages are delivered in batches over a single connection (see tasks.deliver_emails), the result of
+    every attempt is recorded. A message that could not be delivered is retried with an increasing delay until
+    EMAIL_DELIVERY_MAX_ATTEMPTS attempts have been made.
+    """
+    PENDING = 'pending'
+    SENT = 'sent'
+    FAILED = 'failed'
+
+    STATUS_CHOICES = [
+        (PENDING, 'Pending'),
+        (SENT, 'Sent'),
+        (FAILED, 'Failed'),
+    ]
+
+    message = models.JSONField()  # The message as serialized by djcelery_email.utils.email_to_dict
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    sent_at = models.DateTimeField(null=True, blank=True)
+    error = models.TextField(blank=True, default='')
+
+    objects = OutgoingEmailManager()
+
+    class Meta:
+        verbose_name = 'Uitgaande e-mail'
+        verbose_name_plural = 'Uitgaande e-mails'
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at']),
+        ]
+
+    def __str__(self):
+        return f'{self.message.get("subject", "")} ({self.status})'
+
+    def renew_claim(self, lock_timeout):
+        """
+        Extend the claim of a taken e-mail, returns False if the claim expired and the e-mail was taken by another
+        delivery
+        """
+        claimed_until = renew_claim(OutgoingEmail.objects.filter(pk=self.pk), self.next_attempt_at, lock_timeout,
+                                    claim_field='next_attempt_at')
+        if claimed_until is None:
+            return False
+
+        self.next_attempt_at = claimed_until
+        return True
+
+    def mark_sent(self):
+        self.status = self.SENT
+        self.sent_at = timezone.now()
+        self.error = ''
+
+    def mark_failed(self, error):
+        self.error = str(error)
+        if self.attempts >= settings.EMAIL_DELIVERY_MAX_ATTEMPTS:
+            self.status = self.FAILED
+        else:
+            retry_delay = settings.EMAIL_DELIVERY_RETRY_DELAY * 2 ** (self.attempts - 1)
+            self.next_attempt_at = timezone.now() + timedelta(seconds=retry_delay)
@@ -1,12 +1,30 @@
 # SPDX-License-Identifier: MPL-2.0
 # Copyright (C) 2020 - 2021 Gemeente Amsterdam
-from django.db.models import Q
-
 from signals.apps.email_integrations.models import EmailTemplate
 from signals.apps.email_integrations.utils import _create_feedback_and_mail_context
 from signals.apps.signals import workflow
 from signals.apps.signals.models import Signal
 
+# The functions of the rules are evaluated in memory, MailActions loads the Signal with its status, parent (and the
+# status of the parent) and all statuses prefetched. So no extra queries are needed to evaluate the rules.
+
+
+def _prev_status_gemeld_only_once(signal: Signal) -> bool:
+    return len([status for status in signal.statuses.all() if status.state == workflow.GEMELD]) == 1
+
+
+def _prev_status_not_in(signal: Signal) -> bool:
+    previous_statuses = [status for status in signal.statuses.all() if status.id != signal.status_id]
+    previous_status = max(previous_statuses, key=lambda status: status.created_at, default=None)
+    return (previous_status.state if previous_status else None) not in [workflow.VERZOEK_TOT_HEROPENEN, ]
+
+
+def _no_children(signal: Signal) -> bool:
+    # SIG-2931, special case for children of split signal --- still needed for historical data
+    return (signal.parent_id is None or
+            (signal.parent.status is not None and signal.parent.status.state == workflow.GESPLITST))
+
+
 SIGNAL_MAIL_RULES = [
     {
         'name': 'Send mail signal created',
@@ -17,12 +35,8 @@ SIGNAL_MAIL_RULES = [
                 'reporter__email__gt': 0,
             },
             'functions': {
-                'prev_status_gemeld_only_once': lambda signal: signal.statuses.filter(
-                    state=workflow.GEMELD
-                ).count() == 1,
-                'no_children': lambda signal: Signal.objects.filter(id=signal.id).filter(
-                    Q(parent_id__isnull=True) | Q(parent__status__state__exact=workflow.GESPLITST)
-                )  # SIG-2931, special case for children of split signal --- still needed for historical data
+                'prev_status_gemeld_only_once': _prev_status_gemeld_only_once,
+                'no_children': _no_children,
             }
         },
         'kwargs': {
@@ -43,17 +57,8 @@ SIGNAL_MAIL_RULES = [
                 'reporter__email__gt': 0,
             },
             'functions': {
-                'prev_status_not_in': lambda signal: signal.statuses.exclude(
-                    id=signal.status_id
-                ).order_by(
-                    '-created_at'
-                ).values_list(
-                    'state',
-                    flat=True
-                ).first() not in [workflow.VERZOEK_TOT_HEROPENEN, ],
-                'no_children': lambda signal: Signal.objects.filter(id=signal.id).filter(
-                    Q(parent_id__isnull=True) | Q(parent__status__state__exact=workflow.GESPLITST)
-                )  # SIG-2931, special case for children of split signal --- still needed for historical data
+                'prev_status_not_in': _prev_status_not_in,
+                'no_children': _no_children,
             }
         },
         'kwargs': {
@@ -74,9 +79,7 @@ SIGNAL_MAIL_RULES = [
                 'reporter__email__gt': 0,
             },
             'functions': {
-                'no_children': lambda signal: Signal.objects.filter(id=signal.id).filter(
-                    Q(parent_id__isnull=True) | Q(parent__status__state__exact=workflow.GESPLITST)
-                )  # SIG-2931, special case for children of split signal --- still needed for historical data
+                'no_children': _no_children,
             }
         },
         'kwargs': {
@@ -96,9 +99,7 @@ SIGNAL_MAIL_RULES = [
                 'reporter__email__gt': 0,
             },
             'functions': {
-                'no_children': lambda signal: Signal.objects.filter(id=signal.id).filter(
-                    Q(parent_id__isnull=True) | Q(parent__status__state__exact=workflow.GESPLITST)
-                )  # SIG-2931, special case for children of split signal --- still needed for historical data
+                'no_children': _no_children,
             }
         },
         'kwargs': {
@@ -127,9 +128,7 @@ SIGNAL_MAIL_RULES = [
                 'status__send_email__exact': True,  # on create_initial this is False (model default)
             },
             'functions': {
-                'no_children': lambda signal: Signal.objects.filter(id=signal.id).filter(
-                    Q(parent_id__isnull=True) | Q(parent__status__state__exact=workflow.GESPLITST)
-                )  # SIG-2931, special case for children of split signal --- still needed for historical data
+                'no_children': _no_children,
             }
         },
         'kwargs': {
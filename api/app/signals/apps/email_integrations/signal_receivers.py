@@ -1,16 +1,25 @@
 # SPDX-License-Identifier: MPL-2.0
 # Copyright (C) 2019 - 2021 Gemeente Amsterdam
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 
 from signals.apps.email_integrations import tasks
+from signals.apps.email_integrations.models import EmailTemplate
+from signals.apps.email_integrations.template_cache import EmailTemplateCache
 from signals.apps.signals.managers import create_initial, update_status
+from signals.apps.signals.outbox import outbox_receiver
 
 
-@receiver(create_initial, dispatch_uid='reporter_email_integrations_create_initial')
+@outbox_receiver(create_initial, dispatch_uid='reporter_email_integrations_create_initial')
 def create_initial_handler(sender, signal_obj, *args, **kwargs):
     tasks.send_mail_reporter.delay(pk=signal_obj.pk)
 
 
-@receiver(update_status, dispatch_uid='core_email_integrations_update_status')
+@outbox_receiver(update_status, dispatch_uid='core_email_integrations_update_status')
 def update_status_handler(sender, signal_obj, status, prev_status, *args, **kwargs):
     tasks.send_mail_reporter.delay(pk=signal_obj.pk)
+
+
+@receiver([post_save, post_delete], sender=EmailTemplate, dispatch_uid='email_integrations_email_template_changed')
+def invalidate_email_template_cache_handler(sender, **kwargs):
+    EmailTemplateCache.invalidate()
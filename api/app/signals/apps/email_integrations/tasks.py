@@ -1,10 +1,113 @@
 # SPDX-License-Identifier: MPL-2.0
 # Copyright (C) 2021 Gemeente Amsterdam
+import logging
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.mail import get_connection
+from djcelery_email.utils import dict_to_email
+
 from signals.apps.email_integrations.mail_actions import MailActions
+from signals.apps.email_integrations.models import OutgoingEmail
 from signals.apps.email_integrations.reporter_rules import SIGNAL_MAIL_RULES
 from signals.celery import app
 
+logger = logging.getLogger(__name__)
+
+# The mail rules are compiled once per worker
+mail_actions = MailActions(mail_rules=SIGNAL_MAIL_RULES)
+
 
 @app.task
 def send_mail_reporter(pk):
-    MailActions(mail_rules=SIGNAL_MAIL_RULES).apply(signal_id=pk)
+    mail_actions.apply(signal_id=pk)
+
+
+def _close_connection(connection):
+    try:
+        connection.close()
+    except Exception:
+        logger.warning('Closing the e-mail connection failed', exc_info=True)
+
+
+def _deliver_batch(outgoing_emails, lock_timeout):
+    """
+    Deliver the e-mails over a single connection, the connection is only opened again after a failure. Returns the
+    number of e-mails sent and failed.
+
+    The claim of every e-mail is extended just before it is sent, the batch is stopped when the claim expired and the
+    e-mail was taken by another delivery. The result is recorded directly after every e-mail, an interrupted delivery
+    only sends the e-mail it was sending again.
+    """
+    sent = failed = 0
+    connection = get_connection(backend=settings.EMAIL_DELIVERY_BACKEND)
+    try:
+        for outgoing_email in outgoing_emails:
+            if not outgoing_email.renew_claim(lock_timeout):
+                logger.warning(f'Claim of OutgoingEmail {outgoing_email.pk} expired, the rest of the batch is left to '
+                               f'the delivery that took it')
+                break
+
+            try:
+                connection.open()
+                connection.send_messages([dict_to_email(outgoing_email.message)])
+            except Exception as e:
+                logger.warning(f'Delivery of OutgoingEmail {outgoing_email.pk} failed: {e}')
+                outgoing_email.mark_failed(e)
+                _close_connection(connection)
+                failed += 1
+            else:
+                outgoing_email.mark_sent()
+                sent += 1
+            outgoing_email.save(update_fields=['status', 'next_attempt_at', 'sent_at', 'error', 'updated_at'])
+    finally:
+        _close_connection(connection)
+
+    return sent, failed
+
+
+@app.task
+def deliver_emails():
+    """
+    Deliver the queued e-mails in batches of EMAIL_DELIVERY_BATCH_SIZE.
+
+    The e-mails are delivered shortly after they are queued (see schedule_deliver_emails), this task is also scheduled
+    in Celery beat to make sure nothing is left behind. A batch is claimed (for EMAIL_DELIVERY_LOCK_TIMEOUT seconds)
+    before it is delivered, concurrent deliveries skip the claimed e-mails. The claim of an e-mail is extended just
+    before it is sent. No transaction is kept open while the e-mails are sent.
+    """
+    batch_size = settings.EMAIL_DELIVERY_BATCH_SIZE
+    lock_timeout = settings.EMAIL_DELIVERY_LOCK_TIMEOUT
+
+    sent = failed = 0
+    while True:
+        outgoing_emails = OutgoingEmail.objects.take(batch_size, lock_timeout)
+        if not outgoing_emails:
+            break
+
+        sent_in_batch, failed_in_batch = _deliver_batch(outgoing_emails, lock_timeout)
+        sent += sent_in_batch
+        failed += failed_in_batch
+
+    if OutgoingEmail.objects.filter(status=OutgoingEmail.PENDING).exists():
+        # E-mails that failed are retried later
+        schedule_deliver_emails(countdown=settings.EMAIL_DELIVERY_RETRY_DELAY)
+
+    logger.info(f'deliver_emails - {sent} e-mails sent, {failed} failed')
+    return sent
+
+
+def schedule_deliver_emails(countdown=None):
+    """
+    Deliver the queued e-mails after countdown (default EMAIL_DELIVERY_DELAY) seconds, unless a delivery is already
+    scheduled
+    """
+    key = 'email-integrations-deliver-emails-scheduled'
+    countdown = settings.EMAIL_DELIVERY_DELAY if countdown is None else countdown
+    if cache.add(key, True, timeout=countdown):
+        try:
+            deliver_emails.apply_async(countdown=countdown)
+        except Exception:
+            # The e-mails stay queued, they are delivered by the next delivery (scheduled in Celery beat)
+            logger.warning('Scheduling deliver_emails failed', exc_info=True)
+            cache.delete(key)
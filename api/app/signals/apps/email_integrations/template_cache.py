@@ -0,0 +1,71 @@
+# SPDX-License-Identifier: MPL-2.0
+# Copyright (C) 2021 Gemeente Amsterdam
+from collections import namedtuple
+
+from django.conf import settings
+from django.template import Template, loader
+
+from signals.apps.email_integrations.models import EmailTemplate
+from signals.utils.cache import LocalCache, VersionedCache
+
+CompiledEmailTemplate = namedtuple('CompiledEmailTemplate', ['key', 'updated_at', 'title', 'body'])
+
+
+class EmailTemplateCache:
+    """
+    Process local cache of the compiled EmailTemplates and the (file based) base templates used to render the e-mails.
+
+    All EmailTemplates are loaded at once, a template is only compiled again when its updated_at changed. The cache is
+    reloaded when an EmailTemplate is saved or deleted in any process (see signals.apps.email_integrations.
+    signal_receivers, the version is stored in the shared cache) or after EMAIL_TEMPLATE_CACHE_TIMEOUT seconds.
+    """
+    version_cache = VersionedCache(namespace='email-templates')
+
+    def __init__(self):
+        self._cache = LocalCache(self.version_cache, timeout_setting='EMAIL_TEMPLATE_CACHE_TIMEOUT')
+        self._base_templates = {}
+
+    def _is_enabled(self) -> bool:
+        return settings.FEATURE_FLAGS.get('EMAIL_TEMPLATE_CACHE_ENABLED', False)
+
+    def _compile(self, email_template: EmailTemplate) -> CompiledEmailTemplate:
+        return CompiledEmailTemplate(key=email_template.key, updated_at=email_template.updated_at,
+                                     title=Template(email_template.title), body=Template(email_template.body))
+
+    def _load(self, previous_templates):
+        previous_templates = previous_templates or {}
+
+        templates = {}
+        for email_template in EmailTemplate.objects.order_by('pk'):
+            compiled = previous_templates.get(email_template.key)
+            if compiled is None or compiled.updated_at != email_template.updated_at:
+                compiled = self._compile(email_template)
+            templates[email_template.key] = compiled
+        return templates
+
+    def get_templates(self) -> dict:
+        return self._cache.get(self._load)
+
+    def get(self, key: str) -> CompiledEmailTemplate:
+        """
+        Returns the compiled EmailTemplate with the given key, raises EmailTemplate.DoesNotExist if there is none
+        """
+        if not self._is_enabled():
+            return self._compile(EmailTemplate.objects.get(key=key))
+
+        try:
+            return self.get_templates()[key]
+        except KeyError:
+            raise EmailTemplate.DoesNotExist(f'EmailTemplate {key} does not exists')
+
+    def get_base_template(self, template_name: str):
+        if not self._is_enabled():
+            return loader.get_template(template_name)
+
+        if template_name not in self._base_templates:
+            self._base_templates[template_name] = loader.get_template(template_name)
+        return self._base_templates[template_name]
+
+    @classmethod
+    def invalidate(cls):
+        cls.version_cache.invalidate()
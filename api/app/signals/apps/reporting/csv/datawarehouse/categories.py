@@ -1,21 +1,22 @@
 # SPDX-License-Identifier: MPL-2.0
 # Copyright (C) 2020 - 2021 Gemeente Amsterdam
-import os
+from datetime import datetime
 
 from django.contrib.postgres.aggregates import StringAgg
 from django.db.models import CharField, F, Q, Value
 from django.db.models.functions import Cast, Coalesce
 
-from signals.apps.reporting.csv.utils import queryset_to_csv_file, reorder_csv
+from signals.apps.reporting.csv.utils import ExportLocation, filter_since, queryset_to_file
 from signals.apps.signals.models import CategoryAssignment, ServiceLevelObjective
 
 
-def create_category_assignments_csv(location: str) -> str:
+def create_category_assignments_csv(location: ExportLocation, since: datetime = None) -> str:
     """
     Create CSV file with all `CategoryAssignment` objects.
 
-    :param location: Directory for saving the CSV file
-    :returns: Path to CSV file
+    :param location: Directory for saving the CSV file, or the zip file the CSV file is added to
+    :param since: Only export the objects created or changed since this date/time (incremental export)
+    :returns: Path to CSV file, or the name of the CSV file in the zip file
     """
     queryset = CategoryAssignment.objects.values(
         'id',
@@ -32,21 +33,20 @@ def create_category_assignments_csv(location: str) -> str:
         'id'
     )
 
-    csv_file = queryset_to_csv_file(queryset, os.path.join(location, 'categories.csv'))
+    queryset = filter_since(queryset, since)
 
     ordered_field_names = ['id', 'main', 'sub', 'departments', 'created_at', 'updated_at', 'extra_properties',
                            '_signal_id', ]
-    reorder_csv(csv_file.name, ordered_field_names)
+    return queryset_to_file(queryset, location, 'categories.csv', ordered_field_names)
 
-    return csv_file.name
 
-
-def create_category_sla_csv(location: str) -> str:
+def create_category_sla_csv(location: ExportLocation, since: datetime = None) -> str:
     """
     Create CSV file with all `ServiceLevelObjective` objects.
 
-    :param location: Directory for saving the CSV file
-    :returns: Path to CSV file
+    :param location: Directory for saving the CSV file, or the zip file the CSV file is added to
+    :param since: Only export the objects created or changed since this date/time (incremental export)
+    :returns: Path to CSV file, or the name of the CSV file in the zip file
     """
     queryset = ServiceLevelObjective.objects.values(
         'id',
@@ -60,9 +60,7 @@ def create_category_sla_csv(location: str) -> str:
         '-created_at'
     )
 
-    csv_file = queryset_to_csv_file(queryset, os.path.join(location, 'sla.csv'))
+    queryset = filter_since(queryset, since, field_name='created_at')
 
     ordered_field_names = ['id', 'main', 'sub', 'n_days', 'use_calendar_days', 'created_at', ]
-    reorder_csv(csv_file.name, ordered_field_names)
-
-    return csv_file.name
+    return queryset_to_file(queryset, location, 'sla.csv', ordered_field_names)
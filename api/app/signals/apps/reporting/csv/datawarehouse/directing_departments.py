@@ -1,19 +1,20 @@
 # SPDX-License-Identifier: MPL-2.0
 # Copyright (C) 2020 - 2021 Gemeente Amsterdam
-import os
+from datetime import datetime
 
 from django.contrib.postgres.aggregates import StringAgg
 
-from signals.apps.reporting.csv.utils import queryset_to_csv_file, reorder_csv
+from signals.apps.reporting.csv.utils import ExportLocation, filter_since, queryset_to_file
 from signals.apps.signals.models import SignalDepartments
 
 
-def create_directing_departments_csv(location: str) -> str:
+def create_directing_departments_csv(location: ExportLocation, since: datetime = None) -> str:
     """
     Create CSV file with all `DirectingDepartments` objects.
 
-    :param location: Directory for saving the CSV file
-    :returns: Path to CSV file
+    :param location: Directory for saving the CSV file, or the zip file the CSV file is added to
+    :param since: Only export the objects created or changed since this date/time (incremental export)
+    :returns: Path to CSV file, or the name of the CSV file in the zip file
     """
     queryset = SignalDepartments.objects.values(
         'id',
@@ -26,9 +27,7 @@ def create_directing_departments_csv(location: str) -> str:
         '-created_at',
     )
 
-    csv_file = queryset_to_csv_file(queryset, os.path.join(location, 'directing_departments.csv'))
+    queryset = filter_since(queryset, since)
 
     ordered_field_names = ['id', 'created_at', 'updated_at', '_signal_id', 'departments', ]
-    reorder_csv(csv_file.name, ordered_field_names)
-
-    return csv_file.name
+    return queryset_to_file(queryset, location, 'directing_departments.csv', ordered_field_names)
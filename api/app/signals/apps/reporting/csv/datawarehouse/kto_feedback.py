@@ -1,17 +1,24 @@
 # SPDX-License-Identifier: MPL-2.0
 # Copyright (C) 2020 - 2021 Gemeente Amsterdam
 import os
+from datetime import datetime
 
 from signals.apps.feedback.models import Feedback
-from signals.apps.reporting.csv.utils import map_choices, queryset_to_csv_file, reorder_csv
+from signals.apps.reporting.csv.utils import (
+    ExportLocation,
+    filter_since,
+    map_choices,
+    queryset_to_file
+)
 
 
-def create_kto_feedback_csv(location: str) -> str:
+def create_kto_feedback_csv(location: ExportLocation, since: datetime = None) -> str:
     """
     Create CSV file with all `Feedback` objects.
 
-    :param location: Directory for saving the CSV file
-    :returns: Path to CSV file
+    :param location: Directory for saving the CSV file, or the zip file the CSV file is added to
+    :param since: Only export the objects created or changed since this date/time (incremental export)
+    :returns: Path to CSV file, or the name of the CSV file in the zip file
     """
     environment = os.getenv('ENVIRONMENT')
 
@@ -33,10 +40,8 @@ def create_kto_feedback_csv(location: str) -> str:
         _allows_contact=map_choices('allows_contact', [(True, 'True'), (False, 'False')]),
     ).filter(submitted_at__isnull=False)
 
-    csv_file = queryset_to_csv_file(queryset, os.path.join(location, file_name))
+    queryset = filter_since(queryset, since, field_name='submitted_at')
 
     ordered_field_names = ['_signal_id', 'is_satisfied', 'allows_contact', 'text', 'text_extra', 'created_at',
                            'submitted_at', ]
-    reorder_csv(csv_file.name, ordered_field_names)
-
-    return csv_file.name
+    return queryset_to_file(queryset, location, file_name, ordered_field_names)
@@ -1,20 +1,26 @@
 # SPDX-License-Identifier: MPL-2.0
 # Copyright (C) 2020 - 2021 Gemeente Amsterdam
-import os
+from datetime import datetime
 
 from django.db.models import CharField, ExpressionWrapper, FloatField, Func, Value
 from django.db.models.functions import Cast, Coalesce
 
-from signals.apps.reporting.csv.utils import map_choices, queryset_to_csv_file, reorder_csv
+from signals.apps.reporting.csv.utils import (
+    ExportLocation,
+    filter_since,
+    map_choices,
+    queryset_to_file
+)
 from signals.apps.signals.models import STADSDELEN, Location
 
 
-def create_locations_csv(location: str) -> str:
+def create_locations_csv(location: ExportLocation, since: datetime = None) -> str:
     """
     Create CSV file with all `Location` objects.
 
-    :param location: Directory for saving the CSV file
-    :returns: Path to CSV file
+    :param location: Directory for saving the CSV file, or the zip file the CSV file is added to
+    :param since: Only export the objects created or changed since this date/time (incremental export)
+    :returns: Path to CSV file, or the name of the CSV file in the zip file
     """
     queryset = Location.objects.values(
         'id',
@@ -33,10 +39,8 @@ def create_locations_csv(location: str) -> str:
         'id'
     )
 
-    csv_file = queryset_to_csv_file(queryset, os.path.join(location, 'locations.csv'))
+    queryset = filter_since(queryset, since)
 
     ordered_field_names = ['id', 'lat', 'lng', 'stadsdeel', 'buurt_code', 'address', 'address_text', 'created_at',
                            'updated_at', 'extra_properties', '_signal_id', ]
-    reorder_csv(csv_file.name, ordered_field_names)
-
-    return csv_file.name
+    return queryset_to_file(queryset, location, 'locations.csv', ordered_field_names)
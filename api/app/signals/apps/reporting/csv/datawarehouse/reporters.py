@@ -1,19 +1,25 @@
 # SPDX-License-Identifier: MPL-2.0
 # Copyright (C) 2020 - 2021 Gemeente Amsterdam
-import os
+from datetime import datetime
 
 from django.db.models import BooleanField, Case, CharField, Q, Value, When
 
-from signals.apps.reporting.csv.utils import map_choices, queryset_to_csv_file, reorder_csv
+from signals.apps.reporting.csv.utils import (
+    ExportLocation,
+    filter_since,
+    map_choices,
+    queryset_to_file
+)
 from signals.apps.signals.models import Reporter
 
 
-def create_reporters_csv(location: str) -> str:
+def create_reporters_csv(location: ExportLocation, since: datetime = None) -> str:
     """
     Create CSV file with all `Reporter` objects.
 
-    :param location: Directory for saving the CSV file
-    :returns: Path to CSV file
+    :param location: Directory for saving the CSV file, or the zip file the CSV file is added to
+    :param since: Only export the objects created or changed since this date/time (incremental export)
+    :returns: Path to CSV file, or the name of the CSV file in the zip file
     """
     queryset = Reporter.objects.annotate(
         is_anonymized=Case(
@@ -42,10 +48,8 @@ def create_reporters_csv(location: str) -> str:
         _is_anonymized=map_choices('is_anonymized', [(True, 'True'), (False, 'False')]),
     )
 
-    csv_file = queryset_to_csv_file(queryset, os.path.join(location, 'reporters.csv'))
+    queryset = filter_since(queryset, since)
 
     ordered_field_names = ['id', 'email', 'phone', 'is_anonymized', 'created_at', 'updated_at', 'extra_properties',
                            '_signal_id', ]
-    reorder_csv(csv_file.name, ordered_field_names)
-
-    return csv_file.name
+    return queryset_to_file(queryset, location, 'reporters.csv', ordered_field_names)
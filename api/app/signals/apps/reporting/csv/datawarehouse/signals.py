@@ -4,24 +4,25 @@
 Dump CSV of SIA tables matching the old, agreed-upon, format.
 """
 import logging
-import os
+from datetime import datetime
 
 from django.contrib.postgres.aggregates import StringAgg
 from django.db.models import CharField, F, Value
 from django.db.models.functions import Cast, Coalesce
 
-from signals.apps.reporting.csv.utils import queryset_to_csv_file, reorder_csv
+from signals.apps.reporting.csv.utils import ExportLocation, filter_since, queryset_to_file
 from signals.apps.signals.models import Signal, SignalDepartments
 
 logger = logging.getLogger(__name__)
 
 
-def create_signals_csv(location: str) -> str:
+def create_signals_csv(location: ExportLocation, since: datetime = None) -> str:
     """
     Create the CSV file with all `Signal` objects.
 
-    :param location: Directory for saving the CSV file
-    :returns: Path to CSV file
+    :param location: Directory for saving the CSV file, or the zip file the CSV file is added to
+    :param since: Only export the objects created or changed since this date/time (incremental export)
+    :returns: Path to CSV file, or the name of the CSV file in the zip file
     """
     queryset = Signal.objects.annotate(
         image=Value(None, output_field=CharField()),
@@ -55,24 +56,23 @@ def create_signals_csv(location: str) -> str:
                                    Value('null', output_field=CharField()))
     ).order_by('created_at')
 
-    csv_file = queryset_to_csv_file(queryset, os.path.join(location, 'signals.csv'))
+    queryset = filter_since(queryset, since)
 
     ordered_field_names = ['id', 'signal_uuid', 'source', 'text', 'text_extra', 'incident_date_start',
                            'incident_date_end', 'created_at', 'updated_at', 'operational_date', 'expire_date', 'image',
                            'upload', 'extra_properties', 'category_assignment_id', 'location_id', 'reporter_id',
                            'status_id', 'priority', 'priority_created_at', 'parent', 'type', 'type_created_at',
                            'directing_departments_assignment_id', ]
-    reorder_csv(csv_file.name, ordered_field_names)
+    return queryset_to_file(queryset, location, 'signals.csv', ordered_field_names)
 
-    return csv_file.name
 
-
-def create_signals_assigned_user_csv(location: str) -> str:
+def create_signals_assigned_user_csv(location: ExportLocation, since: datetime = None) -> str:
     """
     Create the CSV file with all `Signal - assigned user relation` objects.
 
-    :param location: Directory for saving the CSV file
-    :returns: Path to CSV file
+    :param location: Directory for saving the CSV file, or the zip file the CSV file is added to
+    :param since: Only export the objects created or changed since this date/time (incremental export)
+    :returns: Path to CSV file, or the name of the CSV file in the zip file
     """
     queryset = Signal.objects.annotate(
         image=Value(None, output_field=CharField()),
@@ -81,20 +81,19 @@ def create_signals_assigned_user_csv(location: str) -> str:
         assigned_to=F('user_assignment__user__email'),
     ).exclude(user_assignment__user__isnull=True).exclude(user_assignment__user__email__exact='').order_by('created_at')
 
-    csv_file = queryset_to_csv_file(queryset, os.path.join(location, 'signals_assigned_user.csv'))
+    queryset = filter_since(queryset, since)
 
     ordered_field_names = ['id', 'assigned_to', ]
-    reorder_csv(csv_file.name, ordered_field_names)
-
-    return csv_file.name
+    return queryset_to_file(queryset, location, 'signals_assigned_user.csv', ordered_field_names)
 
 
-def create_signals_routing_departments_csv(location: str) -> str:
+def create_signals_routing_departments_csv(location: ExportLocation, since: datetime = None) -> str:
     """
     Create the CSV file with all `Signal - department relation (filled by routing rules)` objects.
 
-    :param location: Directory for saving the CSV file
-    :returns: Path to CSV file
+    :param location: Directory for saving the CSV file, or the zip file the CSV file is added to
+    :param since: Only export the objects created or changed since this date/time (incremental export)
+    :returns: Path to CSV file, or the name of the CSV file in the zip file
     """
     queryset = SignalDepartments.objects.values(
         'id',
@@ -107,9 +106,7 @@ def create_signals_routing_departments_csv(location: str) -> str:
         '-created_at',
     )
 
-    csv_file = queryset_to_csv_file(queryset, os.path.join(location, 'routing_departments.csv'))
+    queryset = filter_since(queryset, since)
 
     ordered_field_names = ['id', 'created_at', 'updated_at', '_signal_id', 'departments', ]
-    reorder_csv(csv_file.name, ordered_field_names)
-
-    return csv_file.name
+    return queryset_to_file(queryset, location, 'routing_departments.csv', ordered_field_names)
@@ -1,8 +1,16 @@
 # SPDX-License-Identifier: MPL-2.0
 # Copyright (C) 2020 - 2021 Gemeente Amsterdam
 import tempfile
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from functools import partial
 from typing import Callable
 
+from django.conf import settings
+from django.db import connections
+from django.utils import timezone
+
 from signals.apps.reporting.csv.datawarehouse.categories import (
     create_category_assignments_csv,
     create_category_sla_csv
@@ -19,12 +27,26 @@ from signals.apps.reporting.csv.datawarehouse.signals import (
     create_signals_routing_departments_csv
 )
 from signals.apps.reporting.csv.datawarehouse.statusses import create_statuses_csv
-from signals.apps.reporting.csv.utils import save_csv_files, zip_csv_files
+from signals.apps.reporting.csv.utils import save_csv_files, save_zip_file, zip_csv_files
 from signals.celery import app
 
+REPORT_OPTIONS = {
+    # Option, Func
+    'signals': create_signals_csv,
+    'signals_assigned_user': create_signals_assigned_user_csv,
+    'locations': create_locations_csv,
+    'reporters': create_reporters_csv,
+    'category_assignments': create_category_assignments_csv,
+    'statusses': create_statuses_csv,
+    'category_sla': create_category_sla_csv,
+    'feedback': create_kto_feedback_csv,
+    'directing_departments': create_directing_departments_csv,
+    'routing_departments': create_signals_routing_departments_csv,
+}
+
 
 @app.task
-def save_csv_file_datawarehouse(func: Callable[[str], str], using='datawarehouse') -> None:
+def save_csv_file_datawarehouse(func: Callable[[str], str], using='datawarehouse', since: datetime = None) -> None:
     """
     Create CSV files for Datawarehouse and save them on the storage backend.
 
@@ -33,7 +55,7 @@ def save_csv_file_datawarehouse(func: Callable[[str], str], using='datawarehouse
     csv_files = list()
     with tempfile.TemporaryDirectory() as tmp_dir:
         try:
-            csv_files.append(func(tmp_dir))
+            csv_files.append(func(tmp_dir, since=since) if since else func(tmp_dir))
         except EnvironmentError:
             pass
 
@@ -41,28 +63,39 @@ def save_csv_file_datawarehouse(func: Callable[[str], str], using='datawarehouse
         return save_csv_files(csv_files=csv_files, using=using)
 
 
+def _save_csv_file_datawarehouse_in_thread(func: Callable[[str], str], using: str, since: datetime = None) -> list:
+    try:
+        return save_csv_file_datawarehouse(func, using=using, since=since)
+    finally:
+        # Every thread uses its own database connection
+        connections.close_all()
+
+
 @app.task
-def save_csv_files_datawarehouse(using='datawarehouse'):
+def save_csv_files_datawarehouse(using='datawarehouse', reports: list = None, since: datetime = None):
     """
     Create CSV files for Datawarehouse and save them on the storage backend.
 
+    The CSV files are created concurrently by DWH_EXPORT_THREAD_COUNT threads, each using its own database
+    connection.
+
+    :param using:
+    :param reports: the reports to export (see REPORT_OPTIONS), by default all reports are exported
+    :param since: only export the objects created or changed since this date/time (incremental export)
     :returns: list of csv files
     """
-    csv_files = list()
-    csv_files.extend(save_csv_file_datawarehouse(create_signals_csv, using=using))
-    csv_files.extend(save_csv_file_datawarehouse(create_signals_assigned_user_csv, using=using))
-    csv_files.extend(save_csv_file_datawarehouse(create_locations_csv, using=using))
-    csv_files.extend(save_csv_file_datawarehouse(create_reporters_csv, using=using))
-    csv_files.extend(save_csv_file_datawarehouse(create_category_assignments_csv, using=using))
-    csv_files.extend(save_csv_file_datawarehouse(create_statuses_csv, using=using))
-    csv_files.extend(save_csv_file_datawarehouse(create_category_sla_csv, using=using))
-    csv_files.extend(save_csv_file_datawarehouse(create_directing_departments_csv, using=using))
-    csv_files.extend(save_csv_file_datawarehouse(create_signals_routing_departments_csv, using=using))
+    funcs = [REPORT_OPTIONS[report] for report in reports] if reports else list(REPORT_OPTIONS.values())
 
-    try:
-        csv_files.extend(save_csv_file_datawarehouse(create_kto_feedback_csv, using=using))
-    except EnvironmentError:
-        pass
+    if settings.DWH_EXPORT_THREAD_COUNT > 1:
+        save_csv_file = partial(_save_csv_file_datawarehouse_in_thread, using=using, since=since)
+        with ThreadPoolExecutor(max_workers=settings.DWH_EXPORT_THREAD_COUNT) as executor:
+            results = list(executor.map(save_csv_file, funcs))
+    else:
+        results = [save_csv_file_datawarehouse(func, using=using, since=since) for func in funcs]
+
+    csv_files = list()
+    for files in results:
+        csv_files.extend(files)
     return csv_files
 
 
@@ -76,12 +109,24 @@ def zip_csv_files_endpoint(files: list):
     zip_csv_files(files_to_zip=files, using='datawarehouse')
 
 
+def _write_csv_files(zipper: zipfile.ZipFile) -> None:
+    for func in REPORT_OPTIONS.values():
+        try:
+            func(zipper)
+        except EnvironmentError:
+            pass
+
+
 @app.task
 def save_and_zip_csv_files_endpoint():
     """
     Create zip file of generated csv files
 
-    :returns:
+    The CSV files are written (COPY ... TO STDOUT) directly to the zip file, which is compressed and saved on the
+    storage backend while it is written.
+
+    :returns: name of the zip file
     """
-    created_files = save_csv_files_datawarehouse(using=None)
-    zip_csv_files(files_to_zip=created_files, using='datawarehouse')
+    now = timezone.now()
+    return save_zip_file(f'{now:%Y}/{now:%m}/{now:%d}/{now:%Y%m%d_%H%M%S%Z}.zip', using='datawarehouse',
+                         write=_write_csv_files)
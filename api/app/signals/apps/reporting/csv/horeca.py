@@ -1,6 +1,7 @@
 # SPDX-License-Identifier: MPL-2.0
 # Copyright (C) 2019 - 2021 Gemeente Amsterdam
 import csv
+import json
 import logging
 import os
 import shutil
@@ -10,12 +11,14 @@ from datetime import timedelta
 
 from django.core.exceptions import ValidationError
 from django.core.files import File
+from django.db import connection
 from django.utils import timezone
 from django.utils.timezone import make_aware
 
 from signals.apps.reporting.app_settings import CSV_BATCH_SIZE as BATCH_SIZE
 from signals.apps.reporting.models.export import HorecaCSVExport
-from signals.apps.signals.models import Category, Signal
+from signals.apps.signals.models import Category
+from signals.apps.signals.workflow import STATUS_CHOICES
 
 logger = logging.getLogger(__name__)
 
@@ -29,182 +32,181 @@ def _to_first_and_last_day_of_the_week(isoweek, isoyear):
     return first_day_of_week, last_day_of_week
 
 
-def _fix_row_to_match_header_count(row, headers):
-    return row + ([None] * (len(headers) - len(row)))
-
-
-def _fix_rows_to_match_header_count(rows, headers):
-    return [
-        _fix_row_to_match_header_count(row, headers)
-        for row in rows
-    ]
-
-
-def _create_extra_properties_headers(extra_properties, headers=None):
+# The answers to the questions of the Signals (extra_properties) of the given categories created in the given range,
+# the extra_properties must be in one of the following formats (the old style extra_properties, a dict with the
+# questions as keys, are ignored)
+#
+# [{'id': 'Lorem', 'label': 'ipsum', 'answer': 'the answer', 'category_url': '...'}, ...]
+# [{'id': 'Lorem', 'label': 'ipsum', 'answer': {'value': 'the answer'}, 'category_url': '...'}, ...]
+EXTRA_PROPERTIES_ANSWERS_SQL = """
+with week_signals as (
+    select
+        s.id,
+        ca.category_id,
+        s.extra_properties,
+        row_number() over (order by s.created_at, s.id) as position
+    from signals_signal s
+    join signals_categoryassignment ca on ca.id = s.category_assignment_id
+    where ca.category_id = any(%(category_ids)s) and s.created_at between %(start)s and %(end)s
+),
+answers as (
+    select
+        s.id as signal_id,
+        s.category_id,
+        s.position,
+        ep.ordinality,
+        ep.value ->> 'id' as question_id,
+        case jsonb_typeof(ep.value -> 'answer')
+            when 'string' then ep.value ->> 'answer'
+            when 'object' then
+                case
+                    when ep.value -> 'answer' ? 'value' then ep.value -> 'answer' ->> 'value'
+                    else ep.value -> 'answer' ->> 'label'
+                end
+        end as answer
+    from week_signals s
+    cross join jsonb_array_elements(
+        case jsonb_typeof(s.extra_properties) when 'array' then s.extra_properties else '[]'::jsonb end
+    ) with ordinality as ep(value, ordinality)
+    where jsonb_typeof(ep.value) = 'object' and ep.value ->> 'id' is not null
+)
+"""
+
+# The questions per category, in the order in which they are first answered
+EXTRA_PROPERTIES_HEADERS_SQL = EXTRA_PROPERTIES_ANSWERS_SQL + """
+select category_id, question_id
+from answers
+group by category_id, question_id
+order by category_id, min(array[position, ordinality])
+"""
+
+# The Signals of the week, the answers are pivoted to one column per question (see EXTRA_PROPERTIES_HEADERS_SQL) of
+# the category of the Signal
+ROWS_SQL = EXTRA_PROPERTIES_ANSWERS_SQL + """,
+pivot as (
+    select signal_id, jsonb_object_agg(question_id, answer order by ordinality) as answers
+    from answers
+    group by signal_id
+)
+select
+    ws.category_id,
+    s.id,
+    s.uuid,
+    s.source,
+    s.text,
+    s.text_extra,
+    s.incident_date_start,
+    s.incident_date_end,
+    s.created_at,
+    s.updated_at,
+    s.operational_date,
+    s.expire_date,
+    null as upload,
+    s.category_assignment_id,
+    l.stadsdeel,
+    l.address_text,
+    s.reporter_id,
+    %(state_display)s::jsonb ->> st.state as state_display,
+    array(
+        select p.answers ->> h.question_id
+        from jsonb_array_elements_text(%(headers)s::jsonb -> ws.category_id::text)
+            with ordinality as h(question_id, position)
+        order by h.position
+    ) as extra_properties
+from week_signals ws
+join signals_signal s on s.id = ws.id
+left join signals_location l on l.id = s.location_id
+left join signals_status st on st.id = s.status_id
+left join pivot p on p.signal_id = s.id
+order by ws.position
+"""
+
+HEADERS = [
+    'id',
+    'signal_uuid',
+    'source',
+    'text',
+    'text_extra',
+    'incident_date_start',
+    'incident_date_end',
+    'created_at',
+    'updated_at',
+    'operational_date',
+    'expire_date',
+    'upload',
+    'category_assignment_id',
+    'stadsdeel',
+    'address',
+    'reporter_id',
+    'status_id',
+]
+
+
+def _get_extra_properties_headers(categories, created_at__range):
     """
-    We want the extra_properties to be in one of the following formats
-
-    [
-        {
-            'id': 'Lorem',
-            'label': 'ipsum',
-            'answer': 'the answer',
-            'category_url': '/signals/v1/public/terms/categories/X/sub_categories/Y'
-        },
-        ...
-    ]
-
-    or
-
-    [
-        {
-            'id': 'Lorem',
-            'label': 'ipsum',
-            'answer': {
-                'value': 'the answer'
-            },
-            'category_url': '/signals/v1/public/terms/categories/X/sub_categories/Y'
-        },
-        ...
-    ]
-
-    The old style extra_properties will be ignored
-
-    {
-        'question_1': 'answer_1',
-        'question_2': 'answer_2',
-        'question_3': 'answer_3',
-        ...
-    }
+    Returns the questions (extra_properties) per category that are answered in the Signals created in the given range
     """
-    headers = headers or []
-
-    if extra_properties:
-        for extra_property in extra_properties:
-            if isinstance(extra_property, str):
-                continue  # old style, we ignore these
-
-            if extra_property['id'] not in headers:
-                headers.append(extra_property['id'])
+    headers = {category.pk: [] for category in categories}
+    params = {'category_ids': list(headers.keys()), 'start': created_at__range[0], 'end': created_at__range[1]}
 
+    with connection.cursor() as cursor:
+        cursor.execute(EXTRA_PROPERTIES_HEADERS_SQL, params)
+        for category_id, question_id in cursor.fetchall():
+            headers[category_id].append(question_id)
     return headers
 
 
-def _create_extra_properties_row(extra_properties, headers):
-    """
-    We want the extra_properties to be in one of the following formats
-
-    [
-        {
-            'id': 'Lorem',
-            'label': 'ipsum',
-            'answer': 'the answer',
-            'category_url': '/signals/v1/public/terms/categories/X/sub_categories/Y'
-        },
-        ...
-    ]
-
-    or
-
-    [
-        {
-            'id': 'Lorem',
-            'label': 'ipsum',
-            'answer': {
-                'value': 'the answer'
-            },
-            'category_url': '/signals/v1/public/terms/categories/X/sub_categories/Y'
-        },
-        ...
-    ]
-
-    The old style extra_properties will be ignored
-
-    {
-        'question_1': 'answer_1',
-        'question_2': 'answer_2',
-        'question_3': 'answer_3',
-        ...
-    }
+def _write_csv_files(categories, location, created_at__range):
     """
-    row = [None] * len(headers)
+    Writes one CSV file per category with the Signals created in the given range, the Signals of all categories are
+    selected (and the answers pivoted) in one query which is read using a server side cursor
 
-    if extra_properties:
-        for extra_property in extra_properties:
-            if isinstance(extra_property, str):
-                continue  # old style, we ignore these
-
-            answer = None
-            if isinstance(extra_property['answer'], str):
-                answer = extra_property['answer']
-            elif 'value' in extra_property['answer']:
-                answer = extra_property['answer']['value']
-            elif 'label' in extra_property['answer']:
-                answer = extra_property['answer']['label']
-            row[headers.index(extra_property['id'])] = answer
+    :returns: dict with the path of the CSV file per category
+    """
+    if not categories:
+        return {}
 
-    return row
+    now = timezone.now()
+    headers = _get_extra_properties_headers(categories, created_at__range)
+
+    files, writers = {}, {}
+    try:
+        for category in categories:
+            file_name = 'signals_{}_{}.csv'.format(category.slug, now.strftime('%d-%m-%Y_%H_%M_%S'))
+            logger.debug('Writing to: {}'.format(os.path.join(location, file_name)))
+
+            files[category.pk] = open(os.path.join(location, file_name), 'w')
+            writers[category.pk] = csv.writer(files[category.pk])
+            writers[category.pk].writerow(HEADERS + headers[category.pk])
+
+        params = {
+            'category_ids': list(headers.keys()),
+            'start': created_at__range[0],
+            'end': created_at__range[1],
+            'headers': json.dumps(headers),
+            'state_display': json.dumps({state: str(display) for state, display in STATUS_CHOICES}),
+        }
+        with connection.chunked_cursor() as cursor:
+            cursor.execute(ROWS_SQL, params)
+            while True:
+                rows = cursor.fetchmany(BATCH_SIZE)
+                if not rows:
+                    break
+
+                for category_id, *row, extra_properties in rows:
+                    writers[category_id].writerow(row + extra_properties)
+    finally:
+        for file in files.values():
+            file.close()
+
+    return {category_id: file.name for category_id, file in files.items()}
 
 
 def _get_horeca_main_category():
     return Category.objects.get(slug='overlast-bedrijven-en-horeca', parent_id__isnull=True)
 
 
-def _get_csv_rows_per_category(category, created_at__range):
-    headers = []
-    rows = []
-
-    qs = Signal.objects.filter(category_assignment__category_id=category.pk,
-                               created_at__range=created_at__range)
-
-    for signal in qs.iterator(chunk_size=BATCH_SIZE):
-        headers = _create_extra_properties_headers(signal.extra_properties, headers)
-        rows.append([
-            signal.pk,
-            signal.uuid,
-            signal.source,
-            signal.text,
-            signal.text_extra,
-            signal.incident_date_start,
-            signal.incident_date_end,
-            signal.created_at,
-            signal.updated_at,
-            signal.operational_date,
-            signal.expire_date,
-            signal.upload,
-            signal.category_assignment_id,
-            signal.location.stadsdeel if signal.location else None,
-            signal.location.address_text if signal.location else None,
-            signal.reporter_id,
-            signal.status.get_state_display() if signal.status else None,
-        ] + _create_extra_properties_row(signal.extra_properties, headers))
-
-    headers = [
-        'id',
-        'signal_uuid',
-        'source',
-        'text',
-        'text_extra',
-        'incident_date_start',
-        'incident_date_end',
-        'created_at',
-        'updated_at',
-        'operational_date',
-        'expire_date',
-        'upload',
-        'category_assignment_id',
-        'stadsdeel',
-        'address',
-        'reporter_id',
-        'status_id',
-    ] + headers
-
-    return [headers, ] + _fix_rows_to_match_header_count(rows, headers)
-
-
 def create_csv_per_sub_category(category, location, isoweek, isoyear):
-    now = timezone.now()
-
     if category.is_parent():
         raise ValidationError(
             'Function \'create_csv_per_sub_category\' can only work with sub categories'
@@ -215,19 +217,8 @@ def create_csv_per_sub_category(category, location, isoweek, isoyear):
         raise NotImplementedError(f'Not implemented for categories that do not belong to the main '
                                   f'category ({parent_category.name})')
 
-    first_day_of_week, last_day_of_week = _to_first_and_last_day_of_the_week(isoweek, isoyear)
-    rows = _get_csv_rows_per_category(category, created_at__range=(first_day_of_week,
-                                                                   last_day_of_week))
-
-    file_name = 'signals_{}_{}.csv'.format(category.slug, now.strftime('%d-%m-%Y_%H_%M_%S'))
-    logger.debug('Writing to: {}'.format(os.path.join(location, file_name)))
-
-    with open(os.path.join(location, file_name), 'w') as csv_file:
-        writer = csv.writer(csv_file)
-        for row in rows:
-            writer.writerow(row)
-
-    return csv_file.name
+    created_at__range = _to_first_and_last_day_of_the_week(isoweek, isoyear)
+    return _write_csv_files([category], location, created_at__range)[category.pk]
 
 
 def create_csv_files(isoweek, isoyear, save_in_dir=None):
@@ -247,11 +238,9 @@ def create_csv_files(isoweek, isoyear, save_in_dir=None):
         dump_dir = os.path.join(tmp_dir, base_name)
         os.makedirs(dump_dir)
 
-        for sub_category in category.children.all():
-            csv_file = create_csv_per_sub_category(
-                sub_category, dump_dir, isoweek=isoweek, isoyear=isoyear
-            )
-            csv_files.append(csv_file)
+        # All sub categories are written using one query
+        created_at__range = _to_first_and_last_day_of_the_week(isoweek, isoyear)
+        csv_files.extend(_write_csv_files(list(category.children.all()), dump_dir, created_at__range).values())
 
         # Create zip file in current temp directory.
         target_zip = os.path.join(tmp_dir, base_name)
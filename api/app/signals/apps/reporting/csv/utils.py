@@ -1,12 +1,19 @@
 # SPDX-License-Identifier: MPL-2.0
 # Copyright (C) 2020 - 2021 Gemeente Amsterdam
-import csv
+import json
 import logging
 import os
-import shutil
 import zipfile
-from typing import TextIO
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from decimal import Decimal
+from typing import IO, BinaryIO, Callable, TextIO, Union
+from uuid import UUID
 
+import pyarrow as pa
+import pyarrow.parquet as pq
+from django.conf import settings
+from django.core.files import File
 from django.db import connection
 from django.db.models import Case, CharField, QuerySet, Value, When
 from django.utils import timezone
@@ -16,6 +23,24 @@ from signals.apps.reporting.utils import _get_storage_backend
 
 logger = logging.getLogger(__name__)
 
+# Directory or zip file the datawarehouse files are written to (see queryset_to_file)
+ExportLocation = Union[str, zipfile.ZipFile]
+
+PARQUET_COMPRESSION = 'snappy'
+
+# Postgres type (OID) -> Parquet type
+PARQUET_TYPES = {
+    16: pa.bool_(),  # bool
+    20: pa.int64(),  # int8
+    21: pa.int64(),  # int2
+    23: pa.int64(),  # int4
+    700: pa.float64(),  # float4
+    701: pa.float64(),  # float8
+    1082: pa.date32(),  # date
+    1114: pa.timestamp('us'),  # timestamp
+    1184: pa.timestamp('us', tz='UTC'),  # timestamptz
+}
+
 
 def zip_csv_files(files_to_zip: list, using: str) -> None:
     """
@@ -35,7 +60,8 @@ def zip_csv_files(files_to_zip: list, using: str) -> None:
                 zipper.write(
                     filename=os.path.join(src_folder, base_file),
                     arcname=base_file,
-                    compress_type=zipfile.ZIP_DEFLATED
+                    # Parquet files are already compressed
+                    compress_type=zipfile.ZIP_STORED if file.endswith('.parquet') else zipfile.ZIP_DEFLATED
                 )
 
 
@@ -66,7 +92,24 @@ def save_csv_files(csv_files: list, using: str, path: str = None) -> None:
     return stored_csv
 
 
-def queryset_to_csv_file(queryset: QuerySet, csv_file_path: str) -> TextIO:
+def queryset_to_sql(queryset: QuerySet, ordered_field_names: list = None) -> tuple:
+    """
+    Returns the SQL and parameters of the given queryset, annotations prefixed with an underscore (used to prevent
+    clashes with the fields of the model) are selected without the underscore
+
+    :param queryset:
+    :param ordered_field_names: order of the columns (default the order of the queryset)
+    :return tuple: SQL, parameters
+    """
+    sql, params = queryset.query.sql_with_params()
+    sql = sql.replace('AS "_', 'AS "')
+    if ordered_field_names:
+        columns = ', '.join(f'"{field_name}"' for field_name in ordered_field_names)
+        sql = f'SELECT {columns} FROM ({sql}) AS csv_export'
+    return sql, params
+
+
+def queryset_to_csv_file(queryset: QuerySet, csv_file_path: str, ordered_field_names: list = None) -> TextIO:
     """
     Creates the CSV file based on the given queryset and stores it in the given csv file path
 
@@ -75,19 +118,191 @@ def queryset_to_csv_file(queryset: QuerySet, csv_file_path: str) -> TextIO:
 
     :param queryset:
     :param csv_file_path:
+    :param ordered_field_names: order of the columns in the CSV file (default the order of the queryset)
     :return TextIO:
     """
-    sql, params = queryset.query.sql_with_params()
+    with open(csv_file_path, 'w') as file:
+        write_csv(queryset, file, ordered_field_names)
+    return file
+
+
+def write_csv(queryset: QuerySet, file: IO, ordered_field_names: list = None) -> None:
+    """
+    Writes the rows of the given queryset as CSV (COPY ... TO STDOUT) to the given (text or binary) file object
+
+    :param queryset:
+    :param file:
+    :param ordered_field_names: order of the columns in the CSV file (default the order of the queryset)
+    """
+    sql, params = queryset_to_sql(queryset, ordered_field_names)
     sql = f"COPY ({sql}) TO STDOUT WITH (FORMAT CSV, HEADER, DELIMITER E',')"
-    sql = sql.replace('AS "_', 'AS "')
 
-    with open(csv_file_path, 'w') as file:
-        with connection.cursor() as cursor:
-            sql = cursor.mogrify(sql, params)
-            cursor.copy_expert(sql, file)
+    with connection.cursor() as cursor:
+        sql = cursor.mogrify(sql, params)
+        cursor.copy_expert(sql, file)
+
+
+def _get_parquet_type(type_code: int) -> pa.DataType:
+    """
+    Translates the Postgres type (OID) of a column to the type of the Parquet column, all other types are stored as
+    text
+    """
+    return PARQUET_TYPES.get(type_code, pa.string())
+
+
+def _to_parquet_value(value):
+    if isinstance(value, (dict, list)):
+        return json.dumps(value)
+    elif isinstance(value, (UUID, Decimal)):
+        return str(value)
+    return value
+
+
+def _to_parquet_table(rows: list, schema: pa.Schema) -> pa.Table:
+    columns = []
+    for idx, field in enumerate(schema):
+        values = [row[idx] for row in rows]
+        if field.type == pa.string():
+            values = [None if value is None else str(_to_parquet_value(value)) for value in values]
+        columns.append(pa.array(values, type=field.type))
+    return pa.Table.from_arrays(columns, schema=schema)
+
+
+def queryset_to_parquet_file(queryset: QuerySet, parquet_file_path: str, ordered_field_names: list = None,
+                             row_group_size: int = None) -> BinaryIO:
+    """
+    Creates the (typed and compressed) Parquet file based on the given queryset and stores it in the given file path
+
+    :param queryset:
+    :param parquet_file_path:
+    :param ordered_field_names: order of the columns in the Parquet file (default the order of the queryset)
+    :param row_group_size: number of rows per row group (default DWH_PARQUET_ROW_GROUP_SIZE)
+    :return BinaryIO:
+    """
+    with open(parquet_file_path, 'wb') as file:
+        write_parquet(queryset, file, ordered_field_names, row_group_size)
     return file
 
 
+def write_parquet(queryset: QuerySet, file: BinaryIO, ordered_field_names: list = None,
+                  row_group_size: int = None) -> None:
+    """
+    Writes the rows of the given queryset as Parquet to the given (binary) file object
+
+    The rows are read using a server side cursor and written per row group, so only one row group is kept in memory.
+
+    :param queryset:
+    :param file:
+    :param ordered_field_names: order of the columns in the Parquet file (default the order of the queryset)
+    :param row_group_size: number of rows per row group (default DWH_PARQUET_ROW_GROUP_SIZE)
+    """
+    row_group_size = row_group_size or settings.DWH_PARQUET_ROW_GROUP_SIZE
+    sql, params = queryset_to_sql(queryset, ordered_field_names)
+
+    with connection.chunked_cursor() as cursor:
+        cursor.execute(sql, params)
+        rows = cursor.fetchmany(row_group_size)
+
+        # The description of a server side cursor is only known after the first fetch
+        schema = pa.schema([(column.name, _get_parquet_type(column.type_code)) for column in cursor.description])
+        writer = pq.ParquetWriter(file, schema, compression=PARQUET_COMPRESSION)
+        try:
+            while True:
+                writer.write_table(_to_parquet_table(rows, schema), row_group_size=row_group_size)
+                rows = cursor.fetchmany(row_group_size)
+                if not rows:
+                    break
+        finally:
+            writer.close()
+
+
+def queryset_to_file(queryset: QuerySet, location: ExportLocation, file_name: str,
+                     ordered_field_names: list = None) -> str:
+    """
+    Creates the CSV file or, when DWH_EXPORT_FORMAT is "parquet", the Parquet file (the extension of the file name is
+    replaced by .parquet) based on the given queryset
+
+    The file is created in the given directory, or added to the given zip file. A zip file can be written to a stream
+    (see save_zip_file), so the file is compressed and uploaded while it is written.
+
+    :param queryset:
+    :param location: directory or zip file
+    :param file_name:
+    :param ordered_field_names: order of the columns in the file (default the order of the queryset)
+    :return str: path of the file, or the name of the file in the zip file
+    """
+    write = write_csv
+    if settings.DWH_EXPORT_FORMAT == 'parquet':
+        file_name = f'{os.path.splitext(file_name)[0]}.parquet'
+        write = write_parquet
+
+    if isinstance(location, zipfile.ZipFile):
+        zip_info = zipfile.ZipInfo(file_name, date_time=timezone.localtime().timetuple()[:6])
+        # Parquet files are already compressed
+        zip_info.compress_type = zipfile.ZIP_STORED if write is write_parquet else zipfile.ZIP_DEFLATED
+        with location.open(zip_info, 'w', force_zip64=True) as file:
+            write(queryset, file, ordered_field_names)
+        return file_name
+
+    file_path = os.path.join(location, file_name)
+    with open(file_path, 'wb') as file:
+        write(queryset, file, ordered_field_names)
+    return file_path
+
+
+def save_zip_file(file_name: str, using: str, write: Callable[[zipfile.ZipFile], None]) -> str:
+    """
+    Writes a zip file directly to the storage backend, the files written to the zip file by the given callable are
+    compressed and uploaded while they are written (no temporary files)
+
+    The zip file is written to a pipe from which the storage backend reads the content in a separate thread, for Swift
+    the content is uploaded in chunks (chunked transfer encoding).
+
+    :param file_name: name of the zip file in the storage backend
+    :param using:
+    :param write: callable that writes the files to the given zip file (see queryset_to_file)
+    :returns: name of the stored zip file
+    """
+    storage = _get_storage_backend(using=using)
+    read_fd, write_fd = os.pipe()
+    reader = os.fdopen(read_fd, 'rb')
+
+    def _upload():
+        try:
+            content = File(reader, name=file_name)
+            content.size = None  # Unknown, otherwise the size of the pipe would be used
+            return storage.save(file_name, content)
+        finally:
+            # Stops the writer when the upload fails
+            reader.close()
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        upload = executor.submit(_upload)
+        try:
+            with os.fdopen(write_fd, 'wb') as writer, zipfile.ZipFile(writer, 'w') as zipper:
+                write(zipper)
+        except Exception:
+            # Raises the error of the upload if that failed, otherwise the incomplete zip file is removed
+            storage.delete(upload.result())
+            raise
+
+        return upload.result()
+
+
+def filter_since(queryset: QuerySet, since: datetime = None, field_name: str = 'updated_at') -> QuerySet:
+    """
+    Only the rows created or changed since the given date/time (incremental export), all rows if no date/time is given
+
+    :param queryset:
+    :param since:
+    :param field_name: the date/time field that is compared with since
+    :return QuerySet:
+    """
+    if since is None:
+        return queryset
+    return queryset.filter(**{f'{field_name}__gte': since})
+
+
 def map_choices(field_name: str, choices: list) -> Case:
     """
     Creates a mapping for Postgres with case and when statements
@@ -101,15 +316,3 @@ def map_choices(field_name: str, choices: list) -> Case:
           for value, representation in choices],
         output_field=CharField()
     )
-
-
-def reorder_csv(file_path, ordered_field_names):
-    reordered_file_path = f'{file_path[:-4]}_reordered.csv'
-    with open(file_path, 'r') as infile, open(reordered_file_path, 'a') as outfile:
-        writer = csv.DictWriter(outfile, fieldnames=ordered_field_names)
-        writer.writeheader()
-        for row in csv.DictReader(infile):
-            writer.writerow(row)
-
-    shutil.move(file_path, f'{file_path[:-4]}_original.csv')
-    shutil.move(reordered_file_path, file_path)
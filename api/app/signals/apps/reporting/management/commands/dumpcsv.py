@@ -1,46 +1,29 @@
 # SPDX-License-Identifier: MPL-2.0
 # Copyright (C) 2019 - 2021 Gemeente Amsterdam
 import os
+from argparse import ArgumentTypeError
+from datetime import datetime, time
 from timeit import default_timer as timer
 
 from django.conf import settings
 from django.core.management import BaseCommand
 from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
 
-from signals.apps.reporting.csv.datawarehouse.categories import (
-    create_category_assignments_csv,
-    create_category_sla_csv
-)
-from signals.apps.reporting.csv.datawarehouse.directing_departments import (
-    create_directing_departments_csv
-)
-from signals.apps.reporting.csv.datawarehouse.kto_feedback import create_kto_feedback_csv
-from signals.apps.reporting.csv.datawarehouse.locations import create_locations_csv
-from signals.apps.reporting.csv.datawarehouse.reporters import create_reporters_csv
-from signals.apps.reporting.csv.datawarehouse.signals import (
-    create_signals_assigned_user_csv,
-    create_signals_csv,
-    create_signals_routing_departments_csv
-)
-from signals.apps.reporting.csv.datawarehouse.statusses import create_statuses_csv
 from signals.apps.reporting.csv.datawarehouse.tasks import (
-    save_csv_file_datawarehouse,
+    REPORT_OPTIONS,
+    save_csv_files_datawarehouse,
     zip_csv_files_endpoint
 )
 
-REPORT_OPTIONS = {
-    # Option, Func
-    'signals': create_signals_csv,
-    'signals_assigned_user': create_signals_assigned_user_csv,
-    'locations': create_locations_csv,
-    'reporters': create_reporters_csv,
-    'category_assignments': create_category_assignments_csv,
-    'statusses': create_statuses_csv,
-    'category_sla': create_category_sla_csv,
-    'feedback': create_kto_feedback_csv,
-    'directing_departments': create_directing_departments_csv,
-    'routing_departments': create_signals_routing_departments_csv,
-}
+
+def _since(value):
+    since = parse_datetime(value)
+    if since is None and parse_date(value) is not None:
+        since = datetime.combine(parse_date(value), time.min)
+    if since is None:
+        raise ArgumentTypeError(f'Invalid date/time: {value}')
+    return since if timezone.is_aware(since) else timezone.make_aware(since)
 
 
 class Command(BaseCommand):
@@ -49,6 +32,9 @@ class Command(BaseCommand):
                             help=f'Report type to export (if none given all reports will be exported), '
                                  f'choices are: {", ".join(REPORT_OPTIONS.keys())}')
         parser.add_argument("--zip", action="store_true", dest='zip', help="Also output zip file.")
+        parser.add_argument('--since', type=_since,
+                            help='Only export the objects created or changed since the given date (YYYY-MM-DD) or '
+                                 'date/time (ISO 8601), by default everything is exported')
 
     def handle(self, *args, **kwargs):
         start = timer()
@@ -69,12 +55,10 @@ class Command(BaseCommand):
 
         reports = set(reports)
         self.stdout.write(f'Export: {", ".join(reports)}')
-        csv_files = list()
-        for report in reports:
-            self.stdout.write(f'* Exporting: {report}')
-            func = REPORT_OPTIONS[report]
-            csv_files.extend(save_csv_file_datawarehouse(func))
-            self.stdout.write('* ---------------------------------')
+        if kwargs['since']:
+            self.stdout.write(f'* Objects created or changed since: {kwargs["since"]:%Y-%m-%d %H:%M:%S%z}')
+        csv_files = save_csv_files_datawarehouse(reports=list(reports), since=kwargs['since'])
+        self.stdout.write('* ---------------------------------')
 
         if kwargs['zip']:
             self.stdout.write('* Making zipfile...')
@@ -1,14 +1,22 @@
 # SPDX-License-Identifier: MPL-2.0
 # Copyright (C) 2019 - 2021 Gemeente Amsterdam
 import logging
+from timeit import default_timer as timer
 
 from django.db.models import Case, When
-from elasticsearch.helpers import bulk
+from django.utils import timezone
+from elasticsearch.helpers import parallel_bulk
 from elasticsearch_dsl import Document, Index, Search
 
+from signals.apps.search.settings import app_settings
+
 log = logging.getLogger(__name__)
 
 
+class IndexRebuildError(Exception):
+    pass
+
+
 class CustomSearch(Search):
 
     def __init__(self, **kwargs):
@@ -52,28 +60,155 @@ class DocumentBase(Document):
         if index_instance.exists():
             index_instance.delete()
 
+    def get_index_queryset(self):
+        """
+        The queryset used to (re)index the documents in bulk, should select/prefetch everything create_document needs
+        """
+        return self.get_queryset()
+
     @classmethod
-    def prepare_batch(cls, queryset):
-        for obj in queryset.iterator():
-            yield cls().create_document(obj).create_document_dict()
+    def iterate_chunks(cls, queryset, size, from_id=None):
+        """
+        Yields the objects of the queryset in chunks ordered by primary key. Every chunk is fetched with a
+        "WHERE id > last id" query, so the database does not have to skip an ever growing OFFSET and the prefetches of
+        the queryset are done once per chunk.
+        """
+        queryset = queryset.order_by('pk')
+        if from_id is not None:
+            queryset = queryset.filter(pk__gt=from_id)
+
+        while True:
+            chunk = list(queryset[:size])
+            if not chunk:
+                break
+            yield chunk
+            queryset = queryset.filter(pk__gt=chunk[-1].pk)
 
     @classmethod
-    def bulk(cls, queryset, size, using=None):
+    def prepare_batch(cls, chunks, index=None):
+        for chunk in chunks:
+            for obj in chunk:
+                document_dict = cls().create_document(obj).create_document_dict()
+                if index:
+                    document_dict['_index'] = index
+                yield document_dict
+
+    @classmethod
+    def bulk(cls, queryset, size, using=None, thread_count=None, from_id=None, progress_callback=None, index=None):
+        """
+        Index the queryset using parallel bulk requests.
+
+        The results of parallel_bulk are returned in the order of the (primary key ordered) documents, so the id of
+        the last indexed document can be used to resume an interrupted indexing run (from_id). After every chunk the
+        progress_callback is called with the number of indexed documents, the id of the last indexed document and the
+        number of documents indexed per second.
+
+        :returns: tuple of the number of indexed documents and the id of the last indexed document
+        """
         es = cls._get_connection(using)
-        for start in range(0, queryset.count(), size):
-            end = start + size
-            bulk(
-                client=es,
-                actions=cls.prepare_batch(queryset[start:end]),
-                chunk_size=size,
-            )
+        thread_count = thread_count or app_settings.BULK_THREAD_COUNT
+
+        indexed, last_id = 0, from_id
+        start = timer()
+        for _, info in parallel_bulk(client=es,
+                                     actions=cls.prepare_batch(cls.iterate_chunks(queryset, size, from_id), index),
+                                     thread_count=thread_count,
+                                     chunk_size=size):
+            indexed += 1
+            last_id = int(next(iter(info.values()))['_id'])
+
+            if indexed % size == 0:
+                cls._report_progress(indexed, last_id, start, progress_callback)
+
+        if indexed % size:
+            cls._report_progress(indexed, last_id, start, progress_callback)
+        return indexed, last_id
+
+    @staticmethod
+    def _report_progress(indexed, last_id, start, progress_callback=None):
+        elapsed = timer() - start
+        rate = indexed / elapsed if elapsed else 0
+        log.info(f'Indexed {indexed} documents ({rate:.0f}/s), last indexed id {last_id}')
+        if progress_callback:
+            progress_callback(indexed, last_id, rate)
 
     @classmethod
-    def index_documents(cls, index=None, using=None, batch=1000, queryset=None):
-        qs = queryset.all() if queryset else cls().get_queryset()
+    def index_documents(cls, index=None, using=None, batch=1000, queryset=None, thread_count=None, from_id=None,
+                        progress_callback=None):
+        qs = cls().get_index_queryset()
+        if queryset is not None:
+            qs = qs.filter(pk__in=queryset.values('pk'))
 
         cls.init(index, using)
-        cls.bulk(qs, batch, using)
+        return cls.bulk(qs, batch, using, thread_count=thread_count, from_id=from_id,
+                        progress_callback=progress_callback, index=index)
+
+    @classmethod
+    def get_aliased_indices(cls, using=None):
+        """
+        Returns the names of the indices behind the alias, an empty list if there is no alias
+        """
+        es = cls._get_connection(using)
+        alias = cls._default_index()
+        if not es.indices.exists_alias(name=alias):
+            return []
+        return list(es.indices.get_alias(name=alias).keys())
+
+    @classmethod
+    def rebuild_index(cls, using=None, batch=1000, thread_count=None, progress_callback=None, delete_old=True):
+        """
+        Rebuild the index without a search outage (blue/green).
+
+        All documents are indexed in a new timestamped index while the current index keeps serving searches and
+        updates. Documents updated during the rebuild are indexed again, after checking the number of documents the
+        alias is moved to the new index in one atomic request. Documents updated while switching are indexed once
+        more and the old indices are deleted.
+
+        The first rebuild replaces an index that is not behind an alias (the index name is used as the alias).
+
+        :returns: the name of the new index
+        """
+        es = cls._get_connection(using)
+        alias = cls._default_index()
+        new_index = f'{alias}-{timezone.now():%Y%m%d%H%M%S}'
+
+        log.info(f'Rebuilding index "{alias}" in "{new_index}"')
+        started_at = timezone.now()
+        cls.index_documents(index=new_index, using=using, batch=batch, thread_count=thread_count,
+                            progress_callback=progress_callback)
+
+        # Replay the documents that were updated during the rebuild, these updates went to the old index
+        replay_started_at = timezone.now()
+        cls.index_documents(index=new_index, using=using, batch=batch, thread_count=thread_count,
+                            queryset=cls().get_index_queryset().filter(updated_at__gte=started_at))
+
+        Index(new_index).refresh(using=using)
+        expected = cls().get_index_queryset().filter(created_at__lt=replay_started_at).count()
+        indexed = es.count(index=new_index)['count']
+        if indexed < expected:
+            Index(new_index).delete(using=using)
+            raise IndexRebuildError(f'Index "{new_index}" contains {indexed} documents, expected at least '
+                                    f'{expected}. The index is deleted, the alias "{alias}" is not changed')
+
+        old_indices = cls.get_aliased_indices(using=using)
+        actions = [{'remove': {'index': index, 'alias': alias}} for index in old_indices]
+        if not old_indices and es.indices.exists(index=alias):
+            # The current index is not an alias (yet)
+            actions.append({'remove_index': {'index': alias}})
+        actions.append({'add': {'index': new_index, 'alias': alias}})
+        es.indices.update_aliases(body={'actions': actions})
+        log.info(f'Alias "{alias}" moved from {old_indices or [alias]} to "{new_index}"')
+
+        # Replay the documents that were updated while replaying/switching
+        cls.index_documents(index=new_index, using=using, batch=batch, thread_count=thread_count,
+                            queryset=cls().get_index_queryset().filter(updated_at__gte=replay_started_at))
+
+        if delete_old:
+            for index in old_indices:
+                log.info(f'Deleting old index "{index}"')
+                Index(index).delete(using=using)
+
+        return new_index
 
     @classmethod
     def ping(cls, using=None):
@@ -2,7 +2,8 @@
 # Copyright (C) 2019 - 2021 Gemeente Amsterdam
 import logging
 
-from elasticsearch_dsl import Date, InnerDoc, Keyword, Nested, Object, Text
+from django.db.models import Exists, OuterRef
+from elasticsearch_dsl import Boolean, Date, InnerDoc, Integer, Keyword, Nested, Object, Text
 from elasticsearch_dsl.query import Bool
 
 from signals.apps.search.documents.base import DocumentBase
@@ -60,6 +61,29 @@ class SignalDocument(DocumentBase):
     created_at = Date()
     updated_at = Date()
 
+    # Used to filter the search results, see signals.apps.search.filters
+    state = Keyword()
+    source = Keyword()
+    type_code = Keyword()
+    priority_code = Keyword()
+    category_id = Integer()
+    parent_category_id = Integer()
+    deadline = Date()
+    deadline_factor_3 = Date()
+    stadsdeel = Keyword()
+    area_type_code = Keyword()
+    area_code = Keyword()
+    buurt_code = Keyword()
+    address_text = Text(analyzer='standard')
+    reporter_email = Keyword()
+    has_email = Boolean()
+    has_phone = Boolean()
+    is_parent = Boolean()
+    is_child = Boolean()
+    assigned_user_email = Keyword()
+    routing_department_ids = Integer()
+    routing_department_codes = Keyword()
+
     class Index:
         name = 'signals'
         using = 'default'
@@ -86,6 +110,59 @@ class SignalDocument(DocumentBase):
             '-updated_at'
         ).all()
 
+    def get_index_queryset(self):
+        return self.get_model().objects.select_related(
+            'location',
+            'status',
+            'category_assignment__category__parent',
+            'reporter',
+            'priority',
+            'type_assignment',
+            'user_assignment__user',
+            'routing_assignment',
+        ).prefetch_related(
+            'category_assignment__category__departments',
+            'routing_assignment__departments',
+        ).annotate(
+            has_children=Exists(self.get_model().objects.filter(parent_id=OuterRef('pk')))
+        )
+
+    @staticmethod
+    def get_filter_fields(obj):
+        """
+        The values of the fields used to filter the search results
+        """
+        category_assignment = obj.category_assignment
+        location = obj.location
+        reporter = obj.reporter
+        user_assignment = obj.user_assignment
+        routing_departments = obj.routing_assignment.departments.all() if obj.routing_assignment else []
+
+        return dict(
+            state=obj.status.state if obj.status else None,
+            source=obj.source,
+            type_code=obj.type_assignment.name if obj.type_assignment else None,
+            priority_code=obj.priority.priority if obj.priority else None,
+            category_id=category_assignment.category_id if category_assignment else None,
+            parent_category_id=category_assignment.category.parent_id if category_assignment else None,
+            deadline=category_assignment.deadline if category_assignment else None,
+            deadline_factor_3=category_assignment.deadline_factor_3 if category_assignment else None,
+            stadsdeel=location.stadsdeel if location else None,
+            area_type_code=location.area_type_code if location else None,
+            area_code=location.area_code if location else None,
+            buurt_code=location.buurt_code if location else None,
+            address_text=location.address_text if location else None,
+            reporter_email=reporter.email.lower() if reporter and reporter.email else None,
+            has_email=bool(reporter and reporter.email),
+            has_phone=bool(reporter and reporter.phone),
+            is_parent=obj.has_children if hasattr(obj, 'has_children') else obj.is_parent,
+            is_child=obj.parent_id is not None,
+            assigned_user_email=(user_assignment.user.email.lower()
+                                 if user_assignment and user_assignment.user else None),
+            routing_department_ids=[department.id for department in routing_departments],
+            routing_department_codes=[department.code for department in routing_departments],
+        )
+
     @classmethod
     def create_document(cls, obj):
         category_assignment = None
@@ -109,7 +186,7 @@ class SignalDocument(DocumentBase):
                         'code': department.code,
                         'name': department.name,
                         'is_intern': department.is_intern,
-                    } for department in category_assignment.category.departments.iterator()],
+                    } for department in category_assignment.category.departments.all()],
                     'parent': {
                         'name': category_assignment.category.parent.name,
                         'slug': category_assignment.category.parent.slug,
@@ -129,6 +206,7 @@ class SignalDocument(DocumentBase):
             },
             created_at=obj.created_at,
             updated_at=obj.updated_at,
+            **cls.get_filter_fields(obj),
         )
 
     def create_document_dict(self):
@@ -0,0 +1,187 @@
+# SPDX-License-Identifier: MPL-2.0
+# Copyright (C) 2021 Gemeente Amsterdam
+"""
+Apply the filters of the private Signal list endpoint (SignalFilterSet) to an Elasticsearch search.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils.timezone import now
+from django_filters.utils import translate_validation
+from elasticsearch_dsl.query import Bool, Exists, Ids, MatchPhrase, Range, Term, Terms
+from rest_framework.exceptions import ValidationError
+
+from signals.apps.api.v1.filters import SignalFilterSet
+from signals.apps.api.v1.filters.utils import contact_details_choices, kind_choices
+from signals.apps.services.domain.signal_permission import SignalPermissionService
+from signals.apps.signals import workflow
+from signals.apps.signals.models import Signal
+
+
+class SignalSearchFilter:
+    """
+    Translates the query parameters of the SignalFilterSet into Elasticsearch filters (see SignalDocument for the
+    indexed fields). The query parameters are validated by the SignalFilterSet itself.
+    """
+    filterset_class = SignalFilterSet
+
+    # Filters that need data which is not part of the SignalDocument
+    unsupported_filters = ('directing_department', 'feedback', 'has_changed_children', 'note_keyword')
+
+    # Filter name -> document field, for filters that select the Signals matching one or more values
+    terms_filters = {
+        'buurt_code': 'buurt_code',
+        'category_id': 'category_id',
+        'priority': 'priority_code',
+        'routing_department_code': 'routing_department_codes',
+        'source': 'source',
+        'stadsdeel': 'stadsdeel',
+        'status': 'state',
+        'type': 'type_code',
+    }
+
+    # Filter name -> (document field, range operator)
+    range_filters = {
+        'created_before': ('created_at', 'lte'),
+        'created_after': ('created_at', 'gte'),
+        'updated_before': ('updated_at', 'lte'),
+        'updated_after': ('updated_at', 'gte'),
+    }
+
+    permission_service = SignalPermissionService()
+
+    def __init__(self, data, request):
+        self.data = data
+        self.request = request
+
+    def get_cleaned_data(self):
+        unsupported = [name for name in self.unsupported_filters if name in self.data]
+        if unsupported:
+            raise ValidationError({name: ['This filter is not supported when searching'] for name in unsupported})
+
+        filterset = self.filterset_class(data=self.data, queryset=Signal.objects.none(), request=self.request)
+        if not filterset.is_valid():
+            raise translate_validation(filterset.errors)
+
+        # Only the filters that are actually given
+        return {name: value for name, value in filterset.form.cleaned_data.items()
+                if name in self.data and value not in (None, '', [])}
+
+    def filter_search(self, search):
+        cleaned_data = self.get_cleaned_data()
+
+        search = self._filter_area(search, cleaned_data)
+        search = self._filter_categories(search, cleaned_data)
+
+        for name, value in cleaned_data.items():
+            if name in self.terms_filters:
+                search = search.filter(Terms(**{self.terms_filters[name]: list(value)}))
+            elif name in self.range_filters:
+                field, operator = self.range_filters[name]
+                search = search.filter(Range(**{field: {operator: value}}))
+            else:
+                query = getattr(self, f'_{name}_query')(value)
+                if query is not None:
+                    search = search.filter(query)
+        return search
+
+    def filter_search_for_user(self, search, user):
+        """
+        Same as SignalQuerySet.filter_for_user
+        """
+        if user.is_superuser or user.has_perm('signals.sia_can_view_all_categories'):
+            return search
+
+        snapshot = self.permission_service.get_permission_snapshot(user)
+        return search.filter(Bool(should=[
+            Terms(category_id=list(snapshot['category_ids'])),
+            Terms(routing_department_ids=list(snapshot['department_ids'])),
+        ], minimum_should_match=1))
+
+    def _filter_area(self, search, cleaned_data):
+        # The area code is only used in combination with the area type code (see SignalFilterSet._cleanup_form_data)
+        area_codes = cleaned_data.pop('area_code', [])
+        area_type_code = cleaned_data.pop('area_type_code', None)
+        if not area_codes or not area_type_code:
+            return search
+
+        return search.filter(Term(area_type_code=area_type_code)).filter(Terms(area_code=list(area_codes)))
+
+    def _filter_categories(self, search, cleaned_data):
+        main_categories = cleaned_data.pop('maincategory_slug', [])
+        sub_categories = cleaned_data.pop('category_slug', [])
+        if 'category_id' in cleaned_data or not (main_categories or sub_categories):
+            return search
+
+        return search.filter(Bool(should=[
+            Terms(parent_category_id=[category.pk for category in main_categories]),
+            Terms(category_id=[category.pk for category in sub_categories]),
+        ], minimum_should_match=1))
+
+    # Translations of the filters that are not a simple terms or range filter
+
+    def _id_query(self, value):
+        return Ids(values=[int(value)])
+
+    def _address_text_query(self, value):
+        return MatchPhrase(address_text=value)
+
+    def _reporter_email_query(self, value):
+        return Term(reporter_email=value.lower())
+
+    def _assigned_user_email_query(self, value):
+        if value == 'null':
+            return ~Exists(field='assigned_user_email')
+        return Term(assigned_user_email=value.lower())
+
+    def _incident_date_query(self, value):
+        return Range(incident_date_start={'gte': value.isoformat(), 'lt': (value + timedelta(days=1)).isoformat(),
+                                          'time_zone': settings.TIME_ZONE})
+
+    def _incident_date_before_query(self, value):
+        # Same (inverted) meaning as the SignalFilterSet
+        return Range(incident_date_start={'gte': value.isoformat(), 'time_zone': settings.TIME_ZONE})
+
+    def _incident_date_after_query(self, value):
+        # Same (inverted) meaning as the SignalFilterSet
+        return Range(incident_date_start={'lt': (value + timedelta(days=1)).isoformat(),
+                                          'time_zone': settings.TIME_ZONE})
+
+    def _contact_details_query(self, value):
+        if len(value) == len(contact_details_choices()):
+            return None
+
+        queries = {
+            'email': Term(has_email=True),
+            'phone': Term(has_phone=True),
+            'none': Bool(filter=[Term(has_email=False), Term(has_phone=False)]),
+        }
+        return Bool(should=[queries[choice] for choice in value], minimum_should_match=1)
+
+    def _kind_query(self, value):
+        choices = set(value)
+        if (len(choices) == len(kind_choices())
+                or {'signal', 'parent_signal', 'child_signal'} == choices
+                or {'parent_signal', 'exclude_parent_signal'} == choices):
+            return None
+
+        queries = {
+            'signal': Bool(filter=[Term(is_parent=False), Term(is_child=False)]),
+            'parent_signal': Term(is_parent=True),
+            'exclude_parent_signal': Term(is_parent=False),
+            'child_signal': Term(is_child=True),
+        }
+        return Bool(should=[queries[choice] for choice in choices], minimum_should_match=1)
+
+    def _punctuality_query(self, value):
+        query = ~Terms(state=[workflow.AFGEHANDELD, workflow.GEANNULEERD, workflow.GESPLITST])
+
+        if value == 'null':
+            return query & ~Exists(field='deadline')
+
+        local_now = now()
+        if value == 'on_time':
+            return query & Range(deadline={'gt': local_now})
+        elif value == 'late':
+            return query & Range(deadline={'lt': local_now})
+        return query & Range(deadline_factor_3={'lt': local_now})
@@ -5,6 +5,7 @@ from timeit import default_timer as timer
 from django.core.management import BaseCommand
 from django.utils import timezone
 
+from signals.apps.search.documents.base import IndexRebuildError
 from signals.apps.search.documents.signal import SignalDocument
 from signals.apps.signals.models import Signal
 
@@ -18,10 +19,15 @@ class Command(BaseCommand):
         parser.add_argument('--dry-run', action='store_true', dest='_dry_run', help='Dry-run mode')
         parser.add_argument('--index-all', action='store_true', dest='_index_documents', help='Index all Signals')
         parser.add_argument('--init', action='store_true', dest='_init_index', help='Init the index')
+        parser.add_argument('--rebuild', action='store_true', dest='_rebuild_index', help='Rebuild all Signals in a new index and switch the alias to it, without a search outage')  # noqa
+        parser.add_argument('--keep-old-indices', action='store_true', dest='keep_old_indices', help='Do not delete the old indices after a rebuild')  # noqa
         parser.add_argument('--signal-id', type=str, dest='signal_id', help='A specific signal that need re-indexing')
         parser.add_argument('--signal-ids', type=str, dest='signal_ids', help='A set of signals that need re-indexing')
         parser.add_argument('--from-date', type=str, dest='from_date', help='Index all signals from date, format YYYY-MM-DD')  # noqa
         parser.add_argument('--to-date', type=str, dest='to_date', help='Index all signals from date, format YYYY-MM-DD')  # noqa
+        parser.add_argument('--from-id', type=int, dest='from_id', help='Resume indexing all Signals after the given (checkpoint) id')  # noqa
+        parser.add_argument('--chunk-size', type=int, dest='chunk_size', default=1000, help='Number of Signals per bulk request (default: 1000)')  # noqa
+        parser.add_argument('--thread-count', type=int, dest='thread_count', help='Number of parallel bulk requests')  # noqa
 
     def handle(self, *args, **options):
         start = timer()
@@ -48,7 +54,13 @@ class Command(BaseCommand):
         if options['_init_index'] and not options['_clear_index']:
             self._init_index()
 
-        if options['signal_id']:
+        self._apply_index_options(**options)
+
+    def _apply_index_options(self, **options):
+        if options['_rebuild_index']:
+            self._rebuild_index(chunk_size=options['chunk_size'], thread_count=options['thread_count'],
+                                delete_old=not options['keep_old_indices'])
+        elif options['signal_id']:
             self._index_signal(signal_id=int(options['signal_id']))
         elif options['signal_ids']:
             self._index_signals(signal_ids=list(map(int, options['signal_ids'].split(','))))
@@ -57,7 +69,8 @@ class Command(BaseCommand):
             to_date = options['to_date'] or None
             self._index_date_range(from_date, to_date)
         elif options['_index_documents']:
-            self._index_documents()
+            self._index_documents(chunk_size=options['chunk_size'], thread_count=options['thread_count'],
+                                  from_id=options['from_id'])
         else:
             self.stdout.write('* No index option given')
 
@@ -72,10 +85,30 @@ class Command(BaseCommand):
         if not self._dry_run:
             SignalDocument.init()
 
-    def _index_documents(self):
-        self.stdout.write('* Index all Signals in bulk')
+    def _report_progress(self, indexed, last_id, rate):
+        self.stdout.write(f'* Indexed {indexed} Signals ({rate:.0f} Signals/s), checkpoint: --from-id {last_id}')
+
+    def _index_documents(self, chunk_size=1000, thread_count=None, from_id=None):
+        if from_id:
+            self.stdout.write(f'* Index all Signals after Signal #{from_id} in bulk')
+        else:
+            self.stdout.write('* Index all Signals in bulk')
+
+        if not self._dry_run:
+            SignalDocument.index_documents(batch=chunk_size, thread_count=thread_count, from_id=from_id,
+                                           progress_callback=self._report_progress)
+
+    def _rebuild_index(self, chunk_size=1000, thread_count=None, delete_old=True):
+        self.stdout.write('* Rebuild the index')
         if not self._dry_run:
-            SignalDocument.index_documents()
+            try:
+                new_index = SignalDocument.rebuild_index(batch=chunk_size, thread_count=thread_count,
+                                                         progress_callback=self._report_progress,
+                                                         delete_old=delete_old)
+            except IndexRebuildError as e:
+                self.stderr.write(f'* {e}')
+            else:
+                self.stdout.write(f'* Switched to index "{new_index}"')
 
     def _index_signal(self, signal_id):
         self.stdout.write(f'* Index Signal #{signal_id}')
@@ -0,0 +1,66 @@
+# SPDX-License-Identifier: MPL-2.0
+# Copyright (C) 2021 Gemeente Amsterdam
+from django.contrib.gis.db import models
+from django.db import connection
+
+from signals.utils.claim import claim
+
+
+class QueuedSignalManager(models.Manager):
+    # Queue the Signals, a Signal that is already queued is unlocked so that it is indexed again (it may have been
+    # taken by a flush before the change was committed)
+    add_sql = """
+    insert into search_queuedsignal (_signal_id, queued_at)
+    select unnest(%(signal_ids)s), now()
+    on conflict (_signal_id) do update set locked_until = null
+    where search_queuedsignal.locked_until is not null
+    """
+
+    def add(self, signal_ids):
+        """
+        Queue the Signals for indexing
+        """
+        signal_ids = list(set(signal_ids))
+        if not signal_ids:
+            return
+
+        with connection.cursor() as cursor:
+            cursor.execute(self.add_sql, {'signal_ids': signal_ids})
+
+    def take(self, limit, lock_timeout):
+        """
+        Lock at most limit queued Signals for lock_timeout seconds, returns their ids and the time they are locked
+        until.
+
+        The Signals stay queued until they are removed by done. A Signal that is not removed within lock_timeout
+        seconds (the flush failed or was interrupted) is taken again by a next flush.
+        """
+        return claim(self.model, where='locked_until is null or locked_until < %(now)s', order_by='queued_at',
+                     limit=limit, lock_timeout=lock_timeout)
+
+    def done(self, signal_ids, locked_until):
+        """
+        Remove the indexed Signals from the queue, except the Signals that were queued again in the meantime
+        """
+        return self.filter(_signal_id__in=signal_ids, locked_until=locked_until).delete()[0]
+
+    def release(self, signal_ids, locked_until):
+        """
+        Unlock the Signals that could not be indexed, they are indexed by the next flush
+        """
+        return self.filter(_signal_id__in=signal_ids, locked_until=locked_until).update(locked_until=None)
+
+
+class QueuedSignal(models.Model):
+    """
+    Signals that need to be (re)indexed in Elasticsearch.
+
+    Changes to a Signal only queue the Signal (once), the queue is flushed shortly after using bulk requests (and
+    periodically by Celery beat). This way all changes made to a Signal within the flush delay result in a single index
+    update. A Signal is only removed from the queue after it is indexed.
+    """
+    _signal = models.OneToOneField('signals.Signal', primary_key=True, on_delete=models.CASCADE, related_name='+')
+    queued_at = models.DateTimeField(auto_now_add=True)
+    locked_until = models.DateTimeField(null=True, blank=True)
+
+    objects = QueuedSignalManager()
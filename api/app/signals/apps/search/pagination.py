@@ -27,6 +27,8 @@ class ElasticPaginator(Paginator):
         if top + self.orphans >= self.count:
             top = self.count
         response = self.object_list[bottom:top].execute()
+        # The permissions are also applied by Elasticsearch (for the counts), the documents can be outdated though.
+        # Therefore the permissions of the user are checked again in the database.
         qs = self.object_list.to_queryset(response, user=self.user)
         return self._get_page(qs, number, self)
 
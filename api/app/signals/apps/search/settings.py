@@ -5,6 +5,10 @@ from django.test.signals import setting_changed
 
 DEFAULTS = dict(
     PAGE_SIZE=100,
+    BULK_THREAD_COUNT=4,
+    QUEUE_FLUSH_DELAY=5,
+    QUEUE_FLUSH_BATCH_SIZE=1000,
+    QUEUE_LOCK_TIMEOUT=300,
     CONNECTION=dict(
         HOST='http://127.0.0.1:9200',
         INDEX_NAME='sia_signals',
@@ -1,24 +1,39 @@
 # SPDX-License-Identifier: MPL-2.0
 # Copyright (C) 2019 - 2021 Gemeente Amsterdam
-from django.dispatch import receiver
+from django.conf import settings
 
-from signals.apps.search.tasks import save_to_elastic
+from signals.apps.search.models import QueuedSignal
+from signals.apps.search.tasks import save_to_elastic, schedule_flush_index_queue
 from signals.apps.signals.managers import (
     create_child,
     create_initial,
     update_category_assignment,
     update_location,
     update_priority,
-    update_type
+    update_reporter,
+    update_routing_assignment,
+    update_status,
+    update_type,
+    update_user_assignment
 )
+from signals.apps.signals.outbox import outbox_receiver
 
 
-@receiver([create_initial,
-           create_child,
-           update_location,
-           update_category_assignment,
-           update_priority,
-           update_type], dispatch_uid='search_add_to_elastic')
+@outbox_receiver([create_initial,
+                  create_child,
+                  update_location,
+                  update_category_assignment,
+                  update_priority,
+                  update_type,
+                  update_status,
+                  update_reporter,
+                  update_user_assignment,
+                  update_routing_assignment], dispatch_uid='search_add_to_elastic')
 def add_to_elastic_handler(sender, signal_obj, **kwargs):
-    # Add to elastic
-    save_to_elastic.delay(signal_id=signal_obj.id)
+    if settings.FEATURE_FLAGS.get('SEARCH_INDEX_QUEUE_ENABLED', False):
+        # Queue the Signal, all changes made within the flush delay are indexed at once
+        QueuedSignal.objects.add([signal_obj.id])
+        schedule_flush_index_queue()
+    else:
+        # Add to elastic
+        save_to_elastic.delay(signal_id=signal_obj.id)
@@ -2,7 +2,11 @@
 # Copyright (C) 2019 - 2021 Gemeente Amsterdam
 import logging
 
+from django.core.cache import cache
+
 from signals.apps.search.documents.signal import SignalDocument
+from signals.apps.search.models import QueuedSignal
+from signals.apps.search.settings import app_settings
 from signals.apps.signals.models import Signal
 from signals.celery import app
 
@@ -20,11 +24,68 @@ def save_to_elastic(signal_id):
 
 
 @app.task
-def rebuild_index():
+def flush_index_queue():
+    """
+    Index all queued Signals using bulk requests.
+
+    Queued Signals are flushed shortly after they are queued (see schedule_flush_index_queue), this task is also
+    scheduled in Celery beat to make sure nothing is left behind. The Signals are removed from the queue after they are
+    indexed, Signals of an interrupted flush are indexed again after QUEUE_LOCK_TIMEOUT seconds.
+    """
+    batch_size = app_settings.QUEUE_FLUSH_BATCH_SIZE
+
+    total = 0
+    while True:
+        signal_ids, locked_until = QueuedSignal.objects.take(batch_size, app_settings.QUEUE_LOCK_TIMEOUT)
+        if not signal_ids:
+            break
+
+        try:
+            SignalDocument.index_documents(batch=batch_size, queryset=Signal.objects.filter(id__in=signal_ids))
+        except Exception:
+            # The Signals stay queued, they will be indexed by the next flush
+            QueuedSignal.objects.release(signal_ids, locked_until)
+            raise
+
+        QueuedSignal.objects.done(signal_ids, locked_until)
+        total += len(signal_ids)
+
+    log.info(f'flush_index_queue - {total} Signals indexed')
+    return total
+
+
+def schedule_flush_index_queue():
+    """
+    Flush the queue after QUEUE_FLUSH_DELAY seconds, unless a flush is already scheduled
+    """
+    key = 'search-flush-index-queue-scheduled'
+    delay = app_settings.QUEUE_FLUSH_DELAY
+    if cache.add(key, True, timeout=delay):
+        try:
+            flush_index_queue.apply_async(countdown=delay)
+        except Exception:
+            # The Signals stay queued, they are indexed by the next flush (scheduled in Celery beat)
+            log.warning('Scheduling flush_index_queue failed', exc_info=True)
+            cache.delete(key)
+
+
+@app.task
+def rebuild_index(from_id=None):
     log.info('rebuild_index - start')
 
     if not SignalDocument.ping():
         raise Exception('Elastic cluster is unreachable')
 
-    SignalDocument.index_documents()
-    log.info('rebuild_index - done!')
+    indexed, last_id = SignalDocument.index_documents(from_id=from_id)
+    log.info(f'rebuild_index - done! {indexed} Signals indexed, last indexed Signal #{last_id}')
+
+
+@app.task
+def rebuild_index_zero_downtime():
+    log.info('rebuild_index_zero_downtime - start')
+
+    if not SignalDocument.ping():
+        raise Exception('Elastic cluster is unreachable')
+
+    new_index = SignalDocument.rebuild_index()
+    log.info(f'rebuild_index_zero_downtime - done! Switched to index "{new_index}"')
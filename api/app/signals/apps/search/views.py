@@ -10,6 +10,7 @@ from signals.apps.api.v1.serializers import (
     PrivateSignalSerializerList
 )
 from signals.apps.search.documents.signal import SignalDocument
+from signals.apps.search.filters import SignalSearchFilter
 from signals.apps.search.pagination import ElasticHALPagination
 from signals.apps.signals.models import Signal
 from signals.auth.backend import JWTAuthBackend
@@ -43,7 +44,13 @@ class SearchView(DatapuntViewSet):
             ]
         )
 
+        # The filters and the permissions of the user are applied by Elasticsearch, so the number of results and the
+        # pages are correct and only the Signals of the requested page are read from the database. The permissions are
+        # checked again in the database (see ElasticPaginator), the documents can be outdated.
+        search_filter = SignalSearchFilter(data=self.request.query_params, request=self.request)
         s = SignalDocument.search().query(multi_match)
+        s = search_filter.filter_search(s)
+        s = search_filter.filter_search_for_user(s, self.request.user)
         s.execute()
         return s
 
@@ -1,10 +1,21 @@
 # SPDX-License-Identifier: MPL-2.0
 # Copyright (C) 2020 - 2021 Vereniging van Nederlandse Gemeenten, Gemeente Amsterdam
+import heapq
 import time
+from operator import itemgetter
 
+from django.conf import settings
+from django.db import transaction
+
+from signals.apps.dsl.evaluators.equality_evaluator import EqualityEvaluator
+from signals.apps.dsl.evaluators.in_evaluator import InEvaluator
+from signals.apps.dsl.evaluators.logical_evaluator import LogicalEvaluator
+from signals.apps.dsl.evaluators.terminal_evaluator import TerminalEvaluator
 from signals.apps.dsl.ExpressionEvaluator import ExpressionEvaluator
+from signals.apps.signals import workflow
 from signals.apps.signals.managers import SignalManager
 from signals.apps.signals.models import Area, AreaType, RoutingExpression, Signal
+from signals.utils.cache import LocalCache, VersionedCache
 
 
 class DslService:
@@ -46,7 +57,7 @@ class SignalContext:
             self._areas = self._init_areas()
         return self._areas
 
-    def __call__(self, signal: Signal):
+    def __call__(self, signal: Signal, areas=None):
 
         t = signal.incident_date_start.strftime("%H:%M:%S")
         tmp = {
@@ -55,7 +66,7 @@ class SignalContext:
             'location': signal.location.geometrie,
             'stadsdeel': signal.location.stadsdeel,
             'time': time.strptime(t, "%H:%M:%S"),
-            'areas': self.areas
+            'areas': self.areas if areas is None else areas
         }
 
         # add additonal question answers id to context
@@ -77,38 +88,272 @@ class SignalContext:
         return tmp
 
 
+class CompiledRoutingRule:
+    """
+    A compiled routing rule.
+
+    When the expression is a (root level) "and" of predicates the rule matches only if all predicates are true, in that
+    case the order in which they are evaluated does not change the outcome (an error while evaluating is treated as no
+    match). The predicates are therefore evaluated cheapest first, so comparing strings and sets short-circuits the
+    (more expensive) geometry checks. The "sub == 'x'" and "main == 'x'" predicates are used to look up the candidate
+    rules for a Signal (see RoutingRuleSet).
+    """
+    GEOMETRY_COST = 10
+
+    def __init__(self, rule_id, department_id, evaluator):
+        self.rule_id = rule_id
+        self.department_id = department_id
+        self.evaluator = evaluator
+
+        self.predicates = None
+        self.guards = {}
+
+        root = evaluator.expression
+        if not (isinstance(root, LogicalEvaluator) and root.op == 'or' and root.rhs):
+            self.predicates = sorted(self._flatten_and(root), key=self._cost)
+            for predicate in self.predicates:
+                guard = self._get_guard(predicate)
+                if guard:
+                    self.guards.setdefault(*guard)
+
+    @classmethod
+    def _flatten_and(cls, node):
+        if isinstance(node, LogicalEvaluator) and (node.op == 'and' or not node.rhs):
+            predicates = []
+            for operand in [node.lhs, *(node.rhs or [])]:
+                predicates.extend(cls._flatten_and(operand))
+            return predicates
+        return [node]
+
+    @classmethod
+    def _cost(cls, node):
+        if isinstance(node, LogicalEvaluator):
+            return sum(cls._cost(operand) for operand in [node.lhs, *(node.rhs or [])])
+        if isinstance(node, InEvaluator) and node.rhs_prop:
+            return cls.GEOMETRY_COST
+        return 1
+
+    @staticmethod
+    def _get_guard(node):
+        """
+        Returns the (identifier, value) of an "identifier == 'value'" predicate
+        """
+        if not isinstance(node, EqualityEvaluator) or node.op != '==':
+            return None
+
+        for ident, value in ((node.lhs, node.rhs), (node.rhs, node.lhs)):
+            if (isinstance(ident, TerminalEvaluator) and ident.id_val and isinstance(value, TerminalEvaluator) and
+                    not value.id_val and value.str_val):
+                return ident.id_val, value.str_val
+        return None
+
+    def get_area_type_names(self):
+        """
+        The names of the area types used by this rule, None if these could not be determined
+        """
+        names = set()
+        nodes = [self.evaluator.expression]
+        while nodes:
+            node = nodes.pop()
+            if isinstance(node, LogicalEvaluator):
+                nodes.extend([node.lhs, *(node.rhs or [])])
+            elif isinstance(node, InEvaluator) and node.rhs_prop:
+                area_type = node.rhs_prop[0]
+                if area_type.id_val or not area_type.str_val:
+                    return None
+                names.add(area_type.str_val)
+        return names
+
+    def evaluate(self, ctx):
+        if self.predicates is None:
+            return self.evaluator.evaluate(ctx)
+
+        for predicate in self.predicates:
+            if not predicate.evaluate(ctx):
+                return False
+        return True
+
+
+class RoutingRuleSet:
+    """
+    The compiled, ordered set of active routing rules and the prepared geometries of the areas used by these rules
+    """
+    INDEXED_IDENTIFIERS = ('sub', 'main')
+
+    def __init__(self, rules, areas):
+        self.rules = rules
+        self.areas = areas
+
+        # Rules that can only match a specific sub or main category are indexed on that category, the position of a
+        # rule is used to keep the original order when merging the candidates
+        self.unindexed = []
+        self.indexed = {}
+        for position, rule in enumerate(rules):
+            for identifier in self.INDEXED_IDENTIFIERS:
+                if identifier in rule.guards:
+                    key = (identifier, rule.guards[identifier])
+                    self.indexed.setdefault(key, []).append((position, rule))
+                    break
+            else:
+                self.unindexed.append((position, rule))
+
+    @classmethod
+    def build(cls, compiler):
+        rules = []
+        routing_expressions = RoutingExpression.objects.select_related('_expression').filter(
+            is_active=True, _expression___type__name='routing'
+        ).order_by('order')
+        for routing_expression in routing_expressions:
+            try:
+                evaluator = compiler(routing_expression._expression.code)
+            except Exception:
+                # compilation failed, invalidate rule
+                RoutingExpression.objects.filter(pk=routing_expression.pk).update(is_active=False)
+                continue
+            rules.append(CompiledRoutingRule(routing_expression.pk, routing_expression._department_id, evaluator))
+
+        area_types = AreaType.objects.all()
+        area_type_names = set()
+        for rule in rules:
+            names = rule.get_area_type_names()
+            if names is None:
+                area_type_names = None
+                break
+            area_type_names.update(names)
+        if area_type_names is not None:
+            area_types = area_types.filter(name__in=area_type_names)
+
+        areas = {area_type.name: {} for area_type in area_types}
+        for area in Area.objects.filter(_type__in=area_types).select_related('_type'):
+            areas[area._type.name][area.code] = area.geometry.prepared
+
+        return cls(rules, areas)
+
+    def get_candidates(self, ctx):
+        candidates = [self.unindexed]
+        for identifier in self.INDEXED_IDENTIFIERS:
+            if identifier in ctx:
+                candidates.append(self.indexed.get((identifier, ctx[identifier]), []))
+        return [rule for _, rule in heapq.merge(*candidates, key=itemgetter(0))]
+
+
 class SignalDslService(DslService):
     context_func = SignalContext()
     signal_manager = SignalManager()
 
-    def process_routing_rules(self, signal):
-        ctx = self.context_func(signal)
-        rules = RoutingExpression.objects.select_related('_expression', '_department')
-        for rule in rules.filter(is_active=True, _expression___type__name='routing').order_by('order'):
-            evaluator = None
+    # The compiled routing rules are kept in memory, they are rebuild when routing rules, expressions or areas change
+    # (see signals.apps.signals.signal_receivers) or after ROUTING_RULES_CACHE_TIMEOUT seconds
+    rule_set_cache = VersionedCache(namespace='routing-rules')
+    _rule_set = LocalCache(rule_set_cache, timeout_setting='ROUTING_RULES_CACHE_TIMEOUT')
+
+    def _build_rule_set(self, previous_rule_set=None):
+        return RoutingRuleSet.build(self._compile)
+
+    def get_rule_set(self):
+        if not settings.FEATURE_FLAGS.get('ROUTING_RULES_CACHE_ENABLED', False):
+            return self._build_rule_set()
+        return self._rule_set.get(self._build_rule_set)
+
+    def invalidate(self):
+        self.rule_set_cache.invalidate()
+
+    def get_routing_department_id(self, ctx, rule_set):
+        """
+        Returns the department id of the first routing rule that matches the context, None if no rule matches
+        """
+        for rule in rule_set.get_candidates(ctx):
+            eval_result = False
             try:
-                evaluator = self._compile(rule._expression.code)
+                eval_result = rule.evaluate(ctx)
             except Exception:
-                # compilation failed, invalidate rule
-                rule.is_active = False
-                rule.save()
-
-            if evaluator and rule.is_active:
-                eval_result = False
-                try:
-                    eval_result = evaluator.evaluate(ctx)
-                except Exception:
-                    # ignore runtime errors
-                    pass
-                if eval_result:
-                    # assign relation to department
-                    data = {
-                        'departments': [
-                            {
-                                'id': rule._department.id
-                            }
-                        ]
-                    }
-                    self.signal_manager.update_routing_departments(data, signal)
-                    return True
-        return False
+                # ignore runtime errors
+                pass
+            if eval_result:
+                return rule.department_id
+        return None
+
+    def process_routing_rules(self, signal):
+        rule_set = self.get_rule_set()
+        ctx = self.context_func(signal, areas=rule_set.areas)
+        department_id = self.get_routing_department_id(ctx, rule_set)
+        if department_id is None:
+            return False
+
+        # assign relation to department
+        data = {
+            'departments': [
+                {
+                    'id': department_id
+                }
+            ]
+        }
+        self.signal_manager.update_routing_departments(data, signal)
+        return True
+
+    @staticmethod
+    def get_open_signal_id_chunks(chunk_size):
+        """
+        Yields the ids of all open Signals in chunks, walks through the Signals ordered by primary key so that no
+        (slow) offset is needed
+        """
+        open_signals = Signal.objects.exclude(
+            status__state__in=[workflow.GESPLITST, workflow.AFGEHANDELD, workflow.GEANNULEERD]
+        ).order_by('id')
+
+        last_id = 0
+        while True:
+            signal_ids = list(open_signals.filter(id__gt=last_id).values_list('id', flat=True)[:chunk_size])
+            if not signal_ids:
+                break
+            yield signal_ids
+            last_id = signal_ids[-1]
+
+    def reroute_signals(self, signal_ids, dry_run=False):
+        """
+        Re-evaluate the routing rules for the given Signals and route the Signals to the matching department.
+
+        The Signals are loaded using a fixed number of queries and the new routing assignments are written in bulk.
+        Signals that do not match any rule keep their current routing.
+
+        :param signal_ids: list of Signal ids
+        :param dry_run: only determine the changes, nothing is written to the database
+        :returns: list of (signal id, previous department ids, new department id) of the Signals that are rerouted
+        """
+        rule_set = self.get_rule_set()
+
+        with transaction.atomic():
+            signals = Signal.objects.filter(id__in=signal_ids).select_related(
+                'category_assignment__category__parent',
+                'location',
+                'routing_assignment',
+                'user_assignment',
+            ).prefetch_related(
+                'routing_assignment__departments',
+            ).order_by('id')
+            if not dry_run:
+                signals = signals.select_for_update(of=('self', ))
+
+            changes, assignments = [], []
+            for signal in signals:
+                if not signal.category_assignment or not signal.location:
+                    continue
+
+                ctx = self.context_func(signal, areas=rule_set.areas)
+                department_id = self.get_routing_department_id(ctx, rule_set)
+
+                previous_department_ids = []
+                if signal.routing_assignment:
+                    previous_department_ids = sorted(
+                        department.id for department in signal.routing_assignment.departments.all()
+                    )
+
+                if department_id is None or previous_department_ids == [department_id]:
+                    continue
+
+                changes.append((signal.id, previous_department_ids, department_id))
+                assignments.append((signal, department_id))
+
+            if not dry_run:
+                self.signal_manager.update_routing_departments_bulk(assignments)
+
+        return changes
@@ -1,58 +1,70 @@
 # SPDX-License-Identifier: MPL-2.0
 # Copyright (C) 2020 - 2021 Vereniging van Nederlandse Gemeenten, Gemeente Amsterdam
+from django.conf import settings
 from django.db.models import Q
 
+from signals.utils.cache import VersionedCache
+
 
 class SignalPermissionService:
+    # The category and department ids a user has access to only change when the departments of a user or the
+    # categories of a department change. Therefore these ids are cached per user in the shared cache, the cache is
+    # invalidated (in all processes) when that happens (see signals.apps.signals.signal_receivers).
+    snapshot_cache = VersionedCache(namespace='signal-permissions', timeout=settings.SIGNAL_PERMISSION_CACHE_TIMEOUT)
 
-    def make_permisson_condition_for_user(self, user):
-        category_ids = user.profile.departments.prefetch_related(
-            'categorydepartment_set'
-        ).filter(
+    def _make_permission_snapshot(self, user):
+        department_ids = set(user.profile.departments.values_list('id', flat=True))
+
+        category_ids, viewable_category_ids = set(), set()
+        category_departments = user.profile.departments.filter(
             Q(categorydepartment__is_responsible=True) |
             Q(categorydepartment__can_view=True)
         ).values_list(
             'categorydepartment__category_id',
-            flat=True
+            'categorydepartment__can_view',
         )
+        for category_id, can_view in category_departments:
+            category_ids.add(category_id)
+            if can_view:
+                viewable_category_ids.add(category_id)
 
-        department_ids = user.profile.departments.values_list('id', flat=True)
+        return {
+            'department_ids': department_ids,
+            'category_ids': category_ids,
+            'viewable_category_ids': viewable_category_ids,
+        }
 
-        return (
-            Q(category_assignment__category_id__in=category_ids) |
-            Q(routing_assignment__departments__id__in=department_ids)
+    def get_permission_snapshot(self, user):
+        """
+        Returns the department ids of the user, the category ids the user is responsible for or can view and the
+        category ids the user can view.
+        """
+        return self.snapshot_cache.get_or_set(
+            lambda: self._make_permission_snapshot(user),
+            params={'user': user.pk}
         )
 
-    def has_permission_via_routing(self, user, signal):
+    def invalidate(self):
+        self.snapshot_cache.invalidate()
 
-        has_read_permission_via_routing = set(
-            user.profile.departments.values_list(
-                'pk',
-                flat=True
-            )
-        ).intersection(
-            signal.signal_departments.filter(
-                relation_type='routing',
-            ).values_list(
-                'departments__pk',
-                flat=True
-            )
+    def make_permisson_condition_for_user(self, user):
+        snapshot = self.get_permission_snapshot(user)
+
+        return (
+            Q(category_assignment__category_id__in=snapshot['category_ids']) |
+            Q(routing_assignment__departments__id__in=snapshot['department_ids'])
         )
 
-        return bool(has_read_permission_via_routing)
+    def has_permission_via_routing(self, user, signal):
+        department_ids = self.get_permission_snapshot(user)['department_ids']
+        if not department_ids:
+            return False
+
+        return signal.signal_departments.filter(
+            relation_type='routing',
+            departments__pk__in=department_ids
+        ).exists()
 
     def has_permission_via_category(self, user, signal):
-        has_category_read_permission = set(
-            user.profile.departments.values_list(
-                'pk',
-                flat=True
-            )
-        ).intersection(
-            signal.category_assignment.category.departments.filter(
-                categorydepartment__can_view=True
-            ).values_list(
-                'pk',
-                flat=True
-            )
-        )
-        return bool(has_category_read_permission)
+        viewable_category_ids = self.get_permission_snapshot(user)['viewable_category_ids']
+        return signal.category_assignment.category_id in viewable_category_ids
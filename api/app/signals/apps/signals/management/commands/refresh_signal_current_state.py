@@ -0,0 +1,27 @@
+# SPDX-License-Identifier: MPL-2.0
+# Copyright (C) 2021 Gemeente Amsterdam
+"""
+(Re)build the denormalized SignalCurrentState table for all Signals.
+
+Normally the current state is kept up to date when a Signal or its category changes, this command can be used to repair
+the table (for example after changes made directly in the database).
+"""
+from django.core.management import BaseCommand
+
+from signals.apps.signals.models import Signal, SignalCurrentState
+
+
+class Command(BaseCommand):
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000,
+                            help='Number of Signals refreshed per query (default: 5000)')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+
+        self.stdout.write('Refreshing the current state of all Signals ...')
+
+        for total in SignalCurrentState.objects.refresh_in_batches(Signal.objects.all(), batch_size=batch_size):
+            self.stdout.write(f'... {total} Signals refreshed')
+
+        self.stdout.write('Done')
@@ -0,0 +1,55 @@
+# SPDX-License-Identifier: MPL-2.0
+# Copyright (C) 2021 Gemeente Amsterdam
+"""
+Re-evaluate the routing rules for all open Signals.
+
+New Signals are routed when they are created, this command applies new or changed routing rules to the existing open
+Signals. The Signals are processed in chunks, use --dry-run to see which Signals would be routed to another department
+without changing anything. With --async the chunks are processed by Celery workers.
+"""
+from django.core.management import BaseCommand
+
+from signals.apps.services.domain.dsl import SignalDslService
+from signals.apps.signals.models import Department
+from signals.apps.signals.tasks import reroute_open_signals
+
+
+class Command(BaseCommand):
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000,
+                            help='Number of Signals processed at once (default: 1000)')
+        parser.add_argument('--dry-run', action='store_true', dest='dry_run',
+                            help='Only report the changes, the routing of the Signals is not changed')
+        parser.add_argument('--async', action='store_true', dest='async',
+                            help='Process the chunks using Celery tasks')
+
+    def _department_codes(self, department_ids, departments):
+        return ', '.join(departments[department_id].code for department_id in department_ids) or '-'
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        dry_run = options['dry_run']
+
+        if options['async']:
+            n_chunks = reroute_open_signals(chunk_size=chunk_size, dry_run=dry_run)
+            self.stdout.write(f'{n_chunks} chunks of open Signals queued for rerouting')
+            return
+
+        self.stdout.write(f'Rerouting open Signals{" (dry run)" if dry_run else ""} ...')
+
+        dsl_service = SignalDslService()
+        departments = Department.objects.in_bulk()
+
+        total, total_changed = 0, 0
+        for signal_ids in dsl_service.get_open_signal_id_chunks(chunk_size):
+            changes = dsl_service.reroute_signals(signal_ids, dry_run=dry_run)
+            for signal_id, previous_department_ids, department_id in changes:
+                self.stdout.write(f'Signal #{signal_id}: {self._department_codes(previous_department_ids, departments)}'
+                                  f' -> {self._department_codes([department_id], departments)}')
+
+            total += len(signal_ids)
+            total_changed += len(changes)
+            self.stdout.write(f'... {total} Signals processed')
+
+        self.stdout.write(f'{total_changed} of {total} Signals {"would be " if dry_run else ""}rerouted')
+        self.stdout.write('Done')
@@ -6,6 +6,7 @@ from django.contrib.gis.db import models
 from django.core.exceptions import ValidationError
 from django.db import transaction
 from django.dispatch import Signal as DjangoSignal
+from django.utils import timezone
 
 from signals.settings import DEFAULT_SIGNAL_AREA_TYPE
 
@@ -21,6 +22,23 @@ update_reporter = DjangoSignal()
 update_priority = DjangoSignal()
 create_note = DjangoSignal()
 update_type = DjangoSignal()
+update_user_assignment = DjangoSignal()
+update_routing_assignment = DjangoSignal()
+
+DJANGO_SIGNALS = {
+    'create_initial': create_initial,
+    'create_child': create_child,
+    'add_attachment': add_attachment,
+    'update_location': update_location,
+    'update_status': update_status,
+    'update_category_assignment': update_category_assignment,
+    'update_reporter': update_reporter,
+    'update_priority': update_priority,
+    'create_note': create_note,
+    'update_type': update_type,
+    'update_user_assignment': update_user_assignment,
+    'update_routing_assignment': update_routing_assignment,
+}
 
 
 def send_signals(to_send):
@@ -33,6 +51,22 @@ def send_signals(to_send):
         django_signal.send_robust(**kwargs)
 
 
+def send_signals_on_commit(to_send):
+    """
+    Helper function, sends the Django signals after the current transaction is committed.
+
+    With the outbox enabled the Django signals are also stored as events in the current transaction, the receivers
+    registered with outbox_receiver are called by the dispatch_signal_events task (see signals.apps.signals.outbox).
+
+    :param to_send: list of tuples of django signal definition and keyword arguments
+    """
+    from signals.apps.signals import outbox, tasks
+
+    if outbox.is_enabled() and outbox.add_events(to_send):
+        transaction.on_commit(tasks.schedule_dispatch_signal_events)
+    transaction.on_commit(lambda: send_signals(to_send))
+
+
 class SignalManager(models.Manager):
 
     def _create_initial_no_transaction(self, signal_data, location_data, status_data,
@@ -115,11 +149,130 @@ class SignalManager(models.Manager):
                 type_data=type_data,
             )
 
-            transaction.on_commit(lambda: create_initial.send_robust(sender=self.__class__,
-                                                                     signal_obj=signal))
+            send_signals_on_commit([(create_initial, {
+                'sender': self.__class__,
+                'signal_obj': signal,
+            })])
 
         return signal
 
+    def _validate_bulk(self, signals):
+        """
+        Bulk version of Signal._validate for new Signals, bulk_create does not call Signal.save
+
+        :param signals: list of (unsaved) Signal objects
+        """
+        from django.conf import settings
+
+        new_children = {}
+        for signal in signals:
+            if signal.parent_id:
+                new_children.setdefault(signal.parent_id, []).append(signal)
+
+        for children in new_children.values():
+            parent = children[0].parent
+            if parent.is_child:
+                raise ValidationError('A child of a child is not allowed')
+
+            if parent.children.count() + len(children) > settings.SIGNAL_MAX_NUMBER_OF_CHILDREN:
+                raise ValidationError('Maximum number of children reached for the parent Signal')
+
+    def _create_initial_bulk_no_transaction(self, signals_data):
+        """Create new `Signal` objects with all related objects in bulk.
+            If a transaction is needed use SignalManager.create_initial_bulk
+
+        :param signals_data: list of dicts with the keyword arguments of SignalManager.create_initial
+        :returns: list of Signal objects
+        """
+        from .models import CategoryAssignment, Location, Priority, Reporter, Status, Type
+        from .utils.location import _get_area_codes, _get_stadsdeel_area_type, _translate_stadsdeel_code
+
+        signals = [self.model(**data['signal_data']) for data in signals_data]
+        self._validate_bulk(signals)
+        signals = self.bulk_create(signals)
+
+        # Determine the stadsdeel (SIG-2513) and the area of all locations using one query
+        stadsdeel_area_type = _get_stadsdeel_area_type()
+        area_codes = _get_area_codes(
+            geometries=[data['location_data']['geometrie'] for data in signals_data],
+            area_types=[area_type for area_type in (stadsdeel_area_type, DEFAULT_SIGNAL_AREA_TYPE) if area_type]
+        )
+
+        locations, statuses, category_assignments, reporters, priorities, signal_types = [], [], [], [], [], []
+        for signal, data, codes in zip(signals, signals_data, area_codes):
+            location_data = data['location_data']
+            if stadsdeel_area_type:
+                location_data['stadsdeel'] = _translate_stadsdeel_code(codes.get(stadsdeel_area_type),
+                                                                       location_data.get('stadsdeel', None))
+            if DEFAULT_SIGNAL_AREA_TYPE and DEFAULT_SIGNAL_AREA_TYPE in codes:
+                location_data['area_type_code'] = DEFAULT_SIGNAL_AREA_TYPE
+                location_data['area_code'] = codes[DEFAULT_SIGNAL_AREA_TYPE]
+
+            # bulk_create does not call save, so the logic of the save methods is called here
+            location = Location(**location_data, _signal=signal)
+            location.set_address_text()
+            locations.append(location)
+
+            statuses.append(Status(**data['status_data'], _signal=signal))
+
+            category_assignment = CategoryAssignment(**data['category_assignment_data'], _signal=signal)
+            category_assignment.set_deadlines()
+            category_assignments.append(category_assignment)
+
+            reporter = Reporter(**data['reporter_data'], _signal=signal)
+            reporter.clear_anonymized_contact_details()
+            reporters.append(reporter)
+
+            priorities.append(Priority(**(data.get('priority_data') or {}), _signal=signal))
+
+            # If type_data is None a Type is created with the default "SIGNAL" value
+            signal_type = Type(**(data.get('type_data') or {}), _signal=signal)
+            signal_type.full_clean(exclude=['_signal'])
+            signal_types.append(signal_type)
+
+        Location.objects.bulk_create(locations)
+        Status.objects.bulk_create(statuses)
+        CategoryAssignment.objects.bulk_create(category_assignments)
+        Reporter.objects.bulk_create(reporters)
+        Priority.objects.bulk_create(priorities)
+        Type.objects.bulk_create(signal_types)
+
+        # Set Signal to dependent model instance foreign keys
+        for signal, location, status, category_assignment, reporter, priority, signal_type in zip(
+                signals, locations, statuses, category_assignments, reporters, priorities, signal_types):
+            signal.location = location
+            signal.status = status
+            signal.category_assignment = category_assignment
+            signal.reporter = reporter
+            signal.priority = priority
+            signal.type_assignment = signal_type
+
+        self.bulk_update(signals, fields=['location', 'status', 'category_assignment', 'reporter', 'priority',
+                                          'type_assignment'])
+        return signals
+
+    def create_initial_bulk(self, signals_data):
+        """Create new `Signal` objects with all related objects in a handful of queries.
+
+        The `create_initial` Django signal is sent for every created Signal after the transaction is committed.
+
+        :param signals_data: list of dicts with the keyword arguments of SignalManager.create_initial (signal_data,
+                             location_data, status_data, category_assignment_data, reporter_data and optionally
+                             priority_data and type_data)
+        :returns: list of Signal objects
+        """
+        if not signals_data:
+            return []
+
+        with transaction.atomic():
+            signals = self._create_initial_bulk_no_transaction(signals_data)
+
+            send_signals_on_commit([
+                (create_initial, {'sender': self.__class__, 'signal_obj': signal}) for signal in signals
+            ])
+
+        return signals
+
     def add_image(self, image, signal):
         return self.add_attachment(image, signal)
 
@@ -138,8 +291,11 @@ class SignalManager(models.Manager):
             attachment.save()
 
             # SIG-2213 use transaction.on_commit to send relevant Django signals
-            transaction.on_commit(lambda: add_attachment.send_robust(
-                sender=self.__class__, signal_obj=signal, attachment=attachment))
+            send_signals_on_commit([(add_attachment, {
+                'sender': self.__class__,
+                'signal_obj': signal,
+                'attachment': attachment,
+            })])
 
         return attachment
 
@@ -185,10 +341,12 @@ class SignalManager(models.Manager):
             locked_signal = Signal.objects.select_for_update(nowait=True).get(pk=signal.pk)  # Lock the Signal
 
             location, prev_location = self._update_location_no_transaction(data, locked_signal)
-            transaction.on_commit(lambda: update_location.send_robust(sender=self.__class__,
-                                                                      signal_obj=locked_signal,
-                                                                      location=location,
-                                                                      prev_location=prev_location))
+            send_signals_on_commit([(update_location, {
+                'sender': self.__class__,
+                'signal_obj': locked_signal,
+                'location': location,
+                'prev_location': prev_location,
+            })])
 
         return location
 
@@ -225,10 +383,12 @@ class SignalManager(models.Manager):
             locked_signal = Signal.objects.select_for_update(nowait=True).get(pk=signal.pk)  # Lock the Signal
 
             status, prev_status = self._update_status_no_transaction(data=data, signal=locked_signal)
-            transaction.on_commit(lambda: update_status.send_robust(sender=self.__class__,
-                                                                    signal_obj=locked_signal,
-                                                                    status=status,
-                                                                    prev_status=prev_status))
+            send_signals_on_commit([(update_status, {
+                'sender': self.__class__,
+                'signal_obj': locked_signal,
+                'status': status,
+                'prev_status': prev_status,
+            })])
         return status
 
     def _update_category_assignment_no_transaction(self, data, signal):
@@ -270,11 +430,12 @@ class SignalManager(models.Manager):
 
             category_assignment, prev_category_assignment = \
                 self._update_category_assignment_no_transaction(data, locked_signal)
-            transaction.on_commit(lambda: update_category_assignment.send_robust(
-                sender=self.__class__,
-                signal_obj=locked_signal,
-                category_assignment=category_assignment,
-                prev_category_assignment=prev_category_assignment))
+            send_signals_on_commit([(update_category_assignment, {
+                'sender': self.__class__,
+                'signal_obj': locked_signal,
+                'category_assignment': category_assignment,
+                'prev_category_assignment': prev_category_assignment,
+            })])
 
         return category_assignment
 
@@ -296,10 +457,12 @@ class SignalManager(models.Manager):
             signal.reporter = reporter
             signal.save()
 
-            transaction.on_commit(lambda: update_reporter.send_robust(sender=self.__class__,
-                                                                      signal_obj=locked_signal,
-                                                                      reporter=reporter,
-                                                                      prev_reporter=prev_reporter))
+            send_signals_on_commit([(update_reporter, {
+                'sender': self.__class__,
+                'signal_obj': locked_signal,
+                'reporter': reporter,
+                'prev_reporter': prev_reporter,
+            })])
 
         return reporter
 
@@ -334,10 +497,12 @@ class SignalManager(models.Manager):
             locked_signal = Signal.objects.select_for_update(nowait=True).get(pk=signal.pk)  # Lock the Signal
 
             priority, prev_priority = self._update_priority_no_transaction(data, signal)
-            transaction.on_commit(lambda: update_priority.send_robust(sender=self.__class__,
-                                                                      signal_obj=locked_signal,
-                                                                      priority=priority,
-                                                                      prev_priority=prev_priority))
+            send_signals_on_commit([(update_priority, {
+                'sender': self.__class__,
+                'signal_obj': locked_signal,
+                'priority': priority,
+                'prev_priority': prev_priority,
+            })])
 
         return priority
 
@@ -368,9 +533,11 @@ class SignalManager(models.Manager):
             locked_signal = Signal.objects.select_for_update(nowait=True).get(pk=signal.pk)  # Lock the Signal
 
             note = self._create_note_no_transaction(data, locked_signal)
-            transaction.on_commit(lambda: create_note.send_robust(sender=self.__class__,
-                                                                  signal_obj=locked_signal,
-                                                                  note=note))
+            send_signals_on_commit([(create_note, {
+                'sender': self.__class__,
+                'signal_obj': locked_signal,
+                'note': note,
+            })])
 
         return note
 
@@ -391,6 +558,7 @@ class SignalManager(models.Manager):
 
             to_send = []
             sender = self.__class__
+            prev_user_assignment = locked_signal.user_assignment
 
             if 'location' in data:
                 location, prev_location = self._update_location_no_transaction(data['location'], locked_signal)  # noqa: E501
@@ -466,17 +634,31 @@ class SignalManager(models.Manager):
 
             if 'routing_assignment' in data:
                 update_detail_data = data['routing_assignment']
-                self._update_routing_departments_no_transaction(
+                routing_assignment = self._update_routing_departments_no_transaction(
                     update_detail_data, locked_signal
                 )
+                to_send.append((update_routing_assignment, {
+                    'sender': sender,
+                    'signal_obj': locked_signal,
+                    'routing_assignment': routing_assignment
+                }))
 
             if 'user_assignment' in data:
                 self._update_user_signal_no_transaction(
                     data, locked_signal
                 )
 
+            # The assigned user is also reset when the category or the routing departments change
+            if locked_signal.user_assignment != prev_user_assignment:
+                to_send.append((update_user_assignment, {
+                    'sender': sender,
+                    'signal_obj': locked_signal,
+                    'user_assignment': locked_signal.user_assignment,
+                    'prev_user_assignment': prev_user_assignment
+                }))
+
             # Send out all Django signals:
-            transaction.on_commit(lambda: send_signals(to_send))
+            send_signals_on_commit(to_send)
 
         locked_signal.refresh_from_db()
         return locked_signal
@@ -508,8 +690,12 @@ class SignalManager(models.Manager):
             previous_type = signal.type_assignment
             signal_type = self._update_type_no_transaction(data=data, signal=signal)
 
-            transaction.on_commit(lambda: update_type.send_robust(sender=self.__class__, signal_obj=signal,
-                                                                  type=signal_type, prev_type=previous_type))
+            send_signals_on_commit([(update_type, {
+                'sender': self.__class__,
+                'signal_obj': signal,
+                'type': signal_type,
+                'prev_type': previous_type,
+            })])
 
         return signal_type
 
@@ -577,13 +763,84 @@ class SignalManager(models.Manager):
 
         with transaction.atomic():
             locked_signal = Signal.objects.select_for_update(nowait=True).get(pk=signal.pk)  # Lock the Signal
+            prev_user_assignment = locked_signal.user_assignment
             departments = self._update_routing_departments_no_transaction(
                 data=data,
                 signal=locked_signal
             )
 
+            to_send = [(update_routing_assignment, {
+                'sender': self.__class__,
+                'signal_obj': locked_signal,
+                'routing_assignment': departments
+            })]
+            if locked_signal.user_assignment != prev_user_assignment:
+                to_send.append((update_user_assignment, {
+                    'sender': self.__class__,
+                    'signal_obj': locked_signal,
+                    'user_assignment': locked_signal.user_assignment,
+                    'prev_user_assignment': prev_user_assignment
+                }))
+            send_signals_on_commit(to_send)
+
         return departments
 
+    def update_routing_departments_bulk(self, assignments):
+        """Assign a routing department to multiple `Signal` objects in a handful of queries.
+
+        The Signals should be locked by the caller (select_for_update). As in update_routing_departments the assigned
+        user is removed when a Signal is routed to another department. The `update_routing_assignment` and
+        `update_user_assignment` Django signals are sent after the transaction is committed.
+
+        :param assignments: list of (Signal, department id) tuples
+        :returns: list of SignalDepartments objects
+        """
+        from signals.apps.signals.models import Signal
+        from signals.apps.signals.models.signal_departments import SignalDepartments
+
+        if not assignments:
+            return []
+
+        with transaction.atomic():
+            relations = SignalDepartments.objects.bulk_create([
+                SignalDepartments(_signal=signal, relation_type=SignalDepartments.REL_ROUTING)
+                for signal, _ in assignments
+            ])
+
+            through_model = SignalDepartments.departments.through
+            through_model.objects.bulk_create([
+                through_model(signaldepartments_id=relation.pk, department_id=department_id)
+                for relation, (_, department_id) in zip(relations, assignments)
+            ])
+
+            to_send = []
+            signals = []
+            now = timezone.now()
+            for relation, (signal, _) in zip(relations, assignments):
+                to_send.append((update_routing_assignment, {
+                    'sender': self.__class__,
+                    'signal_obj': signal,
+                    'routing_assignment': relation
+                }))
+                if signal.user_assignment and signal.routing_assignment:
+                    to_send.append((update_user_assignment, {
+                        'sender': self.__class__,
+                        'signal_obj': signal,
+                        'user_assignment': None,
+                        'prev_user_assignment': signal.user_assignment
+                    }))
+                    signal.user_assignment = None
+
+                signal.routing_assignment = relation
+                signal.updated_at = now  # bulk_update does not set the auto_now fields
+                signals.append(signal)
+
+            Signal.objects.bulk_update(signals, fields=['routing_assignment', 'user_assignment', 'updated_at'])
+
+            send_signals_on_commit(to_send)
+
+        return relations
+
     def _copy_attachment_no_transaction(self, source_attachment, signal):
         from signals.apps.signals.models import Attachment
 
@@ -612,6 +869,6 @@ class SignalManager(models.Manager):
                 attachments.append(self._copy_attachment_no_transaction(attachment, locked_signal))
                 to_send.append((add_attachment, {'sender': sender, 'signal_obj': signal, 'attachment': attachment}))
 
-            transaction.on_commit(lambda: send_signals(to_send))  # SIG-2213
+            send_signals_on_commit(to_send)  # SIG-2213
 
         return attachments
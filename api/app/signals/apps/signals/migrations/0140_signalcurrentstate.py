@@ -0,0 +1,82 @@
+# SPDX-License-Identifier: MPL-2.0
+# Copyright (C) 2021 Gemeente Amsterdam
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('signals', '0139_json_fields'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SignalCurrentState',
+            fields=[
+                ('_signal', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True,
+                                                 related_name='current_state', serialize=False,
+                                                 to='signals.signal')),
+                ('created_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+                ('state', models.CharField(max_length=20, null=True)),
+                ('category_id', models.IntegerField(null=True)),
+                ('category_slug', models.SlugField(null=True)),
+                ('parent_category_id', models.IntegerField(null=True)),
+                ('parent_category_slug', models.SlugField(null=True)),
+                ('stadsdeel', models.CharField(max_length=1, null=True)),
+                ('area_type_code', models.CharField(max_length=256, null=True)),
+                ('area_code', models.CharField(max_length=256, null=True)),
+                ('buurt_code', models.CharField(max_length=4, null=True)),
+                ('address_text', models.CharField(max_length=256, null=True)),
+                ('priority', models.CharField(max_length=10, null=True)),
+                ('type', models.CharField(max_length=3, null=True)),
+                ('deadline', models.DateTimeField(null=True)),
+                ('deadline_factor_3', models.DateTimeField(null=True)),
+                ('assigned_user_email', models.EmailField(max_length=254, null=True)),
+                ('has_email', models.BooleanField(default=False)),
+                ('has_phone', models.BooleanField(default=False)),
+                ('refreshed_at', models.DateTimeField()),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='signalcurrentstate',
+            index=models.Index(fields=['created_at'], name='signals_sig_created_9131ff_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='signalcurrentstate',
+            index=models.Index(fields=['updated_at'], name='signals_sig_updated_d931f0_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='signalcurrentstate',
+            index=models.Index(fields=['state', 'created_at'], name='signals_sig_state_280550_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='signalcurrentstate',
+            index=models.Index(fields=['category_id'], name='signals_sig_categor_192007_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='signalcurrentstate',
+            index=models.Index(fields=['parent_category_id'], name='signals_sig_parent__ba7965_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='signalcurrentstate',
+            index=models.Index(fields=['stadsdeel'], name='signals_sig_stadsde_9f0f1b_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='signalcurrentstate',
+            index=models.Index(fields=['area_type_code', 'area_code'], name='signals_sig_area_ty_bbd96c_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='signalcurrentstate',
+            index=models.Index(fields=['priority'], name='signals_sig_priorit_26593c_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='signalcurrentstate',
+            index=models.Index(fields=['deadline'], name='signals_sig_deadlin_449017_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='signalcurrentstate',
+            index=models.Index(fields=['assigned_user_email'], name='signals_sig_assigne_3f4ab4_idx'),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# SPDX-License-Identifier: MPL-2.0
+# Copyright (C) 2021 Gemeente Amsterdam
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('signals', '0140_signalcurrentstate'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SignalEvent',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('name', models.CharField(max_length=255)),
+                ('sender', models.CharField(max_length=255)),
+                ('kwargs', models.JSONField(default=dict)),
+                ('handled', models.JSONField(default=list)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('locked_until', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+    ]
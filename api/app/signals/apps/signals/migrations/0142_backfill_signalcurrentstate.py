@@ -0,0 +1,76 @@
+# SPDX-License-Identifier: MPL-2.0
+# Copyright (C) 2021 Gemeente Amsterdam
+from django.db import migrations
+
+# Copied from SignalCurrentStateManager.refresh_sql to make sure the migration keeps working
+backfill_sql = """
+insert into signals_signalcurrentstate (
+    _signal_id, created_at, updated_at, state, category_id, category_slug, parent_category_id,
+    parent_category_slug, stadsdeel, area_type_code, area_code, buurt_code, address_text, priority, type,
+    deadline, deadline_factor_3, assigned_user_email, has_email, has_phone, refreshed_at
+)
+select
+    s.id,
+    s.created_at,
+    s.updated_at,
+    status.state,
+    cat.id,
+    cat.slug,
+    maincat.id,
+    maincat.slug,
+    l.stadsdeel,
+    l.area_type_code,
+    l.area_code,
+    l.buurt_code,
+    l.address_text,
+    p.priority,
+    t.name,
+    ca.deadline,
+    ca.deadline_factor_3,
+    u.email,
+    coalesce(r.email, '') <> '',
+    coalesce(r.phone, '') <> '',
+    now()
+from
+    signals_signal s
+    left join signals_status status on s.status_id = status.id
+    left join signals_categoryassignment ca on s.category_assignment_id = ca.id
+    left join signals_category cat on ca.category_id = cat.id
+    left join signals_category maincat on cat.parent_id = maincat.id
+    left join signals_location l on s.location_id = l.id
+    left join signals_reporter r on s.reporter_id = r.id
+    left join signals_priority p on s.priority_id = p.id
+    left join signals_type t on s.type_assignment_id = t.id
+    left join signals_signaluser su on s.user_assignment_id = su.id
+    left join auth_user u on su.user_id = u.id
+where
+    s.id > %(min_id)s and s.id <= %(max_id)s
+on conflict (_signal_id) do nothing
+"""
+
+BATCH_SIZE = 10000
+
+
+def backfill_signal_current_state(apps, schema_editor):
+    Signal = apps.get_model('signals', 'Signal')
+
+    last_id = Signal.objects.order_by('-id').values_list('id', flat=True).first()
+    if last_id is None:
+        return
+
+    with schema_editor.connection.cursor() as cursor:
+        for min_id in range(0, last_id, BATCH_SIZE):
+            cursor.execute(backfill_sql, {'min_id': min_id, 'max_id': min_id + BATCH_SIZE})
+
+
+class Migration(migrations.Migration):
+    # Every batch is committed on its own, the backfill can be continued by running the migration again
+    atomic = False
+
+    dependencies = [
+        ('signals', '0141_signalevent'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_signal_current_state, migrations.RunPython.noop),
+    ]
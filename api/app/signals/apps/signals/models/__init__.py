@@ -31,7 +31,9 @@ from signals.apps.signals.models.question import Question
 from signals.apps.signals.models.reporter import Reporter
 from signals.apps.signals.models.routing_expression import RoutingExpression
 from signals.apps.signals.models.signal import Signal
+from signals.apps.signals.models.signal_current_state import SignalCurrentState
 from signals.apps.signals.models.signal_departments import SignalDepartments
+from signals.apps.signals.models.signal_event import SignalEvent
 from signals.apps.signals.models.signal_user import SignalUser
 from signals.apps.signals.models.slo import ServiceLevelObjective
 from signals.apps.signals.models.source import Source
@@ -54,7 +56,9 @@ __all__ = [
     'ExpressionType',
     'ExpressionContext',
     'Expression',
+    'SignalCurrentState',
     'SignalDepartments',
+    'SignalEvent',
     'SignalUser',
     'History',
     'STADSDEEL_AMSTERDAMSE_BOS',
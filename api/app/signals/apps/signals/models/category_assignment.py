@@ -41,7 +41,7 @@ class CategoryAssignment(CreatedUpdatedModel):
         """String representation."""
         return '{sub} - {signal}'.format(sub=self.category, signal=self._signal)
 
-    def save(self, *args, **kwargs):
+    def set_deadlines(self):
         # Each time a category is changed the ServiceLevelObjective associated
         # with the new category may be different, de deadlines are recalculated
         # and saved for use in punctuality filter.
@@ -49,4 +49,7 @@ class CategoryAssignment(CreatedUpdatedModel):
         self.deadline, self.deadline_factor_3 = DeadlineCalculationService.from_signal_and_category(
             self._signal, self.category)
         self.stored_handling_message = self.category.handling_message  # SIG-3555
+
+    def save(self, *args, **kwargs):
+        self.set_deadlines()
         super().save(*args, **kwargs)
@@ -74,9 +74,11 @@ class Location(CreatedUpdatedModel):
         # openbare_ruimte huisnummerhuiletter-huisnummer_toevoeging
         return AddressFormatter(address=self.address).format('O hlT') if self.address else ''
 
-    def save(self, *args, **kwargs):
-        # Set address_text
+    def set_address_text(self):
         self.address_text = AddressFormatter(address=self.address).format('O hlT p W') if self.address else ''
+
+    def save(self, *args, **kwargs):
+        self.set_address_text()
         super().save(*args, **kwargs)
 
     def get_rd_coordinates(self):
@@ -51,14 +51,16 @@ class Reporter(CreatedUpdatedModel):
         if call_save or always_call_save:
             self.save()
 
-    def save(self, *args, **kwargs):
-        """
-        Make sure that the email and phone are set to none while saving the Reporter
-        """
+    def clear_anonymized_contact_details(self):
         if self.email_anonymized:
             self.email = None
 
         if self.phone_anonymized:
             self.phone = None
 
+    def save(self, *args, **kwargs):
+        """
+        Make sure that the email and phone are set to none while saving the Reporter
+        """
+        self.clear_anonymized_contact_details()
         super().save(*args, **kwargs)
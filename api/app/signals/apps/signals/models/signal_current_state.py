@@ -0,0 +1,163 @@
+# SPDX-License-Identifier: MPL-2.0
+# Copyright (C) 2021 Gemeente Amsterdam
+from django.contrib.gis.db import models
+from django.db import connection
+
+
+class SignalCurrentStateManager(models.Manager):
+    # One row per Signal, (re)build from the current state of the Signal and its related objects
+    refresh_sql = """
+    insert into signals_signalcurrentstate (
+        _signal_id, created_at, updated_at, state, category_id, category_slug, parent_category_id,
+        parent_category_slug, stadsdeel, area_type_code, area_code, buurt_code, address_text, priority, type,
+        deadline, deadline_factor_3, assigned_user_email, has_email, has_phone, refreshed_at
+    )
+    select
+        s.id,
+        s.created_at,
+        s.updated_at,
+        status.state,
+        cat.id,
+        cat.slug,
+        maincat.id,
+        maincat.slug,
+        l.stadsdeel,
+        l.area_type_code,
+        l.area_code,
+        l.buurt_code,
+        l.address_text,
+        p.priority,
+        t.name,
+        ca.deadline,
+        ca.deadline_factor_3,
+        u.email,
+        coalesce(r.email, '') <> '',
+        coalesce(r.phone, '') <> '',
+        now()
+    from
+        signals_signal s
+        left join signals_status status on s.status_id = status.id
+        left join signals_categoryassignment ca on s.category_assignment_id = ca.id
+        left join signals_category cat on ca.category_id = cat.id
+        left join signals_category maincat on cat.parent_id = maincat.id
+        left join signals_location l on s.location_id = l.id
+        left join signals_reporter r on s.reporter_id = r.id
+        left join signals_priority p on s.priority_id = p.id
+        left join signals_type t on s.type_assignment_id = t.id
+        left join signals_signaluser su on s.user_assignment_id = su.id
+        left join auth_user u on su.user_id = u.id
+    where
+        s.id = any(%(signal_ids)s)
+    on conflict (_signal_id) do update set
+        created_at = excluded.created_at,
+        updated_at = excluded.updated_at,
+        state = excluded.state,
+        category_id = excluded.category_id,
+        category_slug = excluded.category_slug,
+        parent_category_id = excluded.parent_category_id,
+        parent_category_slug = excluded.parent_category_slug,
+        stadsdeel = excluded.stadsdeel,
+        area_type_code = excluded.area_type_code,
+        area_code = excluded.area_code,
+        buurt_code = excluded.buurt_code,
+        address_text = excluded.address_text,
+        priority = excluded.priority,
+        type = excluded.type,
+        deadline = excluded.deadline,
+        deadline_factor_3 = excluded.deadline_factor_3,
+        assigned_user_email = excluded.assigned_user_email,
+        has_email = excluded.has_email,
+        has_phone = excluded.has_phone,
+        refreshed_at = excluded.refreshed_at
+    """
+
+    def refresh(self, signal_ids):
+        """
+        Insert or update the current state of the given Signals in a single query
+        """
+        signal_ids = list(signal_ids)
+        if not signal_ids:
+            return 0
+
+        with connection.cursor() as cursor:
+            cursor.execute(self.refresh_sql, {'signal_ids': signal_ids})
+            return cursor.rowcount
+
+    def refresh_in_batches(self, signal_qs, batch_size=5000):
+        """
+        Refresh the current state of the Signals in the given queryset in batches, yields the number of Signals
+        refreshed so far after every batch
+        """
+        # Walk through the Signals ordered by primary key, no need for an offset that gets slower for every batch
+        total, last_id = 0, 0
+        while True:
+            signal_ids = list(
+                signal_qs.filter(id__gt=last_id).order_by('id').values_list('id', flat=True)[:batch_size]
+            )
+            if not signal_ids:
+                break
+
+            total += self.refresh(signal_ids)
+            last_id = signal_ids[-1]
+            yield total
+
+
+class SignalCurrentState(models.Model):
+    """
+    Flattened, denormalized copy of the current state of a Signal.
+
+    Filtering and ordering the list of Signals on this table prevents joining the Signal with all related tables. The
+    rows are kept up to date by the receivers of the SignalManager Django signals and of changes to categories (see
+    signals.apps.signals.signal_receivers). The table is filled for existing Signals by a data migration, the
+    "refresh_signal_current_state" management command can be used to rebuild it.
+    """
+    _signal = models.OneToOneField('signals.Signal', primary_key=True, related_name='current_state',
+                                   on_delete=models.CASCADE)
+
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+
+    state = models.CharField(max_length=20, null=True)
+
+    category_id = models.IntegerField(null=True)
+    category_slug = models.SlugField(max_length=50, null=True)
+    parent_category_id = models.IntegerField(null=True)
+    parent_category_slug = models.SlugField(max_length=50, null=True)
+
+    stadsdeel = models.CharField(max_length=1, null=True)
+    area_type_code = models.CharField(max_length=256, null=True)
+    area_code = models.CharField(max_length=256, null=True)
+    buurt_code = models.CharField(max_length=4, null=True)
+    address_text = models.CharField(max_length=256, null=True)
+
+    priority = models.CharField(max_length=10, null=True)
+    type = models.CharField(max_length=3, null=True)
+
+    deadline = models.DateTimeField(null=True)
+    deadline_factor_3 = models.DateTimeField(null=True)
+
+    assigned_user_email = models.EmailField(null=True)
+
+    has_email = models.BooleanField(default=False)
+    has_phone = models.BooleanField(default=False)
+
+    refreshed_at = models.DateTimeField()
+
+    objects = SignalCurrentStateManager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at']),
+            models.Index(fields=['updated_at']),
+            models.Index(fields=['state', 'created_at']),
+            models.Index(fields=['category_id']),
+            models.Index(fields=['parent_category_id']),
+            models.Index(fields=['stadsdeel']),
+            models.Index(fields=['area_type_code', 'area_code']),
+            models.Index(fields=['priority']),
+            models.Index(fields=['deadline']),
+            models.Index(fields=['assigned_user_email']),
+        ]
+
+    def __str__(self):
+        return f'Current state of Signal {self._signal_id}'
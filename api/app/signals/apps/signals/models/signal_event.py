@@ -0,0 +1,51 @@
+# SPDX-License-Identifier: MPL-2.0
+# Copyright (C) 2021 Gemeente Amsterdam
+from django.contrib.gis.db import models
+
+from signals.utils.claim import claim, renew_claim
+
+
+class SignalEventManager(models.Manager):
+    def take(self, limit, lock_timeout):
+        """
+        Lock at most limit events for lock_timeout seconds and return them (oldest first).
+
+        An event that is not deleted within lock_timeout seconds (the dispatch failed or was interrupted) is taken
+        again by a next dispatch.
+        """
+        event_ids, _ = claim(self.model, where='locked_until is null or locked_until < %(now)s', order_by='id',
+                             limit=limit, lock_timeout=lock_timeout, attempts_field='attempts')
+        return list(self.filter(id__in=event_ids).order_by('id'))
+
+
+class SignalEvent(models.Model):
+    """
+    Outbox of the Django signals sent by the SignalManager.
+
+    The events are stored in the same transaction as the change itself and dispatched to the receivers registered
+    with signals.apps.signals.outbox.outbox_receiver after the commit (see signals.apps.signals.outbox).
+    """
+    id = models.BigAutoField(primary_key=True)
+    name = models.CharField(max_length=255)  # The name of the Django signal in signals.apps.signals.managers
+    sender = models.CharField(max_length=255)
+    kwargs = models.JSONField(default=dict)
+    handled = models.JSONField(default=list)  # The dispatch_uid's of the receivers that handled the event
+    attempts = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    locked_until = models.DateTimeField(null=True, blank=True)
+
+    objects = SignalEventManager()
+
+    def __str__(self):
+        return f'{self.name} #{self.id}'
+
+    def renew_claim(self, lock_timeout):
+        """
+        Extend the lock of a taken event, returns False if the lock expired and the event was taken by another dispatch
+        """
+        locked_until = renew_claim(SignalEvent.objects.filter(pk=self.pk), self.locked_until, lock_timeout)
+        if locked_until is None:
+            return False
+
+        self.locked_until = locked_until
+        return True
@@ -0,0 +1,172 @@
+# SPDX-License-Identifier: MPL-2.0
+# Copyright (C) 2021 Gemeente Amsterdam
+"""
+Transactional outbox for the side effects of the changes made by the SignalManager.
+
+Receivers with side effects outside of the request (routing, e-mail, the search index, Sigmax) are registered with
+outbox_receiver instead of django.dispatch.receiver. When the SIGNAL_EVENT_OUTBOX_ENABLED feature flag is enabled the
+SignalManager stores an event for every Django signal these receivers listen to, in the same transaction as the change
+itself. After the commit the events are dispatched in batches by the dispatch_signal_events task, which is also
+scheduled in Celery beat. So an event is never lost, not even when the broker is unavailable at the moment of the
+commit.
+
+Receivers registered with django.dispatch.receiver (cache invalidation, the SignalCurrentState) are still called
+directly after the commit.
+"""
+import logging
+from collections import defaultdict
+
+from django.apps import apps
+from django.conf import settings
+from django.db.models import Model
+from django.utils.module_loading import import_string
+
+from signals.apps.signals import managers
+from signals.apps.signals.models import SignalEvent
+
+logger = logging.getLogger(__name__)
+
+# Django signal name -> {dispatch_uid: receiver}
+_receivers = defaultdict(dict)
+
+
+def is_enabled():
+    return settings.FEATURE_FLAGS.get('SIGNAL_EVENT_OUTBOX_ENABLED', False)
+
+
+def _get_signal_name(django_signal):
+    for name, candidate in managers.DJANGO_SIGNALS.items():
+        if candidate is django_signal:
+            return name
+    raise ValueError('Only the Django signals of the SignalManager can be used with the outbox')
+
+
+def outbox_receiver(django_signals, dispatch_uid, direct=True):
+    """
+    Same as django.dispatch.receiver, but the receiver is called by dispatch_events if the outbox is enabled.
+
+    With direct=False the receiver is only called by dispatch_events, also when the outbox is disabled it is not called
+    directly after the commit.
+    """
+    if not isinstance(django_signals, (list, tuple)):
+        django_signals = [django_signals]
+
+    def decorator(func):
+        def _receiver(sender, **kwargs):
+            if not is_enabled():
+                return func(sender, **kwargs)
+
+        for django_signal in django_signals:
+            _receivers[_get_signal_name(django_signal)][dispatch_uid] = func
+            if direct:
+                django_signal.connect(_receiver, weak=False, dispatch_uid=dispatch_uid)
+        return func
+    return decorator
+
+
+def _serialize(value):
+    if isinstance(value, Model):
+        return {'model': value._meta.label_lower, 'pk': value.pk}
+    return value
+
+
+def _is_reference(value):
+    return isinstance(value, dict) and set(value) == {'model', 'pk'}
+
+
+def add_events(to_send):
+    """
+    Store an event for the Django signals (list of tuples of Django signal and keyword arguments, see send_signals)
+    that are received by one or more outbox receivers
+    """
+    events = []
+    for django_signal, kwargs in to_send:
+        name = _get_signal_name(django_signal)
+        if not _receivers[name]:
+            continue
+
+        sender = kwargs['sender']
+        events.append(SignalEvent(
+            name=name,
+            sender=f'{sender.__module__}.{sender.__qualname__}',
+            kwargs={key: _serialize(value) for key, value in kwargs.items() if key != 'sender'},
+        ))
+    return SignalEvent.objects.bulk_create(events)
+
+
+def _load_kwargs(events):
+    """
+    Returns the keyword arguments of the events, the referenced model instances are loaded with one query per model
+    """
+    pks = defaultdict(set)
+    for event in events:
+        for value in event.kwargs.values():
+            if _is_reference(value):
+                pks[value['model']].add(value['pk'])
+
+    instances = {
+        label: apps.get_model(label)._default_manager.in_bulk(list(model_pks))
+        for label, model_pks in pks.items()
+    }
+
+    return [
+        {
+            key: instances[value['model']].get(value['pk']) if _is_reference(value) else value
+            for key, value in event.kwargs.items()
+        }
+        for event in events
+    ]
+
+
+def _dispatch_event(event, kwargs):
+    """
+    Call the receivers that did not handle the event yet, returns True if all receivers handled the event
+    """
+    sender = import_string(event.sender)
+
+    for dispatch_uid, func in _receivers[event.name].items():
+        if dispatch_uid in event.handled:
+            continue
+
+        try:
+            func(sender=sender, **kwargs)
+        except Exception:
+            logger.exception(f'Receiver {dispatch_uid} failed to handle SignalEvent {event.id} ({event.name})')
+        else:
+            event.handled.append(dispatch_uid)
+
+    return len(event.handled) >= len(_receivers[event.name])
+
+
+def dispatch_events(batch_size, lock_timeout, max_attempts):
+    """
+    Dispatch the events in batches, returns the number of dispatched events.
+
+    The lock of an event is extended just before it is dispatched, the batch is stopped when the lock expired and the
+    event was taken by another dispatch. The result is recorded directly after every event: an event is deleted once
+    all its receivers handled it. Events whose receivers failed stay locked, they are dispatched again (only to the
+    receivers that failed) after lock_timeout seconds, at most max_attempts times.
+    """
+    total = 0
+    while True:
+        events = SignalEvent.objects.take(batch_size, lock_timeout)
+        if not events:
+            break
+
+        for event, kwargs in zip(events, _load_kwargs(events)):
+            if not event.renew_claim(lock_timeout):
+                logger.warning(f'Lock of SignalEvent {event.id} ({event.name}) expired, the rest of the batch is left '
+                               f'to the dispatch that took it')
+                break
+
+            if _dispatch_event(event, kwargs):
+                event.delete()
+                total += 1
+            elif event.attempts >= max_attempts:
+                logger.error(f'SignalEvent {event.id} ({event.name}) dropped after {event.attempts} attempts')
+                event.delete()
+                total += 1
+            else:
+                event.save(update_fields=['handled'])
+
+    return total
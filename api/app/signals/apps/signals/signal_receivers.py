@@ -1,16 +1,110 @@
 # SPDX-License-Identifier: MPL-2.0
 # Copyright (C) 2019 - 2021 Gemeente Amsterdam
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_save
 from django.dispatch import receiver
 
+from signals.apps.services.domain.dsl import SignalDslService
+from signals.apps.services.domain.signal_permission import SignalPermissionService
 from signals.apps.signals import tasks
-from signals.apps.signals.managers import create_initial, update_status
+from signals.apps.signals.managers import (
+    add_attachment,
+    create_child,
+    create_initial,
+    create_note,
+    update_category_assignment,
+    update_location,
+    update_priority,
+    update_reporter,
+    update_routing_assignment,
+    update_status,
+    update_type,
+    update_user_assignment
+)
+from signals.apps.signals.models import (
+    Area,
+    AreaType,
+    Category,
+    CategoryDepartment,
+    Department,
+    Expression,
+    RoutingExpression,
+    SignalCurrentState
+)
+from signals.apps.signals.outbox import outbox_receiver
+from signals.apps.signals.utils.area_index import AreaIndex
+from signals.apps.users.models import Profile
 
 
 @receiver(create_initial, dispatch_uid='signals_create_initial')
 def signals_create_initial_handler(sender, signal_obj, **kwargs):
-    tasks.apply_routing(signal_obj.id)
+    tasks.route_signal(signal_obj.id)
+
+
+@outbox_receiver(create_initial, dispatch_uid='signals_create_initial_routing', direct=False)
+def apply_routing_handler(sender, signal_obj, **kwargs):
+    # Routes the Signals that are not routed directly after the commit (apply_routing skips Signals that are routed).
+    # The outbox makes sure the task is queued, the routing itself runs in a Celery worker and not in the dispatch
+    tasks.apply_routing.delay(signal_obj.id)
 
 
 @receiver(update_status, dispatch_uid='signals_update_status')
 def update_status_handler(sender, signal_obj, status, prev_status, *args, **kwargs):
     tasks.update_status_children_based_on_parent(signal_id=signal_obj.pk)
+
+
+@receiver([post_save, post_delete], sender=CategoryDepartment, dispatch_uid='signals_category_department_changed')
+@receiver(post_delete, sender=Department, dispatch_uid='signals_department_deleted')
+@receiver(m2m_changed, sender=CategoryDepartment, dispatch_uid='signals_category_department_m2m_changed')
+@receiver(m2m_changed, sender=Profile.departments.through, dispatch_uid='signals_profile_departments_changed')
+def invalidate_permission_cache_handler(sender, **kwargs):
+    # Deleting a Department also deletes its links with the profiles, without sending m2m_changed. m2m_changed is sent
+    # before and after a change, the cache only needs to be invalidated after it
+    if kwargs.get('action', 'post_').startswith('post_'):
+        SignalPermissionService().invalidate()
+
+
+@receiver([create_initial, create_child, add_attachment, create_note, update_location, update_status,
+           update_category_assignment, update_reporter, update_priority, update_type, update_user_assignment,
+           update_routing_assignment],
+          dispatch_uid='signals_refresh_current_state')
+def refresh_current_state_handler(sender, signal_obj, **kwargs):
+    SignalCurrentState.objects.refresh([signal_obj.pk])
+
+
+# The fields of a Category that are part of the SignalCurrentState of its Signals
+CURRENT_STATE_CATEGORY_FIELDS = ('parent_id', 'slug', 'name')
+
+
+@receiver(pre_save, sender=Category, dispatch_uid='signals_category_current_state_fields')
+def store_current_state_fields_of_category_handler(sender, instance, **kwargs):
+    instance._current_state_fields = Category.objects.filter(pk=instance.pk).values_list(
+        *CURRENT_STATE_CATEGORY_FIELDS
+    ).first() if instance.pk else None
+
+
+@receiver(post_save, sender=Category, dispatch_uid='signals_category_refresh_current_state')
+def refresh_current_state_of_category_handler(sender, instance, created, **kwargs):
+    previous_fields = getattr(instance, '_current_state_fields', None)
+    if created or previous_fields is None:
+        # A new category has no Signals yet
+        return
+
+    if previous_fields == tuple(getattr(instance, field) for field in CURRENT_STATE_CATEGORY_FIELDS):
+        return
+
+    # The category can contain a lot of Signals, they are refreshed in a task
+    transaction.on_commit(lambda: tasks.refresh_current_state_of_categories.delay(category_ids=[instance.pk]))
+
+
+@receiver([post_save, post_delete], sender=Area, dispatch_uid='signals_area_changed')
+@receiver([post_save, post_delete], sender=AreaType, dispatch_uid='signals_area_type_changed')
+def invalidate_area_index_handler(sender, **kwargs):
+    AreaIndex.invalidate()
+    SignalDslService().invalidate()
+
+
+@receiver([post_save, post_delete], sender=RoutingExpression, dispatch_uid='signals_routing_expression_changed')
+@receiver([post_save, post_delete], sender=Expression, dispatch_uid='signals_expression_changed')
+def invalidate_routing_rules_handler(sender, **kwargs):
+    SignalDslService().invalidate()
@@ -1,13 +1,16 @@
 # SPDX-License-Identifier: MPL-2.0
 # Copyright (C) 2018 - 2021 Gemeente Amsterdam
 import logging
+import time
 
 from django.conf import settings
+from django.core.cache import cache
 from django.db.models import Q
 from django.utils import timezone
 
 from signals.apps.services.domain.dsl import SignalDslService
-from signals.apps.signals.models import Reporter
+from signals.apps.signals import outbox
+from signals.apps.signals.models import Reporter, SignalCurrentState
 from signals.apps.signals.models.signal import Signal
 from signals.apps.signals.workflow import (
     AFGEHANDELD,
@@ -21,10 +24,83 @@ log = logging.getLogger(__name__)
 dsl_service = SignalDslService()
 
 
+# Estimate (moving average, in milliseconds) of the duration of applying the routing rules to a new Signal
+ROUTING_DURATION_CACHE_KEY = 'signals-routing-duration'
+
+
+def _record_routing_duration(duration):
+    previous_duration = cache.get(ROUTING_DURATION_CACHE_KEY)
+    if previous_duration is not None:
+        duration = 0.8 * previous_duration + 0.2 * duration
+    cache.set(ROUTING_DURATION_CACHE_KEY, duration, timeout=settings.ROUTING_DURATION_TIMEOUT)
+
+
 @app.task
 def apply_routing(signal_id):
+    """
+    Apply the routing rules to a new Signal.
+
+    Idempotent, a Signal that is already routed (by an earlier run or by a user in the meantime) is left as is.
+    """
     signal = Signal.objects.get(pk=signal_id)
+    if signal.routing_assignment_id is not None:
+        log.info(f'apply_routing - Signal {signal_id} is already routed')
+        return
+
+    start = time.monotonic()
     dsl_service.process_routing_rules(signal)
+    _record_routing_duration((time.monotonic() - start) * 1000)
+
+
+def route_signal(signal_id):
+    """
+    Apply the routing rules to a new Signal, directly if routing is expected to take at most ROUTING_SYNC_THRESHOLD
+    milliseconds and otherwise asynchronously. With the outbox enabled the Signal is routed by the dispatch of its
+    create_initial event (see signals.apps.signals.signal_receivers), otherwise by a Celery task.
+
+    The expectation is based on the durations of the previous runs. Without a (recent) expectation the routing rules
+    are applied directly, so the duration is measured again after ROUTING_DURATION_TIMEOUT seconds.
+    """
+    expected_duration = cache.get(ROUTING_DURATION_CACHE_KEY)
+    threshold = settings.ROUTING_SYNC_THRESHOLD
+    if threshold > 0 and (expected_duration is None or expected_duration <= threshold):
+        apply_routing(signal_id)
+    elif not outbox.is_enabled():
+        apply_routing.delay(signal_id)
+
+
+@app.task
+def reroute_signals(signal_ids, dry_run=False):
+    changes = dsl_service.reroute_signals(signal_ids, dry_run=dry_run)
+    log.info(f'{len(changes)} of {len(signal_ids)} Signals rerouted{" (dry run)" if dry_run else ""}')
+    return changes
+
+
+@app.task
+def reroute_open_signals(chunk_size=1000, dry_run=False):
+    n_chunks = 0
+    for signal_ids in dsl_service.get_open_signal_id_chunks(chunk_size):
+        reroute_signals.delay(signal_ids=signal_ids, dry_run=dry_run)
+        n_chunks += 1
+    return n_chunks
+
+
+@app.task
+def refresh_current_state_of_categories(category_ids):
+    """
+    Refresh the current state of the Signals in the given (main) categories, for example after a category is moved to
+    another main category
+    """
+    signals = Signal.objects.filter(
+        Q(category_assignment__category_id__in=category_ids) |
+        Q(category_assignment__category__parent_id__in=category_ids)
+    )
+
+    total = 0
+    for total in SignalCurrentState.objects.refresh_in_batches(signals):
+        pass
+    log.info(f'refresh_current_state_of_categories - {total} Signals refreshed')
+    return total
 
 
 @app.task
@@ -96,3 +172,33 @@ def update_status_children_based_on_parent(signal_id):
             # All children must get the state "GEANNULEERD"
             data = dict(state=GEANNULEERD, text=text)
             Signal.actions.update_status(data=data, signal=child)
+
+
+@app.task
+def dispatch_signal_events():
+    """
+    Dispatch the events stored in the outbox (see signals.apps.signals.outbox).
+
+    The events are dispatched shortly after they are stored (see schedule_dispatch_signal_events), this task is also
+    scheduled in Celery beat to dispatch the events that could not be dispatched before.
+    """
+    total = outbox.dispatch_events(batch_size=settings.SIGNAL_EVENTS_BATCH_SIZE,
+                                   lock_timeout=settings.SIGNAL_EVENTS_LOCK_TIMEOUT,
+                                   max_attempts=settings.SIGNAL_EVENTS_MAX_ATTEMPTS)
+    log.info(f'dispatch_signal_events - {total} events dispatched')
+    return total
+
+
+def schedule_dispatch_signal_events():
+    """
+    Dispatch the events after SIGNAL_EVENTS_DISPATCH_DELAY seconds, unless a dispatch is already scheduled
+    """
+    key = 'signals-dispatch-signal-events-scheduled'
+    delay = settings.SIGNAL_EVENTS_DISPATCH_DELAY
+    if cache.add(key, True, timeout=delay):
+        try:
+            dispatch_signal_events.apply_async(countdown=delay)
+        except Exception:
+            # The events stay in the outbox, they are dispatched by the next dispatch
+            log.warning('Scheduling dispatch_signal_events failed', exc_info=True)
+            cache.delete(key)
@@ -0,0 +1,75 @@
+# SPDX-License-Identifier: MPL-2.0
+# Copyright (C) 2021 Gemeente Amsterdam
+import logging
+import threading
+from typing import Optional
+
+from django.contrib.gis.db.models import PointField
+
+from signals.apps.signals.models import Area
+from signals.utils.cache import LocalCache, VersionedCache
+
+logger = logging.getLogger(__name__)
+
+
+class AreaIndex:
+    """
+    Process local index of all Areas of one area type, used to find the Area that contains a point without querying
+    the database.
+
+    The index is loaded lazily and holds the extent and the prepared geometry of every Area. A lookup first compares
+    the point with the extents, only the Areas whose extent contains the point are checked with the (fast) prepared
+    geometry. The Areas are checked in the same order as the database lookup in _get_area.
+
+    The index is reloaded when the areas are changed in any process (see invalidate, the version is stored in the
+    shared cache) or after AREA_INDEX_TIMEOUT seconds.
+    """
+    version_cache = VersionedCache(namespace='area-index')
+
+    def __init__(self, area_type: str):
+        self.area_type = area_type
+        self._cache = LocalCache(self.version_cache, timeout_setting='AREA_INDEX_TIMEOUT')
+
+    def _load(self, previous_entries):
+        areas = Area.objects.filter(_type__code=self.area_type).select_related('_type').order_by('code')
+        return [(area.geometry.extent, area.geometry.prepared, area) for area in areas]
+
+    def get_entries(self):
+        return self._cache.get(self._load)
+
+    def get_area(self, geometry: PointField) -> Optional[Area]:
+        x, y = geometry.x, geometry.y
+        for (xmin, ymin, xmax, ymax), prepared_geometry, area in self.get_entries():
+            if xmin <= x <= xmax and ymin <= y <= ymax and prepared_geometry.contains(geometry):
+                return area
+        return None
+
+    @classmethod
+    def invalidate(cls):
+        cls.version_cache.invalidate()
+
+
+_area_indexes = {}
+_area_indexes_lock = threading.Lock()
+
+
+def get_area_index(area_type: str) -> AreaIndex:
+    """
+    Returns the (process local) AreaIndex of the given area type
+    """
+    if area_type not in _area_indexes:
+        with _area_indexes_lock:
+            _area_indexes.setdefault(area_type, AreaIndex(area_type))
+    return _area_indexes[area_type]
+
+
+def get_area_from_index(geometry: PointField, area_type: str) -> Optional[Area]:
+    """
+    Find the Area containing the geometry using the in memory AreaIndex, raises an exception if the index could not be
+    used so that the caller can fall back to the database
+    """
+    if geometry.geom_type != 'Point':
+        raise ValueError('The AreaIndex only supports points')
+    if geometry.srid and geometry.srid != Area._meta.get_field('geometry').srid:
+        raise ValueError('The geometry must use the same SRID as the Areas')
+    return get_area_index(area_type).get_area(geometry)
@@ -1,13 +1,17 @@
 # SPDX-License-Identifier: MPL-2.0
 # Copyright (C) 2020 - 2021 Gemeente Amsterdam
+import logging
 import re
-from typing import Optional
+from typing import Dict, List, Optional
 
 from django.conf import settings
 from django.contrib.gis.db.models import PointField
 from django.db.models import Q
 
 from signals.apps.signals.models import Area
+from signals.apps.signals.utils.area_index import get_area_from_index
+
+logger = logging.getLogger(__name__)
 
 
 def _get_area(geometry: PointField, area_type: Optional[str] = None) -> Optional[Area]:
@@ -19,12 +23,92 @@ def _get_area(geometry: PointField, area_type: Optional[str] = None) -> Optional
     :param area_type:
     :return: Area or None
     """
+    if area_type and settings.FEATURE_FLAGS.get('API_AREA_INDEX_ENABLED', False):
+        try:
+            return get_area_from_index(geometry, area_type)
+        except Exception:
+            logger.warning('Could not use the AreaIndex, falling back to the database', exc_info=True)
+
     query = Q(geometry__contains=geometry)
     if area_type:
         query &= Q(_type__code=area_type)
 
-    areas = Area.objects.filter(query)
-    return areas.first() if areas.exists() else None
+    return Area.objects.filter(query).first()
+
+
+def _get_area_codes_from_index(geometries: List[PointField], area_types: List[str]) -> List[Dict[str, str]]:
+    area_codes = [{} for _ in geometries]
+    for area_type in area_types:
+        for codes, geometry in zip(area_codes, geometries):
+            area = get_area_from_index(geometry, area_type)
+            if area:
+                codes[area_type] = area.code
+    return area_codes
+
+
+def _get_area_codes_from_db(geometries: List[PointField], area_types: List[str]) -> List[Dict[str, str]]:
+    query = Q()
+    for geometry in geometries:
+        query |= Q(geometry__contains=geometry)
+
+    areas = Area.objects.filter(query, _type__code__in=area_types).select_related('_type').order_by('_type', 'code')
+    prepared_areas = [(area._type.code, area.code, area.geometry.prepared) for area in areas]
+
+    area_codes = []
+    for geometry in geometries:
+        codes = {}
+        for area_type_code, area_code, prepared_geometry in prepared_areas:
+            if area_type_code not in codes and prepared_geometry.contains(geometry):
+                codes[area_type_code] = area_code
+        area_codes.append(codes)
+    return area_codes
+
+
+def _get_area_codes(geometries: List[PointField], area_types: List[str]) -> List[Dict[str, str]]:
+    """
+    Retrieves the Area codes of the given area types for all given geometries using one query. For every geometry a
+    dict with the area type code as key and the code of the first Area found as value is returned (same order as
+    _get_area)
+
+    :param geometries:
+    :param area_types:
+    :return: list of dicts
+    """
+    if not geometries or not area_types:
+        return [{} for _ in geometries]
+
+    if settings.FEATURE_FLAGS.get('API_AREA_INDEX_ENABLED', False):
+        try:
+            return _get_area_codes_from_index(geometries, area_types)
+        except Exception:
+            logger.warning('Could not use the AreaIndex, falling back to the database', exc_info=True)
+
+    return _get_area_codes_from_db(geometries, area_types)
+
+
+def _get_stadsdeel_area_type() -> Optional[str]:
+    """
+    The area type used to determine the stadsdeel, returns None if the stadsdeel should not be determined
+
+    :return: str or None
+    """
+    if not settings.FEATURE_FLAGS.get('API_DETERMINE_STADSDEEL_ENABLED', False):
+        return None
+    return getattr(settings, 'API_DETERMINE_STADSDEEL_ENABLED_AREA_TYPE', 'sia-stadsdeel')
+
+
+def _translate_stadsdeel_code(area_code: Optional[str], default: Optional[str] = None) -> Optional[str]:
+    """
+    Translate the Area "code" to the STADSDELEN "code", returns the default if there is no translation
+
+    :param area_code:
+    :param default:
+    :return: str or None
+    """
+    from signals.apps.signals.models.location import AREA_STADSDEEL_TRANSLATION
+
+    code = AREA_STADSDEEL_TRANSLATION.get(area_code.lower(), None) if area_code else None
+    return code or default
 
 
 def _get_stadsdeel_code(geometry: PointField, default: Optional[str] = None) -> Optional[str]:
@@ -35,15 +119,12 @@ def _get_stadsdeel_code(geometry: PointField, default: Optional[str] = None) ->
     :param default:
     :return: str or None
     """
-    if not settings.FEATURE_FLAGS.get('API_DETERMINE_STADSDEEL_ENABLED', False):
+    area_type = _get_stadsdeel_area_type()
+    if not area_type:
         return default
 
-    from signals.apps.signals.models.location import AREA_STADSDEEL_TRANSLATION
-
-    area_type = getattr(settings, 'API_DETERMINE_STADSDEEL_ENABLED_AREA_TYPE', 'sia-stadsdeel')
     area = _get_area(geometry=geometry, area_type=area_type)
-    code = AREA_STADSDEEL_TRANSLATION.get(area.code.lower(), None) if area else None
-    return code or default
+    return _translate_stadsdeel_code(area.code if area else None, default)
 
 
 class AddressFormatter:
@@ -211,6 +211,12 @@ SWIFT = {
 
 # Object store - Datawarehouse (DWH)
 DWH_MEDIA_ROOT = os.getenv('DWH_MEDIA_ROOT')
+# Number of CSV files that are created concurrently for the Datawarehouse (1 creates them one by one)
+DWH_EXPORT_THREAD_COUNT = int(os.getenv('DWH_EXPORT_THREAD_COUNT', 4))
+# Format of the Datawarehouse files, "csv" or "parquet" (typed and compressed)
+DWH_EXPORT_FORMAT = os.getenv('DWH_EXPORT_FORMAT', 'csv')
+# Number of rows per row group of the Parquet files, only one row group is kept in memory when writing
+DWH_PARQUET_ROW_GROUP_SIZE = int(os.getenv('DWH_PARQUET_ROW_GROUP_SIZE', 100000))
 
 # Using `HEALTH_MODEL` for health check endpoint.
 HEALTH_MODEL = 'signals.Signal'
@@ -259,10 +265,26 @@ CELERY_TASK_ALWAYS_EAGER = os.getenv('CELERY_TASK_ALWAYS_EAGER', 'False') in TRU
 
 # Celery Beat settings
 CELERY_BEAT_SCHEDULER = 'django_celery_beat.schedulers:DatabaseScheduler'
-CELERY_BEAT_SCHEDULE = {}
+CELERY_BEAT_SCHEDULE = {
+    # Safety net for the events in the outbox that could not be dispatched directly after the commit
+    'dispatch-signal-events': {
+        'task': 'signals.apps.signals.tasks.dispatch_signal_events',
+        'schedule': 60.0,
+    },
+    # Safety net for the queued e-mails that were not delivered directly after they were queued
+    'deliver-emails': {
+        'task': 'signals.apps.email_integrations.tasks.deliver_emails',
+        'schedule': 60.0,
+    },
+    # Safety net for the Signals in the search index queue that were not indexed directly after they were queued
+    'flush-index-queue': {
+        'task': 'signals.apps.search.tasks.flush_index_queue',
+        'schedule': 60.0,
+    },
+}
 
 # E-mail settings for SMTP (SendGrid)
-EMAIL_BACKEND = os.getenv('EMAIL_BACKEND', 'djcelery_email.backends.CeleryEmailBackend')
+EMAIL_BACKEND = os.getenv('EMAIL_BACKEND', 'signals.apps.email_integrations.custom_backends.queued.QueuedEmailBackend')
 EMAIL_HOST = os.getenv('EMAIL_HOST')
 EMAIL_HOST_USER = os.getenv('EMAIL_HOST_USER')
 EMAIL_HOST_PASSWORD = os.getenv('EMAIL_HOST_PASSWORD')
@@ -270,19 +292,39 @@ EMAIL_PORT = os.getenv('EMAIL_PORT', 465)  # 465 fort SSL 587 for TLS
 EMAIL_USE_TLS = os.getenv('EMAIL_USE_TLS', 'False') in TRUE_VALUES
 if not EMAIL_USE_TLS:
     EMAIL_USE_SSL = os.getenv('EMAIL_USE_SSL', 'True') in TRUE_VALUES
+# Seconds before a blocking SMTP operation times out, a relay that does not respond would otherwise hold up the
+# delivery of the queued e-mails
+EMAIL_TIMEOUT = int(os.getenv('EMAIL_TIMEOUT', 30))
 CELERY_EMAIL_BACKEND = os.getenv('CELERY_EMAIL_BACKEND', 'django.core.mail.backends.smtp.EmailBackend')
 EMAIL_REST_ENDPOINT = os.getenv('EMAIL_REST_ENDPOINT', None)
 EMAIL_REST_ENDPOINT_TIMEOUT = os.getenv('EMAIL_REST_ENDPOINT_TIMEOUT', 5)
 EMAIL_REST_ENDPOINT_CLIENT_CERT = os.getenv('EMAIL_REST_ENDPOINT_CLIENT_CERT', None)
 EMAIL_REST_ENDPOINT_CLIENT_KEY = os.getenv('EMAIL_REST_ENDPOINT_CLIENT_KEY', None)
 
+# Delivery of the e-mails queued by the QueuedEmailBackend, the queued e-mails are sent in batches over a single
+# connection of the EMAIL_DELIVERY_BACKEND. An e-mail that could not be delivered is retried after
+# EMAIL_DELIVERY_RETRY_DELAY seconds (doubled on every attempt) until EMAIL_DELIVERY_MAX_ATTEMPTS attempts are made.
+# A batch is claimed for EMAIL_DELIVERY_LOCK_TIMEOUT seconds and the claim of an e-mail is extended just before it is
+# sent, the e-mails of an interrupted delivery are retried after the claim expired
+EMAIL_DELIVERY_BACKEND = os.getenv('EMAIL_DELIVERY_BACKEND', CELERY_EMAIL_BACKEND)
+EMAIL_DELIVERY_BATCH_SIZE = int(os.getenv('EMAIL_DELIVERY_BATCH_SIZE', 100))
+EMAIL_DELIVERY_DELAY = int(os.getenv('EMAIL_DELIVERY_DELAY', 5))
+EMAIL_DELIVERY_RETRY_DELAY = int(os.getenv('EMAIL_DELIVERY_RETRY_DELAY', 60))
+EMAIL_DELIVERY_MAX_ATTEMPTS = int(os.getenv('EMAIL_DELIVERY_MAX_ATTEMPTS', 5))
+EMAIL_DELIVERY_LOCK_TIMEOUT = int(os.getenv('EMAIL_DELIVERY_LOCK_TIMEOUT', 300))
+
 DEFAULT_FROM_EMAIL = os.getenv('DEFAULT_FROM_EMAIL', 'noreply@meldingen.amsterdam.nl')
 DEFAULT_AUTO_FIELD = 'django.db.models.AutoField'
 
-# Django cache settings
+# Django cache settings. The cache must be shared by all web and Celery processes, the cached results (and the
+# versions used to invalidate them, see signals.utils.cache.VersionedCache) are used by all of them
+MEMCACHED_HOST = os.getenv('MEMCACHED_HOST', 'memcached' if in_docker() else 'localhost')
+MEMCACHED_PORT = os.getenv('MEMCACHED_PORT', '11211')
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'BACKEND': os.getenv('CACHE_BACKEND', 'django.core.cache.backends.memcached.PyMemcacheCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', f'{MEMCACHED_HOST}:{MEMCACHED_PORT}'),
+        'KEY_PREFIX': os.getenv('CACHE_KEY_PREFIX', 'signals'),
     }
 }
 
@@ -489,6 +531,10 @@ ML_TOOL_ENDPOINT = os.getenv('SIGNALS_ML_TOOL_ENDPOINT', 'https://api.data.amste
 # Search settings
 SEARCH = {
     'PAGE_SIZE': 500,
+    'BULK_THREAD_COUNT': int(os.getenv('ELASTICSEARCH_BULK_THREAD_COUNT', 4)),
+    'QUEUE_FLUSH_DELAY': int(os.getenv('ELASTICSEARCH_QUEUE_FLUSH_DELAY', 5)),
+    'QUEUE_FLUSH_BATCH_SIZE': int(os.getenv('ELASTICSEARCH_QUEUE_FLUSH_BATCH_SIZE', 1000)),
+    'QUEUE_LOCK_TIMEOUT': int(os.getenv('ELASTICSEARCH_QUEUE_LOCK_TIMEOUT', 300)),
     'CONNECTION': {
         'HOST': os.getenv('ELASTICSEARCH_HOST', 'elastic-index.service.consul:9200'),
         'INDEX': os.getenv('ELASTICSEARCH_INDEX', 'sia_signals'),
@@ -503,6 +549,12 @@ FEATURE_FLAGS = {
     'API_TRANSFORM_SOURCE_BASED_ON_REPORTER': os.getenv('API_TRANSFORM_SOURCE_BASED_ON_REPORTER', True) in TRUE_VALUES,
     'API_TRANSFORM_SOURCE_IF_A_SIGNAL_IS_A_CHILD': os.getenv('API_TRANSFORM_SOURCE_IF_A_SIGNAL_IS_A_CHILD', True) in TRUE_VALUES,  # noqa
     'TASK_UPDATE_CHILDREN_BASED_ON_PARENT': os.getenv('TASK_UPDATE_CHILDREN_BASED_ON_PARENT', True) in TRUE_VALUES,
+    'API_USE_SIGNAL_CURRENT_STATE': os.getenv('API_USE_SIGNAL_CURRENT_STATE', False) in TRUE_VALUES,
+    'API_AREA_INDEX_ENABLED': os.getenv('API_AREA_INDEX_ENABLED', True) in TRUE_VALUES,
+    'ROUTING_RULES_CACHE_ENABLED': os.getenv('ROUTING_RULES_CACHE_ENABLED', True) in TRUE_VALUES,
+    'SEARCH_INDEX_QUEUE_ENABLED': os.getenv('SEARCH_INDEX_QUEUE_ENABLED', True) in TRUE_VALUES,
+    'EMAIL_TEMPLATE_CACHE_ENABLED': os.getenv('EMAIL_TEMPLATE_CACHE_ENABLED', True) in TRUE_VALUES,
+    'SIGNAL_EVENT_OUTBOX_ENABLED': os.getenv('SIGNAL_EVENT_OUTBOX_ENABLED', True) in TRUE_VALUES,
 }
 
 API_DETERMINE_STADSDEEL_ENABLED_AREA_TYPE = 'sia-stadsdeel'
@@ -552,6 +604,56 @@ API_MAX_UPLOAD_SIZE = os.getenv('API_MAX_UPLOAD_SIZE', 8388608)  # 8MB = 8*1024*
 
 # Enable public map geo endpoint
 ENABLE_PUBLIC_GEO_SIGNAL_ENDPOINT = os.getenv('ENABLE_PUBLIC_GEO_SIGNAL_ENDPOINT', False) in TRUE_VALUES
+PUBLIC_GEO_SIGNAL_ENDPOINT_MAX_FEATURES = int(os.getenv('PUBLIC_GEO_SIGNAL_ENDPOINT_MAX_FEATURES', 4000))
+# Seconds the public map result is cached, it is also invalidated when signals are created or change status/location
+PUBLIC_GEO_SIGNAL_ENDPOINT_CACHE_TIMEOUT = int(os.getenv('PUBLIC_GEO_SIGNAL_ENDPOINT_CACHE_TIMEOUT', 5 * 60))
+
+# Seconds the (Mapbox) vector tiles of the geography endpoints are cached
+SIGNAL_TILES_CACHE_TIMEOUT = int(os.getenv('SIGNAL_TILES_CACHE_TIMEOUT', 60))
+
+# Seconds the counts of the private Signal facets endpoint are cached
+SIGNAL_FACETS_CACHE_TIMEOUT = int(os.getenv('SIGNAL_FACETS_CACHE_TIMEOUT', 30))
+
+# Number of Signals copied per COPY statement when streaming the private Signal export
+SIGNAL_EXPORT_CHUNK_SIZE = int(os.getenv('SIGNAL_EXPORT_CHUNK_SIZE', 5000))
+
+# Seconds the (Mapbox) vector tiles of the area geography endpoints are cached, they are also invalidated when areas
+# change (in any process, for example by the load_areas management command)
+AREA_TILES_CACHE_TIMEOUT = int(os.getenv('AREA_TILES_CACHE_TIMEOUT', 24 * 60 * 60))
+
+# Seconds the category and department ids a user has access to are cached, the cache is also invalidated (in all
+# processes) when the departments of a user or the categories of a department change. The timeout limits how long
+# changes that do not send Django signals (for example QuerySet.update) go unnoticed
+SIGNAL_PERMISSION_CACHE_TIMEOUT = int(os.getenv('SIGNAL_PERMISSION_CACHE_TIMEOUT', 60))
+
+# Seconds the process local caches (the area index, the compiled routing rules and e-mail templates) keep the version
+# that is used to invalidate them, changes made in other processes are noticed after at most this many seconds
+LOCAL_CACHE_VERSION_TIMEOUT = int(os.getenv('LOCAL_CACHE_VERSION_TIMEOUT', 5))
+
+# Seconds before the in memory index of the areas is reloaded, it is also reloaded when areas change
+AREA_INDEX_TIMEOUT = int(os.getenv('AREA_INDEX_TIMEOUT', 60 * 60))
+
+# Seconds before the compiled routing rules are rebuild, they are also rebuild when routing rules, expressions or areas
+# change
+ROUTING_RULES_CACHE_TIMEOUT = int(os.getenv('ROUTING_RULES_CACHE_TIMEOUT', 60))
+
+# New Signals are routed directly (in the request) when routing is expected to take at most ROUTING_SYNC_THRESHOLD
+# milliseconds, otherwise in a Celery task (0 means always in a Celery task). The expectation is based on the
+# durations of previous runs, it expires after ROUTING_DURATION_TIMEOUT seconds
+ROUTING_SYNC_THRESHOLD = int(os.getenv('ROUTING_SYNC_THRESHOLD', 50))
+ROUTING_DURATION_TIMEOUT = int(os.getenv('ROUTING_DURATION_TIMEOUT', 5 * 60))
+
+# Seconds before the compiled e-mail templates are reloaded, they are also reloaded when e-mail templates change
+EMAIL_TEMPLATE_CACHE_TIMEOUT = int(os.getenv('EMAIL_TEMPLATE_CACHE_TIMEOUT', 60))
+
+# Dispatching of the events in the outbox (see signals.apps.signals.outbox). The events are dispatched in batches
+# SIGNAL_EVENTS_DISPATCH_DELAY seconds after the commit. An event is locked for SIGNAL_EVENTS_LOCK_TIMEOUT seconds
+# while it is dispatched, when a receiver fails the event is dispatched again after the lock expired (at most
+# SIGNAL_EVENTS_MAX_ATTEMPTS times)
+SIGNAL_EVENTS_DISPATCH_DELAY = int(os.getenv('SIGNAL_EVENTS_DISPATCH_DELAY', 1))
+SIGNAL_EVENTS_BATCH_SIZE = int(os.getenv('SIGNAL_EVENTS_BATCH_SIZE', 500))
+SIGNAL_EVENTS_LOCK_TIMEOUT = int(os.getenv('SIGNAL_EVENTS_LOCK_TIMEOUT', 300))
+SIGNAL_EVENTS_MAX_ATTEMPTS = int(os.getenv('SIGNAL_EVENTS_MAX_ATTEMPTS', 5))
 
 # Allow 'invalid' address as unverified
 ALLOW_INVALID_ADDRESS_AS_UNVERIFIED = os.getenv('ALLOW_INVALID_ADDRESS_AS_UNVERIFIED', False) in TRUE_VALUES
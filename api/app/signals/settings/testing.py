@@ -17,5 +17,23 @@ SIGNALS_AUTHZ = {
     'USER_ID_FIELDS': 'sub,email'.split(',')
 }
 
+# The tests run in one process
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+# The tests clear the cache, the process local caches must read the version that is used to invalidate them every time
+LOCAL_CACHE_VERSION_TIMEOUT = 0
+
+# The threads use their own database connection and would not see the data of the test (rolled back transactions)
+DWH_EXPORT_THREAD_COUNT = 1
+
 FEATURE_FLAGS['API_SEARCH_ENABLED'] = False  # noqa F405
 FEATURE_FLAGS['SEARCH_BUILD_INDEX'] = False  # noqa F405
+FEATURE_FLAGS['API_AREA_INDEX_ENABLED'] = False  # noqa F405 Areas are removed by rolled back transactions
+FEATURE_FLAGS['ROUTING_RULES_CACHE_ENABLED'] = False  # noqa F405 Same for routing rules
+FEATURE_FLAGS['SEARCH_INDEX_QUEUE_ENABLED'] = False  # noqa F405
+FEATURE_FLAGS['EMAIL_TEMPLATE_CACHE_ENABLED'] = False  # noqa F405 Same for e-mail templates
+FEATURE_FLAGS['SIGNAL_EVENT_OUTBOX_ENABLED'] = False  # noqa F405 The receivers are called after the commit
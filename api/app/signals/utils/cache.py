@@ -0,0 +1,125 @@
+# SPDX-License-Identifier: MPL-2.0
+# Copyright (C) 2021 Gemeente Amsterdam
+import hashlib
+import json
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+
+class VersionedCache:
+    """
+    Cache results under a namespace that can be invalidated as a whole.
+
+    Every key in the namespace contains the current version number of that namespace. Invalidating the namespace
+    means bumping the version number, all existing entries will no longer be found and expire on their own.
+
+    The version number is stored in the (shared) Django cache, so invalidating a namespace in one process invalidates
+    it in all web and Celery processes.
+    """
+    def __init__(self, namespace, timeout=None):
+        self.namespace = namespace
+        self.timeout = timeout
+        self.local_invalidations = 0  # The number of times the namespace is invalidated in this process
+
+    @staticmethod
+    def _initial_version():
+        return time.time_ns() // 1000
+
+    @property
+    def version_key(self):
+        return f'{self.namespace}:version'
+
+    def get_version(self):
+        version = cache.get(self.version_key)
+        if version is None:
+            cache.add(self.version_key, self._initial_version(), None)
+            version = cache.get(self.version_key)
+        return version
+
+    def invalidate(self):
+        self.local_invalidations += 1
+        try:
+            cache.incr(self.version_key)
+        except ValueError:
+            # The version key is not present (never set or evicted), start from a version that cannot collide
+            # with the keys that were stored before
+            cache.set(self.version_key, self._initial_version(), None)
+
+    def make_key(self, params=None):
+        digest = hashlib.md5(json.dumps(params or {}, sort_keys=True, default=str).encode()).hexdigest()
+        return f'{self.namespace}:{self.get_version()}:{digest}'
+
+    def get(self, params=None):
+        return cache.get(self.make_key(params))
+
+    def set(self, value, params=None):
+        cache.set(self.make_key(params), value, self.timeout)
+
+    def get_or_set(self, default, params=None):
+        """
+        Return the cached value for the given params, the callable default is called and its result stored on a miss
+        """
+        key = self.make_key(params)
+        value = cache.get(key)
+        if value is None:
+            value = default()
+            if value is not None:
+                cache.set(key, value, self.timeout)
+        return value
+
+
+class LocalCache:
+    """
+    Process local copy of a value that is expensive to load, for example an index or compiled rules or templates.
+
+    The value is loaded lazily by calling load with the previous value (None the first time). It is loaded again when
+    the version of the VersionedCache changed (it was invalidated in any process) or after the number of seconds in the
+    timeout setting.
+
+    Reading the version is a round trip to the shared cache, so it is kept in the process for
+    LOCAL_CACHE_VERSION_TIMEOUT seconds. An invalidation in another process is therefore noticed after at most that
+    many seconds, an invalidation in this process is noticed directly.
+    """
+    def __init__(self, version_cache, timeout_setting):
+        self.version_cache = version_cache
+        self.timeout_setting = timeout_setting
+        self._value = None
+        self._version = None
+        self._loaded_at = None
+        self._shared_version = None
+        self._version_read_at = None
+        self._local_invalidations = None
+        self._lock = threading.Lock()
+
+    def _get_version(self):
+        now = time.monotonic()
+        if (
+            self._version_read_at is None or
+            now - self._version_read_at > settings.LOCAL_CACHE_VERSION_TIMEOUT or
+            self._local_invalidations != self.version_cache.local_invalidations
+        ):
+            local_invalidations = self.version_cache.local_invalidations
+            self._shared_version = self.version_cache.get_version()
+            self._local_invalidations = local_invalidations
+            self._version_read_at = now
+        return self._shared_version
+
+    def _is_stale(self, version):
+        return (
+            self._loaded_at is None or
+            self._version != version or
+            time.monotonic() - self._loaded_at > getattr(settings, self.timeout_setting)
+        )
+
+    def get(self, load):
+        version = self._get_version()
+        if self._is_stale(version):
+            with self._lock:
+                if self._is_stale(version):
+                    self._value = load(self._value)
+                    self._version = version
+                    self._loaded_at = time.monotonic()
+        return self._value
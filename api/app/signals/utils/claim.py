@@ -0,0 +1,62 @@
+# SPDX-License-Identifier: MPL-2.0
+# Copyright (C) 2021 Gemeente Amsterdam
+from datetime import timedelta
+
+from django.db import connection
+from django.utils import timezone
+
+# Claim the rows by moving the claim field to the end of the lock timeout, rows locked by a concurrent transaction are
+# skipped
+CLAIM_SQL = """
+update {table}
+set {claim_column} = %(now)s + %(lock_timeout)s * interval '1 second'{set_attempts}
+where {pk_column} in (
+    select {pk_column} from {table}
+    where {where}
+    order by {order_by} limit %(limit)s for update skip locked
+)
+returning {pk_column}, {claim_column}
+"""
+
+
+def claim(model, where, order_by, limit, lock_timeout, claim_field='locked_until', attempts_field=None, params=None):
+    """
+    Claim at most limit rows of the model for lock_timeout seconds, returns their primary keys and the time they are
+    claimed until.
+
+    The where and order_by arguments are SQL, the where clause selects the rows that can be claimed (the current time
+    is available as the %(now)s parameter). The claim_field is set to the end of the claim, so a row whose claim
+    expired can be selected again by the where clause. When attempts_field is given it is incremented.
+    """
+    opts = model._meta
+    attempts_column = opts.get_field(attempts_field).column if attempts_field else None
+    sql = CLAIM_SQL.format(
+        table=opts.db_table,
+        pk_column=opts.pk.column,
+        claim_column=opts.get_field(claim_field).column,
+        set_attempts=f', {attempts_column} = {attempts_column} + 1' if attempts_column else '',
+        where=where,
+        order_by=order_by,
+    )
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, {**(params or {}), 'now': timezone.now(), 'limit': limit, 'lock_timeout': lock_timeout})
+        rows = cursor.fetchall()
+
+    if not rows:
+        return [], None
+    return [row[0] for row in rows], rows[0][1]
+
+
+def renew_claim(queryset, claimed_until, lock_timeout, claim_field='locked_until'):
+    """
+    Extend the claim of the rows to lock_timeout seconds from now, returns the time they are claimed until or None if
+    the claim is lost.
+
+    The claim is only extended when the rows are still claimed until claimed_until. A different value means that the
+    claim expired and the rows were claimed by someone else.
+    """
+    until = timezone.now() + timedelta(seconds=lock_timeout)
+    if not queryset.filter(**{claim_field: claimed_until}).update(**{claim_field: until}):
+        return None
+    return until
@@ -1,6 +1,8 @@
 # SPDX-License-Identifier: MPL-2.0
 # Copyright (C) 2019 - 2021 Gemeente Amsterdam
 import copy
+import csv
+import io
 import json
 import os
 from datetime import timedelta
@@ -10,6 +12,7 @@ from unittest.mock import patch
 import dateutil
 from django.contrib.auth.models import Permission
 from django.contrib.gis.geos import MultiPolygon, Polygon
+from django.core.cache import cache
 from django.core.exceptions import ValidationError
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.test import override_settings
@@ -35,7 +38,13 @@ from signals.apps.signals.factories import (
     SourceFactory
 )
 from signals.apps.signals.factories.category_departments import CategoryDepartmentFactory
-from signals.apps.signals.models import STADSDEEL_CENTRUM, Attachment, Signal
+from signals.apps.signals.models import (
+    STADSDEEL_CENTRUM,
+    Attachment,
+    CategoryDepartment,
+    Signal,
+    SignalCurrentState
+)
 from tests.apps.signals.attachment_helpers import (
     add_image_attachments,
     add_non_image_attachments,
@@ -193,6 +202,55 @@ class TestPrivateSignalViewSet(SIAReadUserMixin, SIAReadWriteUserMixin, SignalsB
 
         self.assertEqual(len(response.json()['features']), 1)
 
+    def test_geo_list_endpoint_cluster(self):
+        response = self.client.get(f'{self.geo_list_endpoint}?cluster=true&zoom=0')
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.has_header('X-Total-Count'))
+
+        # On zoom level 0 all Signals in Amsterdam are part of the same cluster
+        data = response.json()
+        self.assertEqual(len(data['features']), 1)
+        self.assertEqual(data['features'][0]['properties']['count'], 2)
+        self.assertEqual(data['features'][0]['geometry']['type'], 'Point')
+
+    def test_geo_list_endpoint_cluster_filtered(self):
+        response = self.client.get(f'{self.geo_list_endpoint}?cluster=true&zoom=0&id={self.signal_no_image.id}')
+        self.assertEqual(response.status_code, 200)
+
+        data = response.json()
+        self.assertEqual(len(data['features']), 1)
+        self.assertEqual(data['features'][0]['properties']['count'], 1)
+
+    def test_geo_list_endpoint_cluster_invalid_zoom(self):
+        for query in ['cluster=true', 'cluster=true&zoom=a', 'cluster=true&zoom=-1', 'cluster=true&zoom=23']:
+            response = self.client.get(f'{self.geo_list_endpoint}?{query}')
+            self.assertEqual(response.status_code, 400)
+
+    def test_geo_tile_endpoint(self):
+        cache.clear()
+
+        response = self.client.get(f'{self.geo_list_endpoint}/0/0/0.pbf')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/vnd.mapbox-vector-tile')
+        self.assertGreater(len(response.content), 0)
+
+        # The tile is cached, a second request will not hit the database for the tile
+        with self.assertNumQueries(0):
+            cached_response = self.client.get(f'{self.geo_list_endpoint}/0/0/0.pbf')
+        self.assertEqual(cached_response.content, response.content)
+
+    def test_geo_tile_endpoint_empty_tile(self):
+        cache.clear()
+
+        # A tile far away from Amsterdam, no Signals in it
+        response = self.client.get(f'{self.geo_list_endpoint}/10/0/0.pbf')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.content), 0)
+
+    def test_geo_tile_endpoint_invalid_tile(self):
+        response = self.client.get(f'{self.geo_list_endpoint}/1/2/0.pbf')
+        self.assertEqual(response.status_code, 404)
+
     def test_detail_endpoint(self):
         response = self.client.get(self.detail_endpoint.format(pk=self.signal_no_image.id))
         self.assertEqual(response.status_code, 200)
@@ -1755,6 +1813,46 @@ class TestPrivateSignalViewSetPermissions(SIAReadUserMixin, SIAWriteUserMixin, S
             response = self.client.get(endpoint)
             self.assertEqual(response.status_code, 200, msg='{}'.format(endpoint))
 
+    def test_access_revoked(self):
+        cache.clear()
+        self.client.force_authenticate(user=self.sia_read_write_user)
+        detail_endpoint = self.detail_endpoint.format(pk=self.signal.pk)
+
+        response = self.client.get(detail_endpoint)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        # The (cached) permissions of the user are invalidated when the user is removed from the department
+        self.sia_read_write_user.profile.departments.remove(self.department)
+
+        response = self.client.get(detail_endpoint)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_access_revoked_category_department(self):
+        cache.clear()
+        self.client.force_authenticate(user=self.sia_read_write_user)
+        detail_endpoint = self.detail_endpoint.format(pk=self.signal.pk)
+
+        response = self.client.get(detail_endpoint)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        CategoryDepartment.objects.filter(category=self.subcategory, department=self.department).delete()
+
+        response = self.client.get(detail_endpoint)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_access_revoked_department_deleted(self):
+        cache.clear()
+        self.client.force_authenticate(user=self.sia_read_write_user)
+        detail_endpoint = self.detail_endpoint.format(pk=self.signal.pk)
+
+        response = self.client.get(detail_endpoint)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        self.department.delete()
+
+        response = self.client.get(detail_endpoint)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
     def test_create_initial_forbidden(self):
         self.client.force_authenticate(user=self.sia_read_user)
 
@@ -2418,3 +2516,218 @@ class TestSignalEndpointRouting(SIAReadWriteUserMixin, SIAReadUserMixin, Signals
         self.signal.refresh_from_db()
         self.assertEqual(self.signal.user_assignment, None)
         self.assertEqual(self.signal.routing_assignment, None)
+
+
+class TestPrivateSignalViewSetKeysetPagination(SignalsBaseApiTestCase):
+    list_endpoint = '/signals/v1/private/signals/'
+
+    def setUp(self):
+        self.client.force_authenticate(user=self.superuser)
+
+        now = timezone.now()
+        self.signals = []
+        for idx in range(5):
+            with freeze_time(now - timedelta(hours=idx)):
+                self.signals.append(SignalFactory.create(location__stadsdeel=STADSDEEL_CENTRUM if idx % 2 else None))
+
+        # Two Signals created at the same time, the id is used as tie-breaker
+        with freeze_time(now - timedelta(hours=10)):
+            self.signals.extend(SignalFactory.create_batch(2))
+
+    def _get_all_pages(self, params):
+        ids, pages = [], 0
+        url = f'{self.list_endpoint}?{urlencode(params)}'
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            data = response.json()
+            self.assertIsNone(data['_links']['previous']['href'])
+
+            ids.extend(result['id'] for result in data['results'])
+            url = data['_links']['next']['href']
+            pages += 1
+        return ids, pages
+
+    def test_keyset_pagination(self):
+        ids, pages = self._get_all_pages({'cursor': '', 'page_size': 2})
+        expected_ids = list(Signal.objects.order_by('-created_at', '-id').values_list('id', flat=True))
+        self.assertEqual(ids, expected_ids)
+        self.assertEqual(pages, 4)
+
+    def test_keyset_pagination_ordering(self):
+        ids, _ = self._get_all_pages({'cursor': '', 'page_size': 2, 'ordering': 'stadsdeel'})
+        self.assertEqual(len(ids), len(set(ids)))
+        self.assertEqual(set(ids), {signal.id for signal in self.signals})
+
+        # Signals without a stadsdeel are sorted last
+        stadsdelen = [Signal.objects.get(pk=pk).location.stadsdeel for pk in ids]
+        self.assertEqual(stadsdelen, sorted(stadsdelen, key=lambda stadsdeel: (stadsdeel is None, stadsdeel)))
+
+    def test_keyset_pagination_count(self):
+        response = self.client.get(self.list_endpoint, data={'cursor': '', 'page_size': 2})
+        self.assertIsNone(response.json()['count'])
+
+        response = self.client.get(self.list_endpoint, data={'cursor': '', 'page_size': 2, 'count': 'exact'})
+        self.assertEqual(response.json()['count'], len(self.signals))
+
+        response = self.client.get(self.list_endpoint, data={'cursor': '', 'page_size': 2, 'count': 'approximate'})
+        self.assertIsInstance(response.json()['count'], int)
+
+    def test_keyset_pagination_invalid_cursor(self):
+        response = self.client.get(self.list_endpoint, data={'cursor': 'invalid'})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+        # A cursor can not be used with another ordering
+        response = self.client.get(self.list_endpoint, data={'cursor': '', 'page_size': 2})
+        next_link = response.json()['_links']['next']['href']
+        response = self.client.get(f'{next_link}&ordering=status')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class TestPrivateSignalViewSetFacets(SIAReadUserMixin, SignalsBaseApiTestCase):
+    facets_endpoint = '/signals/v1/private/signals/facets'
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_authenticate(user=self.superuser)
+
+        self.category = CategoryFactory.create()
+        SignalFactory.create_batch(3, status__state=workflow.GEMELD, category_assignment__category=self.category,
+                                   location__stadsdeel=STADSDEEL_CENTRUM)
+        SignalFactory.create_batch(2, status__state=workflow.BEHANDELING, location__stadsdeel=None)
+
+    def test_facets(self):
+        response = self.client.get(self.facets_endpoint)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        data = response.json()
+        self.assertEqual(data['count'], 5)
+        self.assertEqual(data['facets']['status'], [
+            {'value': workflow.GEMELD, 'count': 3},
+            {'value': workflow.BEHANDELING, 'count': 2},
+        ])
+        self.assertEqual(data['facets']['stadsdeel'], [
+            {'value': STADSDEEL_CENTRUM, 'count': 3},
+            {'value': None, 'count': 2},
+        ])
+        self.assertIn({'value': self.category.slug, 'count': 3}, data['facets']['category_slug'])
+        self.assertEqual(sum(facet['count'] for facet in data['facets']['priority']), 5)
+
+    def test_facets_filtered(self):
+        response = self.client.get(self.facets_endpoint, data={'status': workflow.BEHANDELING})
+        data = response.json()
+        self.assertEqual(data['count'], 2)
+        self.assertEqual(data['facets']['status'], [{'value': workflow.BEHANDELING, 'count': 2}])
+
+    @override_settings(FEATURE_FLAGS={'API_USE_SIGNAL_CURRENT_STATE': True})
+    def test_facets_current_state(self):
+        SignalCurrentState.objects.refresh(Signal.objects.values_list('id', flat=True))
+
+        response = self.client.get(self.facets_endpoint, data={'maincategory_slug': self.category.parent.slug})
+        data = response.json()
+        self.assertEqual(data['count'], 3)
+        self.assertEqual(data['facets']['maincategory_slug'], [{'value': self.category.parent.slug, 'count': 3}])
+
+    def test_facets_cached(self):
+        response = self.client.get(self.facets_endpoint)
+
+        with self.assertNumQueries(0):
+            cached_response = self.client.get(self.facets_endpoint)
+        self.assertEqual(cached_response.json(), response.json())
+
+    def test_facets_permissions(self):
+        # A user without departments has no access to any Signal
+        self.client.force_authenticate(user=self.sia_read_user)
+        response = self.client.get(self.facets_endpoint)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()['count'], 0)
+
+
+class TestPrivateSignalViewSetExport(SIAReadUserMixin, SignalsBaseApiTestCase):
+    export_endpoint = '/signals/v1/private/signals/export/{}'
+
+    def setUp(self):
+        self.export_user = self.sia_read_user
+        self.export_user.user_permissions.add(Permission.objects.get(codename='sia_signal_export'))
+        self.export_user.user_permissions.add(Permission.objects.get(codename='sia_can_view_all_categories'))
+        self.client.force_authenticate(user=self.export_user)
+
+        self.signals = SignalFactory.create_batch(3, status__state=workflow.GEMELD, text='Line 1\n"Line 2"')
+        self.signal_behandeling = SignalFactory.create(status__state=workflow.BEHANDELING)
+
+    def _get_content(self, response):
+        return b''.join(response.streaming_content).decode()
+
+    @override_settings(SIGNAL_EXPORT_CHUNK_SIZE=2)
+    def test_export_csv(self):
+        response = self.client.get(self.export_endpoint.format('csv'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'text/csv')
+
+        rows = list(csv.DictReader(io.StringIO(self._get_content(response))))
+        self.assertEqual([int(row['id']) for row in rows],
+                         [signal.id for signal in self.signals] + [self.signal_behandeling.id])
+        self.assertEqual(rows[0]['text'], 'Line 1\n"Line 2"')
+        self.assertEqual(rows[0]['status'], workflow.GEMELD)
+        self.assertEqual(rows[0]['signal_uuid'], str(self.signals[0].uuid))
+
+    @override_settings(SIGNAL_EXPORT_CHUNK_SIZE=2)
+    def test_export_ndjson(self):
+        response = self.client.get(self.export_endpoint.format('ndjson'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+
+        rows = [json.loads(line) for line in self._get_content(response).splitlines()]
+        self.assertEqual(len(rows), 4)
+        self.assertEqual(rows[0]['id'], self.signals[0].id)
+        self.assertEqual(rows[0]['text'], 'Line 1\n"Line 2"')
+        self.assertEqual(rows[-1]['status'], workflow.BEHANDELING)
+
+    def test_export_filtered(self):
+        response = self.client.get(self.export_endpoint.format('csv'), data={'status': workflow.BEHANDELING})
+        rows = list(csv.DictReader(io.StringIO(self._get_content(response))))
+        self.assertEqual([int(row['id']) for row in rows], [self.signal_behandeling.id])
+
+        response = self.client.get(self.export_endpoint.format('csv'), data={'status': 'not-a-state'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_export_nothing(self):
+        response = self.client.get(self.export_endpoint.format('csv'), data={'status': workflow.AFGEHANDELD})
+        content = self._get_content(response)
+        self.assertTrue(content.startswith('id,signal_uuid,'))
+        self.assertEqual(len(content.splitlines()), 1)
+
+        response = self.client.get(self.export_endpoint.format('ndjson'), data={'status': workflow.AFGEHANDELD})
+        self.assertEqual(self._get_content(response), '')
+
+    def test_export_permissions(self):
+        # Without the export permission
+        self.client.force_authenticate(user=self.sia_read_user)
+        response = self.client.get(self.export_endpoint.format('csv'))
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+        # Only the Signals the user has access to are exported
+        self.export_user.user_permissions.remove(Permission.objects.get(codename='sia_can_view_all_categories'))
+        self.export_user = type(self.export_user).objects.get(pk=self.export_user.pk)  # clear the permission cache
+        self.client.force_authenticate(user=self.export_user)
+        response = self.client.get(self.export_endpoint.format('ndjson'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self._get_content(response), '')
+
+    @override_settings(SIGNAL_EXPORT_CHUNK_SIZE=2)
+    def test_export_routed_to_multiple_departments(self):
+        self.export_user.user_permissions.remove(Permission.objects.get(codename='sia_can_view_all_categories'))
+        self.export_user = type(self.export_user).objects.get(pk=self.export_user.pk)  # clear the permission cache
+        self.client.force_authenticate(user=self.export_user)
+
+        departments = DepartmentFactory.create_batch(2)
+        self.export_user.profile.departments.add(*departments)
+        for signal in self.signals:
+            Signal.actions.update_routing_departments(
+                {'departments': [{'id': department.id} for department in departments]}, signal
+            )
+
+        # A Signal routed to more than one department of the user is exported once
+        response = self.client.get(self.export_endpoint.format('csv'))
+        rows = list(csv.DictReader(io.StringIO(self._get_content(response))))
+        self.assertEqual([int(row['id']) for row in rows], [signal.id for signal in self.signals])
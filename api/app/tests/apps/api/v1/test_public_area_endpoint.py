@@ -2,6 +2,7 @@
 # Copyright (C) 2020 - 2021 Gemeente Amsterdam
 import os
 
+from django.core.cache import cache
 from rest_framework import status
 
 from signals.apps.signals.factories import AreaFactory, AreaTypeFactory
@@ -75,6 +76,36 @@ class TestPublicAreaEndpoint(SIAReadWriteUserMixin, SignalsBaseApiTestCase):
         data = response.json()
         self.assertEqual(1, len(data['features']))
 
+    def test_get_geography_tile(self):
+        cache.clear()
+
+        response = self.client.get(f'{self.list_endpoint}geography/0/0/0.pbf')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'application/vnd.mapbox-vector-tile')
+        self.assertGreater(len(response.content), 0)
+
+        # Filtering on an area type without areas results in an empty tile
+        area_type = AreaTypeFactory.create()
+        response = self.client.get(f'{self.list_endpoint}geography/0/0/0.pbf?type_code={area_type.code}')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.content), 0)
+
+    def test_get_geography_tile_invalidated(self):
+        cache.clear()
+
+        area_type = AreaTypeFactory.create()
+        response = self.client.get(f'{self.list_endpoint}geography/0/0/0.pbf?type_code={area_type.code}')
+        self.assertEqual(len(response.content), 0)
+
+        # The cached tile is no longer used when the areas change
+        AreaFactory.create(_type=area_type)
+        response = self.client.get(f'{self.list_endpoint}geography/0/0/0.pbf?type_code={area_type.code}')
+        self.assertGreater(len(response.content), 0)
+
+    def test_get_geography_tile_invalid_tile(self):
+        response = self.client.get(f'{self.list_endpoint}geography/23/0/0.pbf')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
     def test_get_detail(self):
         response = self.client.get(f'{self.list_endpoint}{self.areas[self.area_types[0].code][0].id}')
         self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
@@ -2,11 +2,20 @@
 # Copyright (C) 2021 Vereniging van Nederlandse Gemeenten, Gemeente Amsterdam
 import os
 
+from django.contrib.gis.geos import Point
+from django.core.cache import cache
 from django.test import override_settings
 
 from signals.apps.api.v1.urls import SignalsRouterVersion1
 from signals.apps.api.v1.views import PublicSignalMapViewSet
-from signals.apps.signals.factories import SignalFactoryValidLocation
+from signals.apps.signals import workflow
+from signals.apps.signals.factories import (
+    CategoryFactory,
+    ParentCategoryFactory,
+    SignalFactory,
+    SignalFactoryValidLocation
+)
+from signals.apps.signals.models import Signal
 from tests.test import SignalsBaseApiTestCase
 
 THIS_DIR = os.path.dirname(__file__)
@@ -30,6 +39,7 @@ class TestMapSignalEndpoints(SignalsBaseApiTestCase):
         self.endpoint_url = '/public/map-signals/'
         self.signal1 = SignalFactoryValidLocation.create()
         self.signal2 = SignalFactoryValidLocation.create()
+        cache.clear()
         super().setUp()
 
     def test_map_signals_list(self):
@@ -51,6 +61,60 @@ class TestMapSignalEndpoints(SignalsBaseApiTestCase):
         self.assertEqual(obj['properties']['category']['main'], self.signal2.category_assignment.category.parent.name) # noqa
         self.assertEqual(obj['properties']['category']['sub'], self.signal2.category_assignment.category.name)
 
+    def test_map_signals_list_bbox(self):
+        signal_in_bbox = SignalFactory.create(location__geometrie=Point(4.90, 52.37))
+        SignalFactory.create(location__geometrie=Point(4.60, 52.10))
+
+        response = self.client.get(self.endpoint_url, data={'bbox': '4.89,52.36,4.91,52.38'})
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual([feature['properties']['id'] for feature in data['features']], [signal_in_bbox.id])
+
+    def test_map_signals_list_bbox_no_results(self):
+        response = self.client.get(self.endpoint_url, data={'bbox': '0.1,0.1,0.2,0.2'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['features'], [])
+
+    def test_map_signals_list_invalid_bbox(self):
+        for bbox in ['4.89,52.36,4.91', '4.91,52.36,4.89,52.38', 'a,b,c,d']:
+            response = self.client.get(self.endpoint_url, data={'bbox': bbox})
+            self.assertEqual(response.status_code, 400)
+
+    def test_map_signals_list_category(self):
+        parent_category = ParentCategoryFactory.create()
+        category = CategoryFactory.create(parent=parent_category)
+        signal = SignalFactoryValidLocation.create(category_assignment__category=category)
+
+        for data in [{'category_slug': category.slug}, {'maincategory_slug': parent_category.slug}]:
+            response = self.client.get(self.endpoint_url, data=data)
+            self.assertEqual(response.status_code, 200)
+            features = response.json()['features']
+            self.assertEqual([feature['properties']['id'] for feature in features], [signal.id])
+
+    def test_map_signals_list_created_after(self):
+        response = self.client.get(self.endpoint_url, data={'created_after': self.signal2.created_at.isoformat()})
+        self.assertEqual(response.status_code, 200)
+        features = response.json()['features']
+        self.assertEqual([feature['properties']['id'] for feature in features], [self.signal2.id])
+
+    def test_map_signals_list_cached(self):
+        response = self.client.get(self.endpoint_url)
+        self.assertEqual(len(response.json()['features']), 2)
+
+        # Signals created by the factory do not invalidate the cache, the cached result is returned
+        SignalFactoryValidLocation.create()
+        with self.assertNumQueries(0):
+            response = self.client.get(self.endpoint_url)
+        self.assertEqual(len(response.json()['features']), 2)
+
+        # A change of status invalidates the cache
+        with self.captureOnCommitCallbacks(execute=True):
+            Signal.actions.update_status({'state': workflow.AFGEHANDELD, 'text': 'Afgehandeld'}, self.signal1)
+
+        response = self.client.get(self.endpoint_url)
+        self.assertEqual(len(response.json()['features']), 2)
+        self.assertNotIn(self.signal1.id, [feature['properties']['id'] for feature in response.json()['features']])
+
 
 class TestMapSignalDefaultSettingEndpoints(SignalsBaseApiTestCase):
     def test_map_signals_list_defalt(self):
@@ -3,10 +3,13 @@
 from io import StringIO
 from unittest.mock import patch
 
+from django.core.cache import cache
 from django.core.management import call_command
 from django.test import TestCase
 
+from signals.apps.api.v1.views import PublicAreasViewSet
 from signals.apps.dataset.base import AreaLoader
+from signals.apps.signals.utils.area_index import AreaIndex
 
 
 class FakeAreaLoader(AreaLoader):
@@ -27,8 +30,16 @@ class TestLoadAreas(TestCase):
         ]
     )
     def test_load_areas(self, patched_getmembers):
+        cache.clear()
+        tile_cache_version = PublicAreasViewSet.tile_cache.get_version()
+        area_index_version = AreaIndex.version_cache.get_version()
+
         buffer = StringIO()
         call_command('load_areas', 'fake', stdout=buffer)
 
         output = buffer.getvalue()
         self.assertIn('Loading "fake" areas ...', output)
+
+        # The cached tiles and the in memory index of the areas are invalidated in all processes (shared cache)
+        self.assertNotEqual(PublicAreasViewSet.tile_cache.get_version(), tile_cache_version)
+        self.assertNotEqual(AreaIndex.version_cache.get_version(), area_index_version)
@@ -0,0 +1,147 @@
+# SPDX-License-Identifier: MPL-2.0
+# Copyright (C) 2021 Gemeente Amsterdam
+from datetime import timedelta
+from smtplib import SMTPException
+from unittest import mock
+
+from django.core import mail
+from django.core.cache import cache
+from django.core.mail import get_connection
+from django.core.mail import send_mail as django_send_mail
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from signals.apps.email_integrations import tasks
+from signals.apps.email_integrations.models import OutgoingEmail
+
+
+@override_settings(EMAIL_BACKEND='signals.apps.email_integrations.custom_backends.queued.QueuedEmailBackend',
+                   EMAIL_DELIVERY_BACKEND='django.core.mail.backends.locmem.EmailBackend',
+                   EMAIL_DELIVERY_BATCH_SIZE=10,
+                   EMAIL_DELIVERY_MAX_ATTEMPTS=2,
+                   EMAIL_DELIVERY_RETRY_DELAY=60)
+class TestEmailDelivery(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def _send_mails(self, count):
+        for i in range(count):
+            django_send_mail(subject=f'Melding {i}', message='Hello!', from_email='test@example.com',
+                             recipient_list=[f'recipient-{i}@example.com'], html_message='<p>Hello!</p>')
+
+    def test_send_mail_queues_message(self):
+        self._send_mails(2)
+
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(OutgoingEmail.objects.filter(status=OutgoingEmail.PENDING).count(), 2)
+
+        outgoing_email = OutgoingEmail.objects.order_by('pk').first()
+        self.assertEqual(outgoing_email.message['subject'], 'Melding 0')
+        self.assertEqual(outgoing_email.message['to'], ['recipient-0@example.com'])
+
+    def test_delivered_after_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self._send_mails(1)
+
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].subject, 'Melding 0')
+        self.assertEqual(mail.outbox[0].alternatives, [('<p>Hello!</p>', 'text/html')])
+        self.assertEqual(OutgoingEmail.objects.get().status, OutgoingEmail.SENT)
+
+    def test_deliver_emails(self):
+        self._send_mails(3)
+
+        with mock.patch('signals.apps.email_integrations.tasks.get_connection', wraps=get_connection) as connection:
+            self.assertEqual(tasks.deliver_emails(), 3)
+        connection.assert_called_once()
+
+        self.assertEqual(len(mail.outbox), 3)
+        for outgoing_email in OutgoingEmail.objects.all():
+            self.assertEqual(outgoing_email.status, OutgoingEmail.SENT)
+            self.assertEqual(outgoing_email.attempts, 1)
+            self.assertIsNotNone(outgoing_email.sent_at)
+
+    def test_deliver_emails_in_batches(self):
+        self._send_mails(5)
+
+        with self.settings(EMAIL_DELIVERY_BATCH_SIZE=2):
+            with mock.patch('signals.apps.email_integrations.tasks.get_connection',
+                            wraps=get_connection) as connection:
+                self.assertEqual(tasks.deliver_emails(), 5)
+        self.assertEqual(connection.call_count, 3)
+        self.assertEqual(len(mail.outbox), 5)
+
+    def test_deliver_emails_failure(self):
+        self._send_mails(2)
+
+        send_messages = mock.Mock(side_effect=[SMTPException('Relay unavailable'), 1])
+        with mock.patch('django.core.mail.backends.locmem.EmailBackend.send_messages', send_messages):
+            self.assertEqual(tasks.deliver_emails(), 1)
+
+        failed, sent = OutgoingEmail.objects.order_by('pk')
+        self.assertEqual(sent.status, OutgoingEmail.SENT)
+        self.assertEqual(failed.status, OutgoingEmail.PENDING)
+        self.assertEqual(failed.attempts, 1)
+        self.assertEqual(failed.error, 'Relay unavailable')
+        self.assertGreater(failed.next_attempt_at, timezone.now())
+
+        # Not retried before the next attempt is due
+        self.assertEqual(tasks.deliver_emails(), 0)
+
+        OutgoingEmail.objects.filter(pk=failed.pk).update(next_attempt_at=timezone.now())
+        with mock.patch('django.core.mail.backends.locmem.EmailBackend.send_messages',
+                        side_effect=SMTPException('Relay unavailable')):
+            self.assertEqual(tasks.deliver_emails(), 0)
+
+        # The maximum number of attempts is reached
+        failed.refresh_from_db()
+        self.assertEqual(failed.status, OutgoingEmail.FAILED)
+        self.assertEqual(failed.attempts, 2)
+
+    def test_claimed_emails_skipped(self):
+        self._send_mails(2)
+
+        # A concurrent delivery claimed one of the e-mails
+        claimed = OutgoingEmail.objects.take(1, lock_timeout=60)
+        self.assertEqual(tasks.deliver_emails(), 1)
+        self.assertEqual(OutgoingEmail.objects.get(pk=claimed[0].pk).status, OutgoingEmail.PENDING)
+
+    def test_interrupted_delivery(self):
+        self._send_mails(3)
+
+        send_messages = mock.Mock(side_effect=[1, KeyboardInterrupt('Worker killed')])
+        with mock.patch('django.core.mail.backends.locmem.EmailBackend.send_messages', send_messages):
+            with self.assertRaises(KeyboardInterrupt):
+                tasks.deliver_emails()
+
+        # The result of the e-mail that was sent before the interruption is recorded
+        sent, interrupted, not_sent = OutgoingEmail.objects.order_by('pk')
+        self.assertEqual(sent.status, OutgoingEmail.SENT)
+        self.assertEqual(interrupted.status, OutgoingEmail.PENDING)
+        self.assertEqual(not_sent.status, OutgoingEmail.PENDING)
+
+        # The other e-mails are delivered after the claim expired
+        self.assertEqual(tasks.deliver_emails(), 0)
+        OutgoingEmail.objects.filter(status=OutgoingEmail.PENDING).update(next_attempt_at=timezone.now())
+        self.assertEqual(tasks.deliver_emails(), 2)
+        self.assertEqual(OutgoingEmail.objects.filter(status=OutgoingEmail.SENT).count(), 3)
+
+    @mock.patch('signals.apps.email_integrations.tasks.deliver_emails.apply_async', side_effect=OSError('Broker down'))
+    def test_schedule_deliver_emails_failure(self, apply_async):
+        # The e-mails stay queued and a later schedule tries again
+        tasks.schedule_deliver_emails(countdown=10)
+        tasks.schedule_deliver_emails(countdown=10)
+        self.assertEqual(apply_async.call_count, 2)
+
+    def test_claim_expired_during_batch(self):
+        self._send_mails(2)
+        first, second = OutgoingEmail.objects.take(10, lock_timeout=60)
+
+        # The claim of the second e-mail expired and it was taken by another delivery
+        OutgoingEmail.objects.filter(pk=second.pk).update(next_attempt_at=timezone.now() + timedelta(seconds=300))
+
+        self.assertEqual(tasks._deliver_batch([first, second], lock_timeout=60), (1, 0))
+
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(OutgoingEmail.objects.get(pk=first.pk).status, OutgoingEmail.SENT)
+        self.assertEqual(OutgoingEmail.objects.get(pk=second.pk).status, OutgoingEmail.PENDING)
@@ -114,6 +114,20 @@ class TestMailRuleConditions(BaseTestMailCase):
         # we want no history entry when no email was sent:
         self.assertEqual(Note.objects.count(), 0)
 
+    def test_rules_evaluated_in_memory(self):
+        ma = MailActions(mail_rules=SIGNAL_MAIL_RULES)
+
+        # One query for the Signal (with the filters of all rules annotated) and one for the statuses
+        with self.assertNumQueries(2):
+            signal = ma._get_signal(signal_id=self.signal.id)
+            child_signal = ma._get_signal(signal_id=self.child_signal.id)
+            signal_no_email = ma._get_signal(signal_id=self.signal_no_email.id)
+
+        with self.assertNumQueries(0):
+            self.assertEqual(ma._get_actions(signal), ['send-mail-signal-created'])
+            self.assertEqual(ma._get_actions(child_signal), [])
+            self.assertEqual(ma._get_actions(signal_no_email), [])
+
     def test_no_email_for_anonymous_reporter(self):
         ma = MailActions(mail_rules=SIGNAL_MAIL_RULES)
         ma.apply(self.signal_no_email.id, send_mail=True)
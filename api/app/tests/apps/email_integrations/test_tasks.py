@@ -5,6 +5,7 @@ from unittest import mock
 from django.test import TestCase
 
 from signals.apps.email_integrations import tasks
+from signals.apps.email_integrations.mail_actions import MailActions
 from signals.apps.signals import workflow
 from signals.apps.signals.factories import SignalFactory, StatusFactory
 
@@ -18,7 +19,14 @@ class TestTasks(TestCase):
         self.signal.status = StatusFactory(_signal=self.signal, state=workflow.BEHANDELING)
         self.signal.save()
 
-    @mock.patch('signals.apps.email_integrations.tasks.MailActions', autospec=True)
-    def test_send_mail_reporter_created(self, mocked_mail):
+    @mock.patch('signals.apps.email_integrations.tasks.mail_actions', autospec=True)
+    def test_send_mail_reporter_created(self, mocked_mail_actions):
         tasks.send_mail_reporter(pk=self.signal.id)
-        mocked_mail().apply.assert_called_once_with(self.signal.pk)
+        mocked_mail_actions.apply.assert_called_once_with(signal_id=self.signal.pk)
+
+    def test_mail_actions_instantiated_once(self):
+        self.assertIsInstance(tasks.mail_actions, MailActions)
+
+        with mock.patch('signals.apps.email_integrations.tasks.MailActions', autospec=True) as mocked_mail:
+            tasks.send_mail_reporter(pk=self.signal.id)
+        mocked_mail.assert_not_called()
@@ -0,0 +1,74 @@
+# SPDX-License-Identifier: MPL-2.0
+# Copyright (C) 2021 Gemeente Amsterdam
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.template import Context
+from django.test import TestCase, override_settings
+
+from signals.apps.email_integrations.models import EmailTemplate
+from signals.apps.email_integrations.template_cache import EmailTemplateCache
+
+
+@override_settings(FEATURE_FLAGS={'EMAIL_TEMPLATE_CACHE_ENABLED': True})
+class TestEmailTemplateCache(TestCase):
+    def setUp(self):
+        cache.clear()
+
+        self.created = EmailTemplate.objects.create(key=EmailTemplate.SIGNAL_CREATED,
+                                                    title='Uw melding {{ signal_id }}',
+                                                    body='{{ text }}')
+        self.handled = EmailTemplate.objects.create(key=EmailTemplate.SIGNAL_STATUS_CHANGED_AFGEHANDELD,
+                                                    title='Afgehandeld {{ signal_id }}',
+                                                    body='{{ text }}')
+
+        self.template_cache = EmailTemplateCache()
+
+    def test_get(self):
+        # Loads the templates
+        compiled = self.template_cache.get(key=EmailTemplate.SIGNAL_CREATED)
+        self.assertEqual(compiled.title.render(Context({'signal_id': 1})), 'Uw melding 1')
+
+        with self.assertNumQueries(0):
+            self.assertIs(self.template_cache.get(key=EmailTemplate.SIGNAL_CREATED), compiled)
+            self.assertEqual(self.template_cache.get(key=EmailTemplate.SIGNAL_STATUS_CHANGED_AFGEHANDELD).key,
+                             EmailTemplate.SIGNAL_STATUS_CHANGED_AFGEHANDELD)
+
+            with self.assertRaises(EmailTemplate.DoesNotExist):
+                self.template_cache.get(key=EmailTemplate.SIGNAL_STATUS_CHANGED_HEROPEND)
+
+    def test_reloaded_when_templates_change(self):
+        created = self.template_cache.get(key=EmailTemplate.SIGNAL_CREATED)
+        handled = self.template_cache.get(key=EmailTemplate.SIGNAL_STATUS_CHANGED_AFGEHANDELD)
+
+        self.created.title = 'Bedankt voor uw melding {{ signal_id }}'
+        self.created.save()
+
+        compiled = self.template_cache.get(key=EmailTemplate.SIGNAL_CREATED)
+        self.assertIsNot(compiled, created)
+        self.assertEqual(compiled.title.render(Context({'signal_id': 1})), 'Bedankt voor uw melding 1')
+
+        # Templates that did not change are not compiled again
+        self.assertIs(self.template_cache.get(key=EmailTemplate.SIGNAL_STATUS_CHANGED_AFGEHANDELD), handled)
+
+        self.created.delete()
+        with self.assertRaises(EmailTemplate.DoesNotExist):
+            self.template_cache.get(key=EmailTemplate.SIGNAL_CREATED)
+
+    def test_reloaded_after_timeout(self):
+        self.template_cache.get_templates()
+
+        with self.settings(EMAIL_TEMPLATE_CACHE_TIMEOUT=-1):
+            with patch.object(self.template_cache, '_load', wraps=self.template_cache._load) as load:
+                self.template_cache.get_templates()
+        load.assert_called_once()
+
+    def test_base_template(self):
+        base_template = self.template_cache.get_base_template('email/_base.txt')
+        self.assertIs(self.template_cache.get_base_template('email/_base.txt'), base_template)
+
+    def test_disabled(self):
+        with self.settings(FEATURE_FLAGS={'EMAIL_TEMPLATE_CACHE_ENABLED': False}):
+            with self.assertNumQueries(2):
+                self.template_cache.get(key=EmailTemplate.SIGNAL_CREATED)
+                self.template_cache.get(key=EmailTemplate.SIGNAL_CREATED)
@@ -1,14 +1,18 @@
 # SPDX-License-Identifier: MPL-2.0
 # Copyright (C) 2018 - 2021 Gemeente Amsterdam
 import csv
+import io
 import json
 import os
 import shutil
 import tempfile
+import zipfile
 from datetime import datetime
 from os import path
 from unittest import mock
 
+import pyarrow as pa
+import pyarrow.parquet as pq
 import pytz
 from django.core.files.storage import FileSystemStorage
 from django.test import override_settings, testcases
@@ -82,32 +86,33 @@ class TestDatawarehouse(testcases.TestCase):
         for i in range(3):
             SignalFactory.create()
 
-        datawarehouse.save_and_zip_csv_files_endpoint()
+        zip_file = datawarehouse.save_and_zip_csv_files_endpoint()
+        self.assertEqual(zip_file, '2020/09/10/20200910_120000UTC.zip')
 
-        # Checking if we have files on the correct locations and that they
-        # do have some content.
-        signals_csv = path.join(self.file_backend_tmp_dir, '2020/09/10', '120000UTC_signals.csv')
-        locations_csv = path.join(self.file_backend_tmp_dir, '2020/09/10', '120000UTC_locations.csv')
-        reporters_csv = path.join(self.file_backend_tmp_dir, '2020/09/10', '120000UTC_reporters.csv')
-        categories_csv = path.join(self.file_backend_tmp_dir, '2020/09/10', '120000UTC_categories.csv')
-        statuses_csv = path.join(self.file_backend_tmp_dir, '2020/09/10', '120000UTC_statuses.csv')
-        sla_csv = path.join(self.file_backend_tmp_dir, '2020/09/10', '120000UTC_sla.csv')
-        directing_departments_csv = path.join(self.file_backend_tmp_dir, '2020/09/10', '120000UTC_directing_departments.csv')  # noqa
+        # The CSV files are only written to the zip file
         zip_package = path.join(self.file_backend_tmp_dir, '2020/09/10', '20200910_120000UTC.zip')
-
-        self.assertTrue(path.exists(signals_csv))
-        self.assertTrue(path.getsize(signals_csv))
-        self.assertTrue(path.exists(locations_csv))
-        self.assertTrue(path.getsize(locations_csv))
-        self.assertTrue(path.exists(reporters_csv))
-        self.assertTrue(path.getsize(reporters_csv))
-        self.assertTrue(path.exists(categories_csv))
-        self.assertTrue(path.getsize(categories_csv))
-        self.assertTrue(path.exists(statuses_csv))
-        self.assertTrue(path.getsize(statuses_csv))
-        self.assertTrue(path.getsize(sla_csv))
-        self.assertTrue(path.getsize(directing_departments_csv))
         self.assertTrue(path.getsize(zip_package))
+        self.assertFalse(path.exists(path.join(self.file_backend_tmp_dir, '2020/09/10', '120000UTC_signals.csv')))
+
+        with zipfile.ZipFile(zip_package) as zipper:
+            self.assertIsNone(zipper.testzip())
+            self.assertEqual(zipper.namelist(), ['signals.csv', 'signals_assigned_user.csv', 'locations.csv',
+                                                 'reporters.csv', 'categories.csv', 'statuses.csv', 'sla.csv',
+                                                 'directing_departments.csv', 'routing_departments.csv'])
+
+            with zipper.open('signals.csv') as signals_csv:
+                rows = list(csv.DictReader(io.TextIOWrapper(signals_csv)))
+            self.assertEqual(len(rows), 3)
+
+    @mock.patch.dict('os.environ', {}, clear=True)
+    @mock.patch('signals.apps.reporting.csv.utils._get_storage_backend')
+    @freeze_time('2020-09-10T12:00:00+00:00')
+    def test_save_zip_csv_endpoint_upload_failed(self, mocked_get_storage_backend):
+        mocked_get_storage_backend.return_value.save.side_effect = IOError('Upload failed')
+        SignalFactory.create()
+
+        with self.assertRaises(IOError):
+            datawarehouse.save_and_zip_csv_files_endpoint()
 
     @override_settings(
         SWIFT={
@@ -312,6 +317,73 @@ class TestDatawarehouse(testcases.TestCase):
                 for department in departments:
                     self.assertIn(department.name, row['departments'].split(', '))
 
+    def test_create_signals_csv_column_order(self):
+        SignalFactory.create()
+
+        csv_file = datawarehouse.create_signals_csv(self.csv_tmp_dir)
+
+        with open(csv_file) as opened_csv_file:
+            header = next(csv.reader(opened_csv_file))
+        self.assertEqual(header, ['id', 'signal_uuid', 'source', 'text', 'text_extra', 'incident_date_start',
+                                  'incident_date_end', 'created_at', 'updated_at', 'operational_date', 'expire_date',
+                                  'image', 'upload', 'extra_properties', 'category_assignment_id', 'location_id',
+                                  'reporter_id', 'status_id', 'priority', 'priority_created_at', 'parent', 'type',
+                                  'type_created_at', 'directing_departments_assignment_id'])
+
+    def test_create_csv_since(self):
+        with freeze_time('2020-09-01T12:00:00+00:00'):
+            SignalFactory.create()
+        with freeze_time('2020-09-10T12:00:00+00:00'):
+            signal = SignalFactory.create()
+
+        since = datetime(2020, 9, 5, tzinfo=pytz.UTC)
+        with open(datawarehouse.create_signals_csv(self.csv_tmp_dir, since=since)) as opened_csv_file:
+            rows = list(csv.DictReader(opened_csv_file))
+        self.assertEqual([row['id'] for row in rows], [str(signal.id)])
+
+        with open(datawarehouse.create_locations_csv(self.csv_tmp_dir, since=since)) as opened_csv_file:
+            rows = list(csv.DictReader(opened_csv_file))
+        self.assertEqual([row['_signal_id'] for row in rows], [str(signal.id)])
+
+    @mock.patch.dict('os.environ', {}, clear=True)
+    @mock.patch('signals.apps.reporting.csv.utils._get_storage_backend')
+    @freeze_time('2020-09-10T12:00:00+00:00')
+    def test_save_csv_files_datawarehouse_reports(self, mocked_get_storage_backend):
+        mocked_get_storage_backend.return_value = FileSystemStorage(location=self.file_backend_tmp_dir)
+        SignalFactory.create()
+
+        csv_files = datawarehouse.save_csv_files_datawarehouse(reports=['signals', 'locations'])
+
+        self.assertEqual(csv_files, ['120000UTC_signals.csv', '120000UTC_locations.csv'])
+
+    @override_settings(DWH_EXPORT_FORMAT='parquet', DWH_PARQUET_ROW_GROUP_SIZE=2)
+    def test_create_signals_parquet(self):
+        signals = SignalFactory.create_batch(3)
+
+        parquet_file = datawarehouse.create_signals_csv(self.csv_tmp_dir)
+        self.assertEqual(path.join(self.csv_tmp_dir, 'signals.parquet'), parquet_file)
+
+        parquet = pq.ParquetFile(parquet_file)
+        self.assertEqual(parquet.num_row_groups, 2)
+
+        table = parquet.read()
+        self.assertEqual(table.column_names[:3], ['id', 'signal_uuid', 'source'])
+        self.assertEqual(table.schema.field('id').type, pa.int64())
+        self.assertEqual(table.schema.field('created_at').type, pa.timestamp('us', tz='UTC'))
+
+        columns = table.to_pydict()
+        self.assertEqual(columns['id'], [signal.id for signal in signals])
+        self.assertEqual(columns['signal_uuid'][0], str(signals[0].uuid))
+        self.assertDictEqual(json.loads(columns['extra_properties'][0]), signals[0].extra_properties)
+
+    @override_settings(DWH_EXPORT_FORMAT='parquet')
+    def test_create_locations_parquet(self):
+        signal = SignalFactory.create()
+
+        table = pq.read_table(datawarehouse.create_locations_csv(self.csv_tmp_dir))
+        self.assertEqual(table.schema.field('lat').type, pa.float64())
+        self.assertEqual(table.to_pydict()['lat'], [signal.location.geometrie.x])
+
 
 class TestFeedbackHandling(testcases.TestCase):
     """Test that KTO feedback is properly processed."""
@@ -1,15 +1,14 @@
 # SPDX-License-Identifier: MPL-2.0
 # Copyright (C) 2019 - 2021 Gemeente Amsterdam
+import csv
+import tempfile
 from unittest import mock
 
 from django.core.exceptions import ValidationError
 from django.test import testcases
+from freezegun import freeze_time
 
 from signals.apps.reporting.csv.horeca import (
-    _create_extra_properties_headers,
-    _create_extra_properties_row,
-    _fix_row_to_match_header_count,
-    _fix_rows_to_match_header_count,
     _get_horeca_main_category,
     _to_first_and_last_day_of_the_week,
     create_csv_files,
@@ -31,114 +30,44 @@ class TestHoreca(testcases.TestCase):
         self.assertEqual(last.month, 1)
         self.assertEqual(last.year, 2019)
 
-    def test__fix_row_to_match_header_count(self):
-        row = []
-        headers = [1, 2, 3]
-        new_row = _fix_row_to_match_header_count(row, headers)
-
-        self.assertEqual(len(row), 0)
-        self.assertEqual(len(new_row), len(headers))
-
-    def test__fix_rows_to_match_header_count(self):
-        rows = [[], [1, ], [1, 2, ], ]
-        headers = [1, 2, 3, 4]
-        new_rows = _fix_rows_to_match_header_count(rows, headers)
-
-        self.assertEqual(len(rows[0]), 0)
-        self.assertEqual(len(rows[1]), 1)
-        self.assertEqual(len(rows[2]), 2)
-
-        self.assertEqual(len(new_rows[0]), len(headers))
-        self.assertEqual(len(new_rows[1]), len(headers))
-        self.assertEqual(len(new_rows[2]), len(headers))
-
-    def test__create_extra_properties_headers(self):
-        extra_properties = [{
-            'id': 'extra_onderhoud_stoep_straat_en_fietspad',
-            'label': 'Hebt u verteld om wat voor soort wegdek het gaat?',
-            'answer': 'Tegels 30x30 kleur fietspad',
-            'category_url': '/signals/v1/public/terms/categories/wegen-verkeer-straatmeubilair/sub_categories/onderhoud-stoep-straat-en-fietspad'  # noqa
-        }]
-
-        headers = []
-        headers = _create_extra_properties_headers(extra_properties, headers)
-
-        self.assertEqual(len(headers), 1)
-        self.assertEqual(headers[0], 'extra_onderhoud_stoep_straat_en_fietspad')
-
-    def test__create_extra_properties_headers_old_style_extra_properties(self):
-        extra_properties = {
-            'extra_onderhoud_stoep_straat_en_fietspad': 'test',
-        }
-        headers = _create_extra_properties_headers(extra_properties)
-
-        self.assertEqual(len(headers), 0)
-
-    def test__create_extra_properties_headers_none_extra_properties(self):
-        extra_properties = None
-        headers = _create_extra_properties_headers(extra_properties)
-
-        self.assertEqual(len(headers), 0)
-
-    def test__create_extra_properties_row(self):
-        extra_properties = [{
-            'id': 'extra_onderhoud_stoep_straat_en_fietspad',
-            'label': 'Hebt u verteld om wat voor soort wegdek het gaat?',
-            'answer': 'Tegels 30x30 kleur fietspad',
-            'category_url': '/signals/v1/public/terms/categories/wegen-verkeer-straatmeubilair/sub_categories/onderhoud-stoep-straat-en-fietspad'  # noqa
-        }]
-
-        headers = _create_extra_properties_headers(extra_properties, [])
-        row = _create_extra_properties_row(extra_properties, headers)
-
-        self.assertEqual(len(row), len(headers))
-        self.assertEqual(row[0], 'Tegels 30x30 kleur fietspad')
-
-    def test__create_extra_properties_row_answer_value(self):
-        extra_properties = [{
-            'id': 'extra_onderhoud_stoep_straat_en_fietspad',
-            'label': 'Hebt u verteld om wat voor soort wegdek het gaat?',
-            'answer': {'value': 'Tegels 30x30 kleur fietspad'},
-            'category_url': '/signals/v1/public/terms/categories/wegen-verkeer-straatmeubilair/sub_categories/onderhoud-stoep-straat-en-fietspad'  # noqa
-        }]
-
-        headers = _create_extra_properties_headers(extra_properties, [])
-        row = _create_extra_properties_row(extra_properties, headers)
-
-        self.assertEqual(len(row), len(headers))
-        self.assertEqual(row[0], 'Tegels 30x30 kleur fietspad')
-
-    def test__create_extra_properties_row_answer_unusable(self):
-        extra_properties = [{
-            'id': 'extra_onderhoud_stoep_straat_en_fietspad',
-            'label': 'Hebt u verteld om wat voor soort wegdek het gaat?',
-            'answer': {'test': 'Tegels 30x30 kleur fietspad'},
-            'category_url': '/signals/v1/public/terms/categories/overlast-bedrijven-en-horeca/sub_categories/onderhoud-stoep-straat-en-fietspad'  # noqa
-        }]
-
-        headers = _create_extra_properties_headers(extra_properties, [])
-        row = _create_extra_properties_row(extra_properties, headers)
-
-        self.assertEqual(len(row), len(headers))
-        self.assertEqual(row[0], None)
-
-    def test__create_extra_properties_row_old_style_extra_properties(self):
-        extra_properties = {
-            'extra_onderhoud_stoep_straat_en_fietspad': 'test',
-        }
-
-        headers = _create_extra_properties_headers(extra_properties, [])
-        row = _create_extra_properties_row(extra_properties, headers)
-
-        self.assertEqual(len(row), 0)
-
-    def test__create_extra_properties_row_none_extra_properties(self):
-        extra_properties = None
-
-        headers = _create_extra_properties_headers(extra_properties, [])
-        row = _create_extra_properties_row(extra_properties, headers)
-
-        self.assertEqual(len(row), 0)
+    def _create_csv(self, *extra_properties_list):
+        main_category = _get_horeca_main_category()
+        category = main_category.children.first()
+
+        with freeze_time('2019-01-02T12:00:00+00:00'):
+            signals = [SignalFactory.create(category_assignment__category=category, extra_properties=extra_properties)
+                       for extra_properties in extra_properties_list]
+        # Outside of the week
+        SignalFactory.create(category_assignment__category=category, extra_properties=extra_properties_list[0])
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            csv_file = create_csv_per_sub_category(category, tmp_dir, isoweek=1, isoyear=2019)
+            with open(csv_file) as opened_csv_file:
+                rows = list(csv.reader(opened_csv_file))
+        return signals, rows[0], rows[1:]
+
+    def test_create_csv_per_sub_category(self):
+        signals, header, rows = self._create_csv(
+            [{'id': 'question_1', 'label': 'Question 1', 'answer': 'Answer 1', 'category_url': '/1'}],
+            [{'id': 'question_2', 'label': 'Question 2', 'answer': {'value': 'Answer 2'}, 'category_url': '/2'},
+             {'id': 'question_1', 'label': 'Question 1', 'answer': {'label': 'Answer 1'}, 'category_url': '/1'},
+             {'id': 'question_3', 'label': 'Question 3', 'answer': {'test': 'Unusable'}, 'category_url': '/3'}],
+        )
+
+        # The questions in the order in which they are first answered
+        self.assertEqual(header[-4:], ['status_id', 'question_1', 'question_2', 'question_3'])
+        self.assertEqual(len(rows), 2)
+
+        self.assertEqual(rows[0][:2], [str(signals[0].pk), str(signals[0].uuid)])
+        self.assertEqual(rows[0][-4:], [signals[0].status.get_state_display(), 'Answer 1', '', ''])
+        self.assertEqual(rows[1][-3:], ['Answer 1', 'Answer 2', ''])
+
+    def test_create_csv_per_sub_category_old_style_extra_properties(self):
+        signals, header, rows = self._create_csv({'question_1': 'test'}, None, ['question_2'])
+
+        self.assertEqual(header[-1], 'status_id')
+        self.assertEqual([row[0] for row in rows], [str(signal.pk) for signal in signals])
+        self.assertEqual(len(set(len(row) for row in rows)), 1)
 
     def test__get_horeca_main_category(self):
         main_category = _get_horeca_main_category()
@@ -0,0 +1,176 @@
+# SPDX-License-Identifier: MPL-2.0
+# Copyright (C) 2021 Gemeente Amsterdam
+from io import StringIO
+from unittest.mock import call, patch
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from signals.apps.search.documents.base import IndexRebuildError
+from signals.apps.search.documents.signal import SignalDocument
+from signals.apps.signals.factories import SignalFactory
+from signals.apps.signals.models import Signal
+
+
+def fake_parallel_bulk(client, actions, thread_count, chunk_size):
+    for action in actions:
+        yield True, {'index': {'_index': action.get('_index'), '_id': str(action['_id'])}}
+
+
+class TestIndexChunks(TestCase):
+    def setUp(self):
+        self.signal_ids = [signal.id for signal in SignalFactory.create_batch(5)]
+
+    def _get_chunk_ids(self, chunks):
+        return [[signal.id for signal in chunk] for chunk in chunks]
+
+    def test_iterate_chunks(self):
+        with CaptureQueriesContext(connection) as context:
+            chunks = list(SignalDocument.iterate_chunks(Signal.objects.all(), 2))
+
+        self.assertEqual(self._get_chunk_ids(chunks),
+                         [self.signal_ids[0:2], self.signal_ids[2:4], self.signal_ids[4:]])
+
+        # One query per chunk (and one that finds nothing), the chunks are selected by primary key instead of an offset
+        self.assertEqual(len(context.captured_queries), 4)
+        for query in context.captured_queries:
+            self.assertNotIn('OFFSET', query['sql'])
+
+    def test_iterate_chunks_from_id(self):
+        chunks = SignalDocument.iterate_chunks(Signal.objects.all(), 2, from_id=self.signal_ids[1])
+        self.assertEqual(self._get_chunk_ids(chunks), [self.signal_ids[2:4], self.signal_ids[4:]])
+
+    @patch('signals.apps.search.documents.base.parallel_bulk', side_effect=fake_parallel_bulk)
+    @patch.object(SignalDocument, '_get_connection')
+    def test_bulk_resume(self, _get_connection, parallel_bulk):
+        progress = []
+        queryset = SignalDocument().get_index_queryset()
+
+        indexed, last_id = SignalDocument.bulk(
+            queryset, 2, from_id=self.signal_ids[1],
+            progress_callback=lambda indexed, last_id, rate: progress.append((indexed, last_id))
+        )
+
+        # Only the Signals after the checkpoint are indexed, the progress is reported after every chunk
+        self.assertEqual((indexed, last_id), (3, self.signal_ids[-1]))
+        self.assertEqual(progress, [(2, self.signal_ids[3]), (3, self.signal_ids[4])])
+
+    @patch.object(SignalDocument, 'index_documents')
+    @patch.object(SignalDocument, 'ping', return_value=True)
+    def test_command_from_id(self, ping, index_documents):
+        buffer = StringIO()
+        call_command('elastic_index', '--index-all', '--from-id', str(self.signal_ids[1]), '--chunk-size', '2',
+                     stdout=buffer)
+
+        index_documents.assert_called_once()
+        self.assertEqual(index_documents.call_args[1]['from_id'], self.signal_ids[1])
+        self.assertEqual(index_documents.call_args[1]['batch'], 2)
+
+        # The progress contains the checkpoint to resume from
+        index_documents.call_args[1]['progress_callback'](2, self.signal_ids[3], 100)
+        self.assertIn(f'checkpoint: --from-id {self.signal_ids[3]}', buffer.getvalue())
+
+
+@patch('signals.apps.search.documents.base.Index')
+@patch.object(SignalDocument, 'index_documents')
+@patch.object(SignalDocument, '_get_connection')
+class TestRebuildIndex(TestCase):
+    def setUp(self):
+        self.signals = SignalFactory.create_batch(3)
+        self.alias = SignalDocument._default_index()
+        self.old_index = f'{self.alias}-20210101000000'
+
+    def _setup_es(self, _get_connection, count=3, aliased=True):
+        es = _get_connection.return_value
+        es.count.return_value = {'count': count}
+        es.indices.exists_alias.return_value = aliased
+        es.indices.get_alias.return_value = {self.old_index: {'aliases': {self.alias: {}}}}
+        es.indices.exists.return_value = True
+        return es
+
+    def test_rebuild_index(self, _get_connection, index_documents, Index):
+        es = self._setup_es(_get_connection)
+
+        new_index = SignalDocument.rebuild_index()
+        self.assertTrue(new_index.startswith(f'{self.alias}-'))
+
+        # All Signals are indexed in the new index, followed by the two replays
+        self.assertEqual(index_documents.call_count, 3)
+        for index_call in index_documents.call_args_list:
+            self.assertEqual(index_call[1]['index'], new_index)
+        self.assertNotIn('queryset', index_documents.call_args_list[0][1])
+
+        # The alias is moved to the new index in one request and the old index is deleted
+        es.indices.update_aliases.assert_called_once_with(body={'actions': [
+            {'remove': {'index': self.old_index, 'alias': self.alias}},
+            {'add': {'index': new_index, 'alias': self.alias}},
+        ]})
+        self.assertIn(call(self.old_index), Index.call_args_list)
+        Index.return_value.delete.assert_called_with(using=None)
+
+    def test_replay_updated_during_rebuild(self, _get_connection, index_documents, Index):
+        self._setup_es(_get_connection)
+        updated_signal = self.signals[0]
+
+        def index_all(**kwargs):
+            if 'queryset' not in kwargs:
+                # A Signal is updated while all Signals are indexed
+                Signal.objects.filter(pk=updated_signal.pk).update(updated_at=timezone.now())
+
+        index_documents.side_effect = index_all
+        SignalDocument.rebuild_index()
+
+        # The first replay indexes the Signal updated during the rebuild, the second the Signals updated after that
+        replayed = [list(index_call[1]['queryset'].values_list('id', flat=True))
+                    for index_call in index_documents.call_args_list[1:]]
+        self.assertEqual(replayed, [[updated_signal.pk], []])
+
+    def test_count_mismatch(self, _get_connection, index_documents, Index):
+        es = self._setup_es(_get_connection, count=2)
+
+        with self.assertRaises(IndexRebuildError):
+            SignalDocument.rebuild_index()
+
+        # The new index is deleted and the alias is not changed
+        es.indices.update_aliases.assert_not_called()
+        new_index = Index.call_args_list[-1][0][0]
+        self.assertNotEqual(new_index, self.old_index)
+        Index.return_value.delete.assert_called_once_with(using=None)
+
+    def test_first_rebuild(self, _get_connection, index_documents, Index):
+        es = self._setup_es(_get_connection, aliased=False)
+
+        new_index = SignalDocument.rebuild_index()
+
+        # The index that is not behind an alias is replaced by the alias
+        es.indices.update_aliases.assert_called_once_with(body={'actions': [
+            {'remove_index': {'index': self.alias}},
+            {'add': {'index': new_index, 'alias': self.alias}},
+        ]})
+
+    def test_keep_old_indices(self, _get_connection, index_documents, Index):
+        self._setup_es(_get_connection)
+
+        SignalDocument.rebuild_index(delete_old=False)
+
+        self.assertNotIn(call(self.old_index), Index.call_args_list)
+        Index.return_value.delete.assert_not_called()
+
+    @patch.object(SignalDocument, 'rebuild_index', return_value='signals-20210101000000')
+    @patch.object(SignalDocument, 'ping', return_value=True)
+    def test_command(self, ping, rebuild_index, _get_connection, index_documents, Index):
+        buffer = StringIO()
+        call_command('elastic_index', '--rebuild', '--keep-old-indices', stdout=buffer)
+
+        self.assertFalse(rebuild_index.call_args[1]['delete_old'])
+        self.assertIn('Switched to index "signals-20210101000000"', buffer.getvalue())
+
+    @patch.object(SignalDocument, 'rebuild_index', side_effect=IndexRebuildError('Count mismatch'))
+    @patch.object(SignalDocument, 'ping', return_value=True)
+    def test_command_failed(self, ping, rebuild_index, _get_connection, index_documents, Index):
+        stderr = StringIO()
+        call_command('elastic_index', '--rebuild', stdout=StringIO(), stderr=stderr)
+        self.assertIn('Count mismatch', stderr.getvalue())
@@ -0,0 +1,96 @@
+# SPDX-License-Identifier: MPL-2.0
+# Copyright (C) 2021 Gemeente Amsterdam
+from django.contrib.gis.geos import Point
+from django.http import QueryDict
+from django.test import TestCase
+from rest_framework.exceptions import ValidationError
+from rest_framework.test import APIRequestFactory
+
+from signals.apps.search.documents.signal import SignalDocument
+from signals.apps.search.filters import SignalSearchFilter
+from signals.apps.signals import workflow
+from signals.apps.signals.factories import (
+    CategoryFactory,
+    DepartmentFactory,
+    SignalFactory,
+    SignalUserFactory
+)
+from signals.apps.signals.models import Signal
+from signals.apps.users.factories import SuperUserFactory, UserFactory
+
+
+class TestSignalSearchFilter(TestCase):
+    def setUp(self):
+        self.request = APIRequestFactory().get('/signals/v1/private/search/')
+
+    def _filter(self, query_string):
+        search_filter = SignalSearchFilter(data=QueryDict(query_string), request=self.request)
+        return search_filter.filter_search(SignalDocument.search()).to_dict()
+
+    def test_no_filters(self):
+        self.assertEqual(self._filter('q=test'), {})
+
+    def test_terms_and_range(self):
+        query = self._filter('status=m&status=b&stadsdeel=A&created_after=2021-01-01T00:00:00')
+        filters = query['query']['bool']['filter']
+        self.assertIn({'terms': {'state': ['m', 'b']}}, filters)
+        self.assertIn({'terms': {'stadsdeel': ['A']}}, filters)
+        self.assertEqual(len(filters), 3)
+
+    def test_categories(self):
+        category = CategoryFactory.create()
+        query = self._filter(f'maincategory_slug={category.parent.slug}')
+        self.assertEqual(query['query']['bool']['filter'][0]['bool']['should'], [
+            {'terms': {'parent_category_id': [category.parent.pk]}},
+            {'terms': {'category_id': []}},
+        ])
+
+    def test_area_code_needs_area_type(self):
+        self.assertEqual(self._filter('area_code=centrum'), {})
+
+    def test_invalid_value(self):
+        with self.assertRaises(ValidationError):
+            self._filter('status=not-a-state')
+
+    def test_unsupported_filter(self):
+        with self.assertRaises(ValidationError):
+            self._filter('note_keyword=test')
+
+    def test_filter_for_user(self):
+        search_filter = SignalSearchFilter(data=QueryDict(), request=self.request)
+
+        search = search_filter.filter_search_for_user(SignalDocument.search(), SuperUserFactory.create())
+        self.assertEqual(search.to_dict(), {})
+
+        department = DepartmentFactory.create()
+        user = UserFactory.create()
+        user.profile.departments.add(department)
+        search = search_filter.filter_search_for_user(SignalDocument.search(), user)
+        self.assertEqual(search.to_dict()['query']['bool']['filter'][0]['bool']['should'], [
+            {'terms': {'category_id': []}},
+            {'terms': {'routing_department_ids': [department.pk]}},
+        ])
+
+
+class TestSignalDocument(TestCase):
+    def test_filter_fields(self):
+        signal = SignalFactory.create(location__geometrie=Point(4.88, 52.36), location__stadsdeel='A',
+                                      reporter__email='Reporter@Example.com', reporter__phone='')
+        signal.user_assignment = SignalUserFactory.create(_signal=signal)
+        signal.save()
+        Signal.actions.update_routing_departments({'departments': [{'id': DepartmentFactory.create().id}]}, signal)
+        SignalFactory.create(parent=signal)
+
+        signal = SignalDocument().get_index_queryset().get(pk=signal.pk)
+        fields = SignalDocument.get_filter_fields(signal)
+
+        self.assertEqual(fields['state'], workflow.GEMELD)
+        self.assertEqual(fields['stadsdeel'], 'A')
+        self.assertEqual(fields['category_id'], signal.category_assignment.category_id)
+        self.assertEqual(fields['reporter_email'], 'reporter@example.com')
+        self.assertTrue(fields['has_email'])
+        self.assertFalse(fields['has_phone'])
+        self.assertTrue(fields['is_parent'])
+        self.assertFalse(fields['is_child'])
+        self.assertEqual(fields['routing_department_ids'],
+                         [department.id for department in signal.routing_assignment.departments.all()])
@@ -0,0 +1,106 @@
+# SPDX-License-Identifier: MPL-2.0
+# Copyright (C) 2021 Gemeente Amsterdam
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from signals.apps.search.models import QueuedSignal
+from signals.apps.search.tasks import flush_index_queue
+from signals.apps.signals import workflow
+from signals.apps.signals.factories import SignalFactory
+from signals.apps.signals.models import Priority, Signal
+
+
+class TestIndexQueue(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.signals = SignalFactory.create_batch(3)
+
+    def test_add(self):
+        QueuedSignal.objects.add([self.signals[0].id, self.signals[0].id, self.signals[1].id])
+        QueuedSignal.objects.add([self.signals[1].id])
+        self.assertEqual(QueuedSignal.objects.count(), 2)
+
+    def test_take(self):
+        QueuedSignal.objects.add([signal.id for signal in self.signals])
+
+        taken, locked_until = QueuedSignal.objects.take(2, lock_timeout=60)
+        self.assertEqual(len(taken), 2)
+
+        # The taken Signals stay queued (locked) until they are done
+        self.assertEqual(QueuedSignal.objects.count(), 3)
+        more_taken, _ = QueuedSignal.objects.take(2, lock_timeout=60)
+        self.assertEqual(sorted(taken + more_taken), sorted(signal.id for signal in self.signals))
+        self.assertEqual(QueuedSignal.objects.take(2, lock_timeout=60), ([], None))
+
+        self.assertEqual(QueuedSignal.objects.done(taken, locked_until), 2)
+        self.assertEqual(QueuedSignal.objects.count(), 1)
+
+    def test_take_lock_expired(self):
+        QueuedSignal.objects.add([signal.id for signal in self.signals])
+
+        # An interrupted flush never calls done, the Signals are taken again after the lock expired
+        taken, _ = QueuedSignal.objects.take(3, lock_timeout=-1)
+        self.assertEqual(len(taken), 3)
+        taken, _ = QueuedSignal.objects.take(3, lock_timeout=60)
+        self.assertEqual(len(taken), 3)
+
+    def test_queued_again_while_taken(self):
+        QueuedSignal.objects.add([signal.id for signal in self.signals])
+        taken, locked_until = QueuedSignal.objects.take(3, lock_timeout=60)
+
+        # A Signal that changed while it was being indexed is not removed from the queue
+        QueuedSignal.objects.add([self.signals[0].id])
+        QueuedSignal.objects.done(taken, locked_until)
+
+        self.assertEqual(list(QueuedSignal.objects.values_list('_signal_id', flat=True)), [self.signals[0].id])
+        self.assertEqual(QueuedSignal.objects.take(3, lock_timeout=60)[0], [self.signals[0].id])
+
+    @override_settings(SEARCH={'QUEUE_FLUSH_BATCH_SIZE': 2})
+    @patch('signals.apps.search.tasks.SignalDocument.index_documents')
+    def test_flush(self, index_documents):
+        QueuedSignal.objects.add([signal.id for signal in self.signals])
+
+        self.assertEqual(flush_index_queue(), 3)
+        self.assertEqual(index_documents.call_count, 2)
+        self.assertFalse(QueuedSignal.objects.exists())
+
+    @patch('signals.apps.search.tasks.SignalDocument.index_documents', side_effect=Exception('Unreachable'))
+    def test_flush_failed(self, index_documents):
+        QueuedSignal.objects.add([signal.id for signal in self.signals])
+
+        with self.assertRaises(Exception):
+            flush_index_queue()
+        self.assertEqual(QueuedSignal.objects.count(), 3)
+
+        # The Signals are unlocked, the next flush indexes them
+        self.assertFalse(QueuedSignal.objects.filter(locked_until__isnull=False).exists())
+
+    @override_settings(FEATURE_FLAGS={'SEARCH_INDEX_QUEUE_ENABLED': True})
+    @patch('signals.apps.search.tasks.flush_index_queue.apply_async')
+    @patch('signals.apps.search.tasks.save_to_elastic.delay')
+    def test_changes_are_coalesced(self, save_to_elastic, apply_async):
+        signal = self.signals[0]
+        with self.captureOnCommitCallbacks(execute=True):
+            Signal.actions.update_priority({'priority': Priority.PRIORITY_HIGH}, signal)
+        with self.captureOnCommitCallbacks(execute=True):
+            Signal.actions.update_status({'state': workflow.BEHANDELING, 'text': 'In behandeling'}, signal)
+            Signal.actions.update_priority({'priority': Priority.PRIORITY_LOW}, signal)
+
+        self.assertEqual(list(QueuedSignal.objects.values_list('_signal_id', flat=True)), [signal.id])
+        apply_async.assert_called_once()
+        save_to_elastic.assert_not_called()
+
+    @override_settings(FEATURE_FLAGS={'SEARCH_INDEX_QUEUE_ENABLED': True})
+    @patch('signals.apps.search.tasks.flush_index_queue.apply_async', side_effect=OSError('Broker unavailable'))
+    def test_schedule_failed(self, apply_async):
+        signal = self.signals[0]
+        with self.captureOnCommitCallbacks(execute=True):
+            Signal.actions.update_priority({'priority': Priority.PRIORITY_HIGH}, signal)
+
+        # The Signal stays queued and the flush is scheduled again by the next change
+        self.assertEqual(list(QueuedSignal.objects.values_list('_signal_id', flat=True)), [signal.id])
+        with self.captureOnCommitCallbacks(execute=True):
+            Signal.actions.update_priority({'priority': Priority.PRIORITY_LOW}, signal)
+        self.assertEqual(apply_async.call_count, 2)
@@ -0,0 +1,48 @@
+# SPDX-License-Identifier: MPL-2.0
+# Copyright (C) 2021 Gemeente Amsterdam
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+from django.core.cache import cache
+from django.test import TestCase
+
+from signals.apps.search.documents.signal import SignalDocument
+from signals.apps.search.pagination import ElasticPaginator
+from signals.apps.signals.factories import CategoryFactory, DepartmentFactory, SignalFactory
+from signals.apps.signals.factories.category_departments import CategoryDepartmentFactory
+from signals.apps.users.factories import UserFactory
+
+
+class TestElasticPaginator(TestCase):
+    def setUp(self):
+        cache.clear()
+
+        department = DepartmentFactory.create()
+        category = CategoryFactory.create()
+        CategoryDepartmentFactory.create(category=category, department=department, is_responsible=True)
+
+        self.user = UserFactory.create()
+        self.user.profile.departments.add(department)
+
+        self.signal = SignalFactory.create(category_assignment__category=category)
+        self.other_signal = SignalFactory.create()
+
+        # The (outdated) documents of both Signals match the search
+        self.response = SimpleNamespace(hits=[SimpleNamespace(id=self.other_signal.id),
+                                              SimpleNamespace(id=self.signal.id)])
+
+    def test_to_queryset(self):
+        search = SignalDocument.search()
+
+        self.assertEqual(list(search.to_queryset(self.response)), [self.other_signal, self.signal])
+        self.assertEqual(list(search.to_queryset(self.response, user=self.user)), [self.signal])
+
+    def test_page_checks_permissions(self):
+        search = MagicMock()
+        search.count.return_value = 2
+        search.__getitem__.return_value.execute.return_value = self.response
+
+        paginator = ElasticPaginator(search, 10, user=self.user)
+        paginator.page(1)
+
+        search.to_queryset.assert_called_once_with(self.response, user=self.user)
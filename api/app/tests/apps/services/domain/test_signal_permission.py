@@ -0,0 +1,86 @@
+# SPDX-License-Identifier: MPL-2.0
+# Copyright (C) 2021 Gemeente Amsterdam
+from django.core.cache import cache
+from django.test import TestCase
+
+from signals.apps.services.domain.signal_permission import SignalPermissionService
+from signals.apps.signals.factories import (
+    CategoryFactory,
+    DepartmentFactory,
+    SignalDepartmentsFactory,
+    SignalFactory
+)
+from signals.apps.signals.factories.category_departments import CategoryDepartmentFactory
+from signals.apps.signals.models import Signal, SignalDepartments
+from signals.apps.users.factories import UserFactory
+
+
+class TestSignalPermissionService(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.service = SignalPermissionService()
+
+        self.department = DepartmentFactory.create()
+        self.responsible_category = CategoryFactory.create()
+        self.viewable_category = CategoryFactory.create()
+        self.other_category = CategoryFactory.create()
+        CategoryDepartmentFactory.create(category=self.responsible_category, department=self.department,
+                                         is_responsible=True, can_view=False)
+        CategoryDepartmentFactory.create(category=self.viewable_category, department=self.department,
+                                         is_responsible=False, can_view=True)
+
+        self.user = UserFactory.create()
+        self.user.profile.departments.add(self.department)
+
+    def test_permission_snapshot(self):
+        snapshot = self.service.get_permission_snapshot(self.user)
+        self.assertEqual(snapshot['department_ids'], {self.department.id})
+        self.assertEqual(snapshot['category_ids'], {self.responsible_category.id, self.viewable_category.id})
+
+        # is_responsible implies can_view (see CategoryDepartment.save)
+        self.assertEqual(snapshot['viewable_category_ids'], {self.responsible_category.id, self.viewable_category.id})
+
+    def test_permission_snapshot_cached(self):
+        self.service.get_permission_snapshot(self.user)
+        with self.assertNumQueries(0):
+            self.service.get_permission_snapshot(self.user)
+
+    def test_permission_snapshot_invalidated_category_department(self):
+        self.service.get_permission_snapshot(self.user)
+
+        CategoryDepartmentFactory.create(category=self.other_category, department=self.department,
+                                         is_responsible=False, can_view=True)
+        snapshot = self.service.get_permission_snapshot(self.user)
+        self.assertIn(self.other_category.id, snapshot['category_ids'])
+
+        self.department.category_set.clear()
+        snapshot = self.service.get_permission_snapshot(self.user)
+        self.assertEqual(snapshot['category_ids'], set())
+
+    def test_permission_snapshot_invalidated_profile_departments(self):
+        self.service.get_permission_snapshot(self.user)
+
+        self.user.profile.departments.clear()
+        snapshot = self.service.get_permission_snapshot(self.user)
+        self.assertEqual(snapshot['department_ids'], set())
+        self.assertEqual(snapshot['category_ids'], set())
+
+    def test_make_permission_condition_for_user(self):
+        signal_responsible = SignalFactory.create(category_assignment__category=self.responsible_category)
+        signal_viewable = SignalFactory.create(category_assignment__category=self.viewable_category)
+        signal_other = SignalFactory.create(category_assignment__category=self.other_category)
+        signal_routed = SignalFactory.create(category_assignment__category=self.other_category)
+        routing = SignalDepartmentsFactory.create(_signal=signal_routed, relation_type=SignalDepartments.REL_ROUTING,
+                                                  departments=[self.department])
+        signal_routed.routing_assignment = routing
+        signal_routed.save()
+
+        condition = self.service.make_permisson_condition_for_user(self.user)
+        signal_ids = set(Signal.objects.filter(condition).values_list('id', flat=True))
+        self.assertEqual(signal_ids, {signal_responsible.id, signal_viewable.id, signal_routed.id})
+        self.assertNotIn(signal_other.id, signal_ids)
+
+        self.assertTrue(self.service.has_permission_via_category(self.user, signal_viewable))
+        self.assertFalse(self.service.has_permission_via_category(self.user, signal_other))
+        self.assertTrue(self.service.has_permission_via_routing(self.user, signal_routed))
+        self.assertFalse(self.service.has_permission_via_routing(self.user, signal_other))
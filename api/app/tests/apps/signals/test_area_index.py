@@ -0,0 +1,74 @@
+# SPDX-License-Identifier: MPL-2.0
+# Copyright (C) 2021 Gemeente Amsterdam
+from unittest.mock import patch
+
+from django.contrib.gis.geos import MultiPolygon, Point, Polygon
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from signals.apps.signals.factories import AreaFactory, AreaTypeFactory
+from signals.apps.signals.utils.area_index import get_area_index
+from signals.apps.signals.utils.location import _get_area, _get_area_codes
+
+
+@override_settings(FEATURE_FLAGS={'API_AREA_INDEX_ENABLED': True})
+class TestAreaIndex(TestCase):
+    def setUp(self):
+        cache.clear()
+
+        self.area_type = AreaTypeFactory.create(code='district')
+        self.centrum = AreaFactory.create(
+            geometry=MultiPolygon([Polygon.from_bbox([4.877157, 52.357204, 4.929686, 52.385239])], srid=4326),
+            code='centrum',
+            _type=self.area_type,
+        )
+        self.oost = AreaFactory.create(
+            geometry=MultiPolygon([Polygon.from_bbox([4.929686, 52.357204, 4.99, 52.385239])], srid=4326),
+            code='oost',
+            _type=self.area_type,
+        )
+
+        self.pt_in_centrum = Point(4.88, 52.36, srid=4326)
+        self.pt_in_oost = Point(4.95, 52.36, srid=4326)
+        self.pt_outside = Point(6, 53, srid=4326)
+
+    def test_get_area(self):
+        # Loads the index
+        self.assertEqual(_get_area(self.pt_in_centrum, 'district'), self.centrum)
+
+        with self.assertNumQueries(0):
+            self.assertEqual(_get_area(self.pt_in_centrum, 'district'), self.centrum)
+            self.assertEqual(_get_area(self.pt_in_oost, 'district'), self.oost)
+            self.assertIsNone(_get_area(self.pt_outside, 'district'))
+
+    def test_get_area_codes(self):
+        area_codes = _get_area_codes([self.pt_in_centrum, self.pt_in_oost, self.pt_outside], ['district'])
+        self.assertEqual(area_codes, [{'district': 'centrum'}, {'district': 'oost'}, {}])
+
+    def test_reloaded_when_areas_change(self):
+        self.assertEqual(_get_area(self.pt_outside, 'district'), None)
+
+        elsewhere = AreaFactory.create(
+            geometry=MultiPolygon([Polygon.from_bbox([5.9, 52.9, 6.1, 53.1])], srid=4326),
+            code='elsewhere',
+            _type=self.area_type,
+        )
+        self.assertEqual(_get_area(self.pt_outside, 'district'), elsewhere)
+
+        elsewhere.delete()
+        self.assertEqual(_get_area(self.pt_outside, 'district'), None)
+
+    def test_reloaded_after_timeout(self):
+        index = get_area_index('district')
+        index.get_entries()
+
+        with self.settings(AREA_INDEX_TIMEOUT=-1):
+            with patch.object(index, '_load', wraps=index._load) as load:
+                index.get_entries()
+        load.assert_called_once()
+
+    def test_fallback_to_database(self):
+        # Other SRID's are not supported by the index, the database is used
+        pt_rd = Point(121849, 487305, srid=28992)
+        with self.assertNumQueries(1):
+            self.assertEqual(_get_area(pt_rd, 'district'), self.centrum)
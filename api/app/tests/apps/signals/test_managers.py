@@ -4,7 +4,9 @@ from unittest.mock import patch
 
 from django.contrib.gis.geos import MultiPolygon, Point, Polygon
 from django.core.exceptions import ValidationError
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 
 from signals.apps.signals.factories import AreaFactory, CategoryFactory, SignalFactory
 from signals.apps.signals.models import CategoryAssignment, Signal, Type
@@ -218,3 +220,63 @@ class TestSignalManager(TestCase):
         self.assertEqual(self.signal.types.count(), 2)
         self.assertIsNotNone(self.signal.type_assignment)
         self.assertEqual(self.signal.type_assignment.name, Type.SIGNAL)
+
+    def _create_initial_data(self, geometrie, **kwargs):
+        return {
+            'signal_data': {
+                'text': 'Bladiebla',
+                'incident_date_start': '2020-02-26T12:00:00.000000Z',
+                'source': 'online',
+                **kwargs,
+            },
+            'location_data': {'geometrie': geometrie, 'address': {'openbare_ruimte': 'Dam', 'huisnummer': 1}},
+            'status_data': {},
+            'category_assignment_data': {'category': self.category},
+            'reporter_data': {'email': 'reporter@example.com'},
+        }
+
+    def test_create_initial_bulk(self):
+        signals_data = [
+            self._create_initial_data(self.pt_in_center),
+            self._create_initial_data(self.pt_out_center),
+        ]
+        signals_data[1]['type_data'] = {'name': Type.QUESTION}
+
+        with patch('signals.apps.signals.managers.create_initial.send_robust') as send_robust:
+            with self.captureOnCommitCallbacks(execute=True):
+                signals = Signal.actions.create_initial_bulk(signals_data)
+
+        self.assertEqual(len(signals), 2)
+        self.assertEqual(send_robust.call_count, 2)
+
+        signal_in_center, signal_out_center = [Signal.objects.get(pk=signal.pk) for signal in signals]
+        self.assertEqual(signal_in_center.location.area_type_code, 'district')
+        self.assertEqual(signal_in_center.location.area_code, 'centrum')
+        self.assertTrue(signal_in_center.location.address_text.startswith('Dam 1'))
+        self.assertIsNone(signal_out_center.location.area_code)
+
+        for signal in (signal_in_center, signal_out_center):
+            self.assertEqual(signal.status._signal_id, signal.pk)
+            self.assertEqual(signal.category_assignment.category, self.category)
+            self.assertEqual(signal.reporter.email, 'reporter@example.com')
+            self.assertIsNotNone(signal.priority)
+        self.assertEqual(signal_in_center.type_assignment.name, Type.SIGNAL)
+        self.assertEqual(signal_out_center.type_assignment.name, Type.QUESTION)
+
+    def test_create_initial_bulk_number_of_queries(self):
+        with CaptureQueriesContext(connection) as one_signal:
+            Signal.actions.create_initial_bulk([self._create_initial_data(self.pt_in_center)])
+
+        with CaptureQueriesContext(connection) as ten_signals:
+            Signal.actions.create_initial_bulk([self._create_initial_data(self.pt_in_center) for _ in range(10)])
+
+        # Only the deadline calculation runs a query per Signal
+        self.assertEqual(len(ten_signals), len(one_signal) + 9)
+
+    def test_create_initial_bulk_max_children(self):
+        with self.settings(SIGNAL_MAX_NUMBER_OF_CHILDREN=2):
+            with self.assertRaises(ValidationError):
+                Signal.actions.create_initial_bulk([
+                    self._create_initial_data(self.pt_in_center, parent=self.signal) for _ in range(3)
+                ])
+        self.assertFalse(self.signal.children.exists())
@@ -0,0 +1,138 @@
+# SPDX-License-Identifier: MPL-2.0
+# Copyright (C) 2021 Gemeente Amsterdam
+from datetime import timedelta
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from signals.apps.signals import tasks, workflow
+from signals.apps.signals.factories import SignalFactory
+from signals.apps.signals.models import Signal, SignalEvent
+
+
+@override_settings(FEATURE_FLAGS={**settings.FEATURE_FLAGS, 'SIGNAL_EVENT_OUTBOX_ENABLED': True})
+@mock.patch('signals.apps.search.signal_receivers.save_to_elastic', autospec=True)
+@mock.patch('signals.apps.sigmax.signal_receivers.tasks', autospec=True)
+@mock.patch('signals.apps.email_integrations.signal_receivers.tasks', autospec=True)
+class TestOutbox(TestCase):
+    def setUp(self):
+        cache.clear()
+
+        self.signal = SignalFactory.create()
+
+    def _update_status(self):
+        return Signal.actions.update_status({'state': workflow.BEHANDELING, 'text': 'In behandeling'}, self.signal)
+
+    def test_event_stored_with_the_change(self, email_tasks, sigmax_tasks, save_to_elastic):
+        with mock.patch('signals.apps.signals.tasks.dispatch_signal_events.apply_async') as apply_async:
+            with self.captureOnCommitCallbacks(execute=True):
+                status = self._update_status()
+
+        event = SignalEvent.objects.get()
+        self.assertEqual(event.name, 'update_status')
+        self.assertEqual(event.sender, 'signals.apps.signals.managers.SignalManager')
+        self.assertEqual(event.kwargs['signal_obj'], {'model': 'signals.signal', 'pk': self.signal.pk})
+        self.assertEqual(event.kwargs['status'], {'model': 'signals.status', 'pk': status.pk})
+
+        # The outbox receivers are not called after the commit, the dispatch is scheduled instead
+        email_tasks.send_mail_reporter.delay.assert_not_called()
+        sigmax_tasks.push_to_sigmax.delay.assert_not_called()
+        apply_async.assert_called_once()
+
+    def test_no_event_without_outbox_receivers(self, email_tasks, sigmax_tasks, save_to_elastic):
+        Signal.actions.create_note({'text': 'Notitie'}, self.signal)
+        self.assertFalse(SignalEvent.objects.exists())
+
+    def test_dispatch(self, email_tasks, sigmax_tasks, save_to_elastic):
+        self._update_status()
+
+        self.assertEqual(tasks.dispatch_signal_events(), 1)
+
+        email_tasks.send_mail_reporter.delay.assert_called_once_with(pk=self.signal.pk)
+        sigmax_tasks.push_to_sigmax.delay.assert_called_once_with(pk=self.signal.pk)
+        save_to_elastic.delay.assert_called_once_with(signal_id=self.signal.pk)
+        self.assertFalse(SignalEvent.objects.exists())
+
+    def test_dispatch_failed_receiver(self, email_tasks, sigmax_tasks, save_to_elastic):
+        self._update_status()
+
+        email_tasks.send_mail_reporter.delay.side_effect = Exception('Broker unavailable')
+        self.assertEqual(tasks.dispatch_signal_events(), 0)
+
+        event = SignalEvent.objects.get()
+        self.assertEqual(event.attempts, 1)
+        self.assertIn('sigmax_update_status', event.handled)
+        self.assertNotIn('core_email_integrations_update_status', event.handled)
+
+        # The event stays locked until the lock expires
+        self.assertEqual(tasks.dispatch_signal_events(), 0)
+        SignalEvent.objects.update(locked_until=None)
+
+        email_tasks.send_mail_reporter.delay.side_effect = None
+        self.assertEqual(tasks.dispatch_signal_events(), 1)
+
+        # Only the receiver that failed is called again
+        self.assertEqual(email_tasks.send_mail_reporter.delay.call_count, 2)
+        sigmax_tasks.push_to_sigmax.delay.assert_called_once_with(pk=self.signal.pk)
+        self.assertFalse(SignalEvent.objects.exists())
+
+    def test_dispatch_max_attempts(self, email_tasks, sigmax_tasks, save_to_elastic):
+        self._update_status()
+
+        email_tasks.send_mail_reporter.delay.side_effect = Exception('Broker unavailable')
+        with self.settings(SIGNAL_EVENTS_MAX_ATTEMPTS=1):
+            tasks.dispatch_signal_events()
+        self.assertFalse(SignalEvent.objects.exists())
+
+    def test_broker_unavailable(self, email_tasks, sigmax_tasks, save_to_elastic):
+        with mock.patch('signals.apps.signals.tasks.dispatch_signal_events.apply_async',
+                        side_effect=OSError('Broker unavailable')) as apply_async:
+            with self.captureOnCommitCallbacks(execute=True):
+                self._update_status()
+
+            # The change is committed and the event is dispatched by the next dispatch
+            self.assertEqual(Signal.objects.get(pk=self.signal.pk).status.state, workflow.BEHANDELING)
+            self.assertEqual(SignalEvent.objects.count(), 1)
+
+            tasks.schedule_dispatch_signal_events()
+            self.assertEqual(apply_async.call_count, 2)
+
+    def test_disabled(self, email_tasks, sigmax_tasks, save_to_elastic):
+        with self.settings(FEATURE_FLAGS={**settings.FEATURE_FLAGS, 'SIGNAL_EVENT_OUTBOX_ENABLED': False}):
+            with self.captureOnCommitCallbacks(execute=True):
+                self._update_status()
+
+        self.assertFalse(SignalEvent.objects.exists())
+        email_tasks.send_mail_reporter.delay.assert_called_once_with(pk=self.signal.pk)
+        sigmax_tasks.push_to_sigmax.delay.assert_called_once_with(pk=self.signal.pk)
+
+    def test_interrupted_dispatch(self, email_tasks, sigmax_tasks, save_to_elastic):
+        self._update_status()
+        Signal.actions.update_status({'state': workflow.AFGEHANDELD, 'text': 'Afgehandeld'}, self.signal)
+        first, second = SignalEvent.objects.order_by('id')
+
+        email_tasks.send_mail_reporter.delay.side_effect = [None, KeyboardInterrupt('Worker killed')]
+        with self.assertRaises(KeyboardInterrupt):
+            tasks.dispatch_signal_events()
+
+        # The event that was dispatched before the interruption is not dispatched again
+        self.assertEqual(list(SignalEvent.objects.values_list('id', flat=True)), [second.id])
+
+    def test_lock_expired_during_batch(self, email_tasks, sigmax_tasks, save_to_elastic):
+        self._update_status()
+        Signal.actions.update_status({'state': workflow.AFGEHANDELD, 'text': 'Afgehandeld'}, self.signal)
+        first, second = SignalEvent.objects.order_by('id')
+
+        def dispatch_event(event, kwargs):
+            # The lock of the second event expired and it was taken by another dispatch
+            SignalEvent.objects.filter(pk=second.pk).update(locked_until=timezone.now() + timedelta(seconds=300))
+            return True
+
+        with mock.patch('signals.apps.signals.outbox._dispatch_event', side_effect=dispatch_event) as _dispatch_event:
+            self.assertEqual(tasks.dispatch_signal_events(), 1)
+
+        _dispatch_event.assert_called_once()
+        self.assertEqual(list(SignalEvent.objects.values_list('id', flat=True)), [second.id])
@@ -0,0 +1,112 @@
+# SPDX-License-Identifier: MPL-2.0
+# Copyright (C) 2021 Gemeente Amsterdam
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from signals.apps.signals import tasks
+from signals.apps.signals.factories import SignalDepartmentsFactory, SignalFactory
+from signals.apps.signals.models import Signal, SignalDepartments, SignalEvent
+
+
+@override_settings(ROUTING_SYNC_THRESHOLD=50)
+@mock.patch('signals.apps.signals.tasks.dsl_service.process_routing_rules', autospec=True)
+class TestRouteSignal(TestCase):
+    def setUp(self):
+        cache.clear()
+
+        self.signal = SignalFactory.create()
+
+    def test_apply_routing(self, process_routing_rules):
+        tasks.apply_routing(self.signal.pk)
+
+        process_routing_rules.assert_called_once_with(self.signal)
+        self.assertIsNotNone(cache.get(tasks.ROUTING_DURATION_CACHE_KEY))
+
+    def test_apply_routing_already_routed(self, process_routing_rules):
+        routing_assignment = SignalDepartmentsFactory.create(_signal=self.signal,
+                                                             relation_type=SignalDepartments.REL_ROUTING)
+        Signal.objects.filter(pk=self.signal.pk).update(routing_assignment=routing_assignment)
+
+        tasks.apply_routing(self.signal.pk)
+        process_routing_rules.assert_not_called()
+
+    def test_record_routing_duration(self, process_routing_rules):
+        tasks._record_routing_duration(100)
+        self.assertEqual(cache.get(tasks.ROUTING_DURATION_CACHE_KEY), 100)
+
+        tasks._record_routing_duration(50)
+        self.assertEqual(cache.get(tasks.ROUTING_DURATION_CACHE_KEY), 90)
+
+    def test_route_signal_without_estimate(self, process_routing_rules):
+        with mock.patch('signals.apps.signals.tasks.apply_routing.delay') as delay:
+            tasks.route_signal(self.signal.pk)
+
+        process_routing_rules.assert_called_once()
+        delay.assert_not_called()
+
+    def test_route_signal_fast(self, process_routing_rules):
+        cache.set(tasks.ROUTING_DURATION_CACHE_KEY, 10)
+
+        with mock.patch('signals.apps.signals.tasks.apply_routing.delay') as delay:
+            tasks.route_signal(self.signal.pk)
+
+        process_routing_rules.assert_called_once()
+        delay.assert_not_called()
+
+    def test_route_signal_slow(self, process_routing_rules):
+        cache.set(tasks.ROUTING_DURATION_CACHE_KEY, 500)
+
+        with mock.patch('signals.apps.signals.tasks.apply_routing.delay') as delay:
+            tasks.route_signal(self.signal.pk)
+
+        process_routing_rules.assert_not_called()
+        delay.assert_called_once_with(self.signal.pk)
+
+    def test_route_signal_always_async(self, process_routing_rules):
+        with self.settings(ROUTING_SYNC_THRESHOLD=0):
+            with mock.patch('signals.apps.signals.tasks.apply_routing.delay') as delay:
+                tasks.route_signal(self.signal.pk)
+
+        process_routing_rules.assert_not_called()
+        delay.assert_called_once_with(self.signal.pk)
+
+    @override_settings(FEATURE_FLAGS={**settings.FEATURE_FLAGS, 'SIGNAL_EVENT_OUTBOX_ENABLED': True})
+    def test_route_signal_slow_outbox(self, process_routing_rules):
+        cache.set(tasks.ROUTING_DURATION_CACHE_KEY, 500)
+
+        # The Signal is routed by the dispatch of the create_initial event
+        with mock.patch('signals.apps.signals.tasks.apply_routing.delay') as delay:
+            tasks.route_signal(self.signal.pk)
+
+        process_routing_rules.assert_not_called()
+        delay.assert_not_called()
+
+    @override_settings(FEATURE_FLAGS={**settings.FEATURE_FLAGS, 'SIGNAL_EVENT_OUTBOX_ENABLED': True})
+    @mock.patch('signals.apps.signals.tasks.dispatch_signal_events.apply_async')
+    def test_create_initial_outbox(self, apply_async, process_routing_rules):
+        cache.set(tasks.ROUTING_DURATION_CACHE_KEY, 500)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            signal = Signal.actions.create_initial(
+                signal_data={'text': 'Er ligt afval', 'incident_date_start': '2021-06-01T12:00:00.000000Z',
+                             'source': 'online'},
+                location_data={'geometrie': self.signal.location.geometrie},
+                status_data={},
+                category_assignment_data={'category': self.signal.category_assignment.category},
+                reporter_data={},
+            )
+
+        process_routing_rules.assert_not_called()
+        self.assertTrue(SignalEvent.objects.filter(name='create_initial').exists())
+
+        with mock.patch('signals.apps.search.signal_receivers.save_to_elastic', autospec=True), \
+                mock.patch('signals.apps.email_integrations.signal_receivers.tasks', autospec=True), \
+                mock.patch('signals.apps.signals.tasks.apply_routing.delay') as delay:
+            tasks.dispatch_signal_events()
+
+        # The dispatch only queues the routing task
+        process_routing_rules.assert_not_called()
+        delay.assert_called_once_with(signal.pk)
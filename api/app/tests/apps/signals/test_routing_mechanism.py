@@ -1,17 +1,33 @@
 # SPDX-License-Identifier: MPL-2.0
 # Copyright (C) 2020 - 2021 Vereniging van Nederlandse Gemeenten, Gemeente Amsterdam
+from io import StringIO
+
 from django.contrib.gis import geos
-from django.test import TestCase
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
 
-from signals.apps.services.domain.dsl import SignalContext, SignalDslService
+from signals.apps.dsl.evaluators.equality_evaluator import EqualityEvaluator
+from signals.apps.dsl.evaluators.in_evaluator import InEvaluator
+from signals.apps.services.domain.dsl import (
+    CompiledRoutingRule,
+    RoutingRuleSet,
+    SignalContext,
+    SignalDslService
+)
 from signals.apps.signals.factories import (
     AreaFactory,
+    CategoryFactory,
     DepartmentFactory,
     ExpressionFactory,
     ExpressionTypeFactory,
     RoutingExpressionFactory,
-    SignalFactory
+    SignalFactory,
+    SignalUserFactory
 )
+from signals.apps.signals.models import Signal
+from signals.apps.signals.tasks import reroute_open_signals
+from signals.apps.signals.workflow import AFGEHANDELD
 
 
 class TestRoutingMechanism(TestCase):
@@ -180,3 +196,130 @@ class TestRoutingMechanism(TestCase):
         self.assertTrue("value 3.1" in ctx['key3_list'])
         self.assertTrue("value 3.2" in ctx['key3_list'])
         self.assertEqual(ctx['key4'], "value 4")
+
+    def test_compiled_rule_cheap_predicates_first(self):
+        code = f'location in areas."{self.area._type.name}"."{self.area.code}" and sub == "test" and main == "main"'
+        rule = CompiledRoutingRule(1, self.department.id, self.dsl_service._compile(code))
+
+        self.assertEqual(len(rule.predicates), 3)
+        self.assertIsInstance(rule.predicates[0], EqualityEvaluator)
+        self.assertIsInstance(rule.predicates[1], EqualityEvaluator)
+        self.assertIsInstance(rule.predicates[2], InEvaluator)
+        self.assertEqual(rule.guards, {'sub': 'test', 'main': 'main'})
+        self.assertEqual(rule.get_area_type_names(), {self.area._type.name})
+
+    def test_compiled_rule_or(self):
+        # The order of the predicates of an "or" changes the outcome when one of the predicates raises an error
+        rule = CompiledRoutingRule(1, self.department.id, self.dsl_service._compile('sub == "test" or main == "main"'))
+        self.assertIsNone(rule.predicates)
+        self.assertEqual(rule.guards, {})
+        self.assertTrue(rule.evaluate({'sub': 'other', 'main': 'main'}))
+
+    def test_rule_set_candidates(self):
+        category = CategoryFactory.create(name='indexed category')
+        other_department = DepartmentFactory.create()
+        RoutingExpressionFactory.create(
+            _expression__code='sub == "indexed category"',
+            _expression___type=self.exp_routing_type,
+            _department=other_department,
+            order=1
+        )
+        RoutingExpressionFactory.create(
+            _expression__code='sub == "other category"',
+            _expression___type=self.exp_routing_type,
+            _department=other_department,
+            order=3
+        )
+
+        rule_set = RoutingRuleSet.build(self.dsl_service._compile)
+        self.assertEqual(len(rule_set.rules), 3)
+
+        candidates = rule_set.get_candidates({'sub': category.name, 'main': category.parent.name})
+        self.assertEqual([rule.department_id for rule in candidates], [other_department.id, self.department.id])
+
+        # Only the areas used by the routing rules are loaded, as prepared geometries
+        self.assertEqual(list(rule_set.areas.keys()), [self.area._type.name])
+
+        signal = SignalFactory.create(category_assignment__category=category, location__geometrie=geos.Point(1, 1))
+        self.dsl_service.process_routing_rules(signal)
+        signal.refresh_from_db()
+        self.assertEqual(signal.routing_assignment.departments.first(), other_department)
+
+    @override_settings(FEATURE_FLAGS={'ROUTING_RULES_CACHE_ENABLED': True})
+    def test_rule_set_cached(self):
+        cache.clear()
+
+        rule_set = self.dsl_service.get_rule_set()
+        with self.assertNumQueries(0):
+            self.assertIs(self.dsl_service.get_rule_set(), rule_set)
+
+        # Changing a routing rule invalidates the compiled rules
+        RoutingExpressionFactory.create(_expression___type=self.exp_routing_type, _department=self.department,
+                                        _expression__code='sub == "test"')
+        new_rule_set = self.dsl_service.get_rule_set()
+        self.assertIsNot(new_rule_set, rule_set)
+        self.assertEqual(len(new_rule_set.rules), 2)
+
+    def _create_signals_to_reroute(self):
+        self.other_department = DepartmentFactory.create()
+
+        self.signal_inside = SignalFactory.create(location__geometrie=geos.Point(4.88, 52.36))
+        Signal.actions.update_routing_departments({'departments': [{'id': self.other_department.id}]},
+                                                  self.signal_inside)
+        self.signal_inside.refresh_from_db()
+        self.signal_inside.user_assignment = SignalUserFactory.create(_signal=self.signal_inside)
+        self.signal_inside.save()
+
+        self.signal_outside = SignalFactory.create(location__geometrie=geos.Point(1.0, 1.0))
+        self.signal_closed = SignalFactory.create(location__geometrie=geos.Point(4.88, 52.36),
+                                                  status__state=AFGEHANDELD)
+
+    def test_reroute_signals(self):
+        self._create_signals_to_reroute()
+        signal_ids = [self.signal_inside.id, self.signal_outside.id]
+
+        changes = self.dsl_service.reroute_signals(signal_ids, dry_run=True)
+        self.assertEqual(changes, [(self.signal_inside.id, [self.other_department.id], self.department.id)])
+        self.signal_inside.refresh_from_db()
+        self.assertEqual(self.signal_inside.routing_assignment.departments.get(), self.other_department)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            changes = self.dsl_service.reroute_signals(signal_ids)
+        self.assertEqual(changes, [(self.signal_inside.id, [self.other_department.id], self.department.id)])
+
+        self.signal_inside.refresh_from_db()
+        self.assertEqual(self.signal_inside.routing_assignment.departments.get(), self.department)
+        self.assertIsNone(self.signal_inside.user_assignment)
+        self.signal_outside.refresh_from_db()
+        self.assertIsNone(self.signal_outside.routing_assignment)
+
+        # Nothing left to change
+        self.assertEqual(self.dsl_service.reroute_signals(signal_ids), [])
+
+    def test_reroute_signals_command(self):
+        self._create_signals_to_reroute()
+
+        buffer = StringIO()
+        call_command('reroute_signals', dry_run=True, stdout=buffer)
+        self.assertIn(f'Signal #{self.signal_inside.id}: {self.other_department.code} -> {self.department.code}',
+                      buffer.getvalue())
+        self.assertIn('1 of 2 Signals would be rerouted', buffer.getvalue())
+
+        buffer = StringIO()
+        call_command('reroute_signals', chunk_size=1, stdout=buffer)
+        self.assertIn('1 of 2 Signals rerouted', buffer.getvalue())
+
+        self.signal_inside.refresh_from_db()
+        self.assertEqual(self.signal_inside.routing_assignment.departments.get(), self.department)
+
+        # Closed Signals are not rerouted
+        self.signal_closed.refresh_from_db()
+        self.assertIsNone(self.signal_closed.routing_assignment)
+
+    def test_reroute_open_signals_task(self):
+        self._create_signals_to_reroute()
+
+        self.assertEqual(reroute_open_signals(chunk_size=1), 2)
+
+        self.signal_inside.refresh_from_db()
+        self.assertEqual(self.signal_inside.routing_assignment.departments.get(), self.department)
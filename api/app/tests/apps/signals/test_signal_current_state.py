@@ -0,0 +1,138 @@
+# SPDX-License-Identifier: MPL-2.0
+# Copyright (C) 2021 Gemeente Amsterdam
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import override_settings
+
+from signals.apps.signals import workflow
+from signals.apps.signals.factories import (
+    CategoryFactory,
+    DepartmentFactory,
+    ParentCategoryFactory,
+    SignalFactory,
+    SignalUserFactory
+)
+from signals.apps.signals.models import Priority, Signal, SignalCurrentState
+from tests.test import SignalsBaseApiTestCase
+
+
+class TestSignalCurrentState(SignalsBaseApiTestCase):
+    def setUp(self):
+        self.parent_category = ParentCategoryFactory.create()
+        self.category = CategoryFactory.create(parent=self.parent_category)
+
+        self.signal = SignalFactory.create(
+            status__state=workflow.GEMELD,
+            category_assignment__category=self.category,
+            location__stadsdeel='A',
+            reporter__email='reporter@example.com',
+            reporter__phone='',
+        )
+
+    def test_refresh(self):
+        self.assertFalse(SignalCurrentState.objects.exists())
+
+        self.assertEqual(SignalCurrentState.objects.refresh([self.signal.id]), 1)
+
+        current_state = SignalCurrentState.objects.get(_signal=self.signal)
+        self.assertEqual(current_state.state, workflow.GEMELD)
+        self.assertEqual(current_state.category_id, self.category.id)
+        self.assertEqual(current_state.category_slug, self.category.slug)
+        self.assertEqual(current_state.parent_category_id, self.parent_category.id)
+        self.assertEqual(current_state.parent_category_slug, self.parent_category.slug)
+        self.assertEqual(current_state.stadsdeel, 'A')
+        self.assertEqual(current_state.created_at, self.signal.created_at)
+        self.assertTrue(current_state.has_email)
+        self.assertFalse(current_state.has_phone)
+        self.assertIsNone(current_state.assigned_user_email)
+
+    def test_refresh_existing(self):
+        SignalCurrentState.objects.refresh([self.signal.id])
+
+        user_assignment = SignalUserFactory.create(_signal=self.signal, user=self.superuser)
+        self.signal.user_assignment = user_assignment
+        self.signal.save()
+
+        self.assertEqual(SignalCurrentState.objects.refresh([self.signal.id]), 1)
+        self.assertEqual(SignalCurrentState.objects.count(), 1)
+        self.assertEqual(self.signal.current_state.assigned_user_email, self.superuser.email)
+
+    def test_refresh_nothing(self):
+        with self.assertNumQueries(0):
+            self.assertEqual(SignalCurrentState.objects.refresh([]), 0)
+
+    def test_refreshed_by_signal_manager(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Signal.actions.update_status({'state': workflow.BEHANDELING, 'text': 'In behandeling'}, self.signal)
+        self.assertEqual(SignalCurrentState.objects.get(_signal=self.signal).state, workflow.BEHANDELING)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Signal.actions.update_priority({'priority': Priority.PRIORITY_HIGH}, self.signal)
+        self.assertEqual(SignalCurrentState.objects.get(_signal=self.signal).priority, Priority.PRIORITY_HIGH)
+
+    def test_refreshed_by_user_assignment(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Signal.actions.update_multiple({'user_assignment': {'user': {'email': self.superuser.email}}},
+                                           self.signal)
+        self.assertEqual(SignalCurrentState.objects.get(_signal=self.signal).assigned_user_email,
+                         self.superuser.email)
+
+    def test_refreshed_by_routing_assignment(self):
+        department = DepartmentFactory.create()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Signal.actions.update_routing_departments({'departments': [{'id': department.id}]}, self.signal)
+        self.assertTrue(SignalCurrentState.objects.filter(_signal=self.signal).exists())
+
+    def test_refreshed_by_category_change(self):
+        SignalCurrentState.objects.refresh([self.signal.id])
+
+        # Move the category to another main category
+        other_parent_category = ParentCategoryFactory.create()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.category.parent = other_parent_category
+            self.category.save()
+
+        current_state = SignalCurrentState.objects.get(_signal=self.signal)
+        self.assertEqual(current_state.parent_category_id, other_parent_category.id)
+        self.assertEqual(current_state.parent_category_slug, other_parent_category.slug)
+
+    def test_not_refreshed_by_other_category_change(self):
+        with mock.patch('signals.apps.signals.tasks.refresh_current_state_of_categories.delay') as delay:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.category.description = 'Other description'
+                self.category.save()
+        delay.assert_not_called()
+
+    def test_command(self):
+        SignalFactory.create_batch(4)
+
+        buffer = StringIO()
+        call_command('refresh_signal_current_state', batch_size=2, stdout=buffer)
+
+        self.assertEqual(SignalCurrentState.objects.count(), 5)
+        self.assertIn('5 Signals refreshed', buffer.getvalue())
+
+    @override_settings(FEATURE_FLAGS={'API_USE_SIGNAL_CURRENT_STATE': True})
+    def test_list_endpoint(self):
+        other_signal = SignalFactory.create(status__state=workflow.BEHANDELING, location__stadsdeel='B',
+                                            reporter__email='', reporter__phone='')
+        SignalCurrentState.objects.refresh([self.signal.id, other_signal.id])
+
+        self.client.force_authenticate(user=self.superuser)
+
+        response = self.client.get('/signals/v1/private/signals/', data={'status': workflow.GEMELD})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([result['id'] for result in response.json()['results']], [self.signal.id])
+
+        response = self.client.get('/signals/v1/private/signals/',
+                                   data={'maincategory_slug': self.parent_category.slug})
+        self.assertEqual([result['id'] for result in response.json()['results']], [self.signal.id])
+
+        response = self.client.get('/signals/v1/private/signals/', data={'contact_details': 'none'})
+        self.assertEqual([result['id'] for result in response.json()['results']], [other_signal.id])
+
+        response = self.client.get('/signals/v1/private/signals/', data={'ordering': '-stadsdeel'})
+        self.assertEqual([result['id'] for result in response.json()['results']], [other_signal.id, self.signal.id])
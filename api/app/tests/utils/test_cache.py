@@ -0,0 +1,56 @@
+# SPDX-License-Identifier: MPL-2.0
+# Copyright (C) 2021 Gemeente Amsterdam
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from signals.utils.cache import LocalCache, VersionedCache
+
+
+@override_settings(TEST_LOCAL_CACHE_TIMEOUT=60)
+class TestLocalCache(TestCase):
+    def setUp(self):
+        cache.clear()
+
+        self.version_cache = VersionedCache(namespace='test-local-cache')
+        self.local_cache = LocalCache(self.version_cache, timeout_setting='TEST_LOCAL_CACHE_TIMEOUT')
+        self.load = mock.Mock(side_effect=lambda previous: (previous or 0) + 1)
+
+    def test_get(self):
+        self.assertEqual(self.local_cache.get(self.load), 1)
+        self.assertEqual(self.local_cache.get(self.load), 1)
+        self.load.assert_called_once_with(None)
+
+    def test_reloaded_when_invalidated(self):
+        self.assertEqual(self.local_cache.get(self.load), 1)
+
+        self.version_cache.invalidate()
+        self.assertEqual(self.local_cache.get(self.load), 2)
+        self.load.assert_called_with(1)
+
+    def test_reloaded_after_timeout(self):
+        self.assertEqual(self.local_cache.get(self.load), 1)
+
+        with self.settings(TEST_LOCAL_CACHE_TIMEOUT=-1):
+            self.assertEqual(self.local_cache.get(self.load), 2)
+
+    @override_settings(LOCAL_CACHE_VERSION_TIMEOUT=60)
+    def test_version_kept_in_process(self):
+        self.assertEqual(self.local_cache.get(self.load), 1)
+
+        # An invalidation in another process (a different VersionedCache instance) is noticed after the version timeout
+        VersionedCache(namespace='test-local-cache').invalidate()
+        with mock.patch.object(self.version_cache, 'get_version', wraps=self.version_cache.get_version) as get_version:
+            self.assertEqual(self.local_cache.get(self.load), 1)
+        get_version.assert_not_called()
+
+        with self.settings(LOCAL_CACHE_VERSION_TIMEOUT=-1):
+            self.assertEqual(self.local_cache.get(self.load), 2)
+
+    @override_settings(LOCAL_CACHE_VERSION_TIMEOUT=60)
+    def test_invalidated_in_process(self):
+        self.assertEqual(self.local_cache.get(self.load), 1)
+
+        self.version_cache.invalidate()
+        self.assertEqual(self.local_cache.get(self.load), 2)